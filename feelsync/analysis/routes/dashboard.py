@@ -2,8 +2,10 @@ from flask import Blueprint, render_template, request, jsonify, flash, redirect,
 from flask_login import login_required, current_user
 from models.database_models import User, GameSession, BehaviorData, AnalysisReport, TherapistAccess, db
 from models.behavior_analyzer import BehaviorAnalyzer
+from utils.session_metrics import compute_session_metrics
 from datetime import datetime, timedelta
 from sqlalchemy import func, desc
+import numpy as np
 import json
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
@@ -372,17 +374,22 @@ def get_performance_trends(user_id):
     
     # Calculate rolling averages
     window_size = min(5, len(sessions) // 3)
+    reaction_times = np.array([s.average_reaction_time or 0.0 for s in sessions], dtype=np.float64)
+    accuracies = np.array([np.nan if s.accuracy is None else s.accuracy for s in sessions], dtype=np.float64)
     trends = []
     
     for i in range(window_size, len(sessions)):
         window_sessions = sessions[i-window_size:i]
         avg_score = sum(s.score for s in window_sessions if s.score) / len([s for s in window_sessions if s.score])
-        avg_reaction_time = sum(s.average_reaction_time for s in window_sessions if s.average_reaction_time) / len([s for s in window_sessions if s.average_reaction_time])
+        avg_reaction_time, avg_accuracy, _ = compute_session_metrics(
+            reaction_times[i-window_size:i], accuracies[i-window_size:i]
+        )
         
         trends.append({
             'session_number': i + 1,
             'avg_score': avg_score,
             'avg_reaction_time': avg_reaction_time,
+            'avg_accuracy': avg_accuracy,
             'date': sessions[i].started_at.strftime('%Y-%m-%d') if sessions[i].started_at else ''
         })
     
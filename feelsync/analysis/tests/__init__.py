@@ -4,108 +4,36 @@ Test package for FeelSync application
 Contains unit tests, integration tests, and test utilities
 """
 
-import pytest
-import tempfile
-import os
-from app import create_app
-from models.database_models import db, User, GameSession, BehaviorData
-from config import TestingConfig
+import orjson
+from sqlalchemy import func, select
+from models.database_models import db, User, GameSession, BehaviorAnalysis
 
-@pytest.fixture(scope='session')
-def app():
-    """Create application for testing"""
-    # Create temporary database
-    db_fd, db_path = tempfile.mkstemp()
-    
-    # Update config for testing
-    TestingConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
-    
-    app = create_app(TestingConfig)
-    
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.drop_all()
-    
-    # Clean up
-    os.close(db_fd)
-    os.unlink(db_path)
+# Fixtures live in conftest.py, where pytest collects them
 
-@pytest.fixture
-def client(app):
-    """Create test client"""
-    return app.test_client()
-
-@pytest.fixture
-def runner(app):
-    """Create test CLI runner"""
-    return app.test_cli_runner()
-
-@pytest.fixture
-def auth_client(client, app):
-    """Create authenticated test client"""
-    with app.app_context():
-        # Create test user
-        user = User(
-            username='testuser',
-            email='test@example.com',
-            age=20,
-            is_minor=False,
-            parental_consent=True
-        )
-        user.set_password('TestPassword123')
-        db.session.add(user)
-        db.session.commit()
-        
-        # Login
-        client.post('/auth/login', data={
-            'username_or_email': 'testuser',
-            'password': 'TestPassword123'
-        })
-        
-        yield client, user
-
-@pytest.fixture
-def sample_game_session(app):
-    """Create sample game session for testing"""
-    with app.app_context():
-        user = User.query.filter_by(username='testuser').first()
-        if not user:
-            user = User(
-                username='testuser',
-                email='test@example.com',
-                age=20
-            )
-            user.set_password('TestPassword123')
-            db.session.add(user)
-            db.session.commit()
-        
-        session = GameSession(
-            user_id=user.id,
-            game_type='catch_thought',
-            score=100,
-            duration=300,
-            completed=True,
-            accuracy=0.85,
-            average_reaction_time=250.5
-        )
-        db.session.add(session)
-        db.session.commit()
-        
-        return session
+# Behavioral data in the shape the game clients post with their results
+SAMPLE_BEHAVIORAL_DATA = {
+    'reactionTimes': [420.0, 515.0, 380.0, 610.0, 450.0, 490.0],
+    'hesitationTimes': [1200.0, 900.0],
+    'decisionTimes': [1500.0, 1800.0, 1250.0],
+    'accuracy': 82,
+    'totalClicks': 40,
+    'mistakes': 6,
+    'emotionalChoices': [1, 2, 3]  # negative, neutral, positive
+}
 
 class TestHelpers:
     """Helper functions for tests"""
     
     @staticmethod
-    def create_test_user(username='testuser', email='test@example.com', age=20):
+    def create_test_user(username='testuser', email='test@example.com', age=20, is_therapist=False):
         """Create a test user"""
         user = User(
             username=username,
             email=email,
             age=age,
-            is_minor=age < 18,
-            parental_consent=True
+            consent_given=True,
+            parental_consent=True,
+            is_therapist=is_therapist
         )
         user.set_password('TestPassword123')
         db.session.add(user)
@@ -113,7 +41,7 @@ class TestHelpers:
         return user
     
     @staticmethod
-    def create_test_session(user_id, game_type='catch_thought', score=100):
+    def create_test_session(user_id, game_type='catch_thought', score=100, game_data=None):
         """Create a test game session"""
         session = GameSession(
             user_id=user_id,
@@ -122,27 +50,63 @@ class TestHelpers:
             duration=300,
             completed=True,
             accuracy=0.85,
-            average_reaction_time=250.5
+            game_data=SAMPLE_BEHAVIORAL_DATA if game_data is None else game_data
         )
         db.session.add(session)
         db.session.commit()
         return session
     
     @staticmethod
-    def create_test_behavior_data(user_id, session_id):
-        """Create test behavior data"""
-        behavior = BehaviorData(
+    def create_test_analysis(user_id, session_id=None, **scores):
+        """Create a test behavior analysis"""
+        analysis = BehaviorAnalysis(
             user_id=user_id,
             session_id=session_id,
-            reaction_time=250.0,
-            decision_type='positive_choice',
-            decision_value='help_friend',
-            accuracy=True,
-            stress_level=3
+            anxiety_score=scores.get('anxiety_score', 20.0),
+            depression_score=scores.get('depression_score', 15.0),
+            attention_score=scores.get('attention_score', 80.0),
+            impulsivity_score=scores.get('impulsivity_score', 10.0),
+            analysis_data={'insights': ['Test insight']},
+            insights=['Test insight']
         )
-        db.session.add(behavior)
+        db.session.add(analysis)
         db.session.commit()
-        return behavior
+        return analysis
+    
+    @staticmethod
+    def auth_headers(user_id):
+        """Authorization header carrying a fresh access token for user_id"""
+        from app import issue_access_token
+        return {'Authorization': f'Bearer {issue_access_token(user_id)}'}
+    
+    @staticmethod
+    def save_game_data(client, session_id, game_data, behavioral_data=SAMPLE_BEHAVIORAL_DATA):
+        """Post a finished game's score and behavioral data"""
+        payload = {
+            'score': game_data['final_score'],
+            'duration': game_data.get('duration', 300),
+            'behavioral_data': behavioral_data
+        }
+        return client.post(f'/api/games/session/{session_id}/data',
+                           data=orjson.dumps(payload),
+                           content_type='application/json')
+    
+    @staticmethod
+    def count_analyses(session_id):
+        """Count a session's analyses with a single COUNT(*) query"""
+        return db.session.execute(
+            select(func.count()).where(BehaviorAnalysis.session_id == session_id)
+        ).scalar()
+    
+    @staticmethod
+    def analysis_counts(session_ids):
+        """Analyses per session for the given sessions, aggregated in SQL"""
+        rows = db.session.execute(
+            select(BehaviorAnalysis.session_id, func.count())
+            .where(BehaviorAnalysis.session_id.in_(session_ids))
+            .group_by(BehaviorAnalysis.session_id)
+        ).all()
+        return dict.fromkeys(session_ids, 0) | dict(rows)
 
 # Test configuration constants
 TEST_CONFIG = {
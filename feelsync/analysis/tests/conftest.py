@@ -0,0 +1,168 @@
+"""
+Shared pytest fixtures for the FeelSync test suite.
+
+pytest only collects fixtures from conftest.py files, so they live here
+rather than in the package __init__, which keeps the test helpers and
+sample data.
+"""
+
+import os
+
+# app.py builds its engine at import time, so the testing config has to be
+# selected before it is imported
+os.environ.setdefault('FEELSYNC_CONFIG', 'testing')
+
+import pytest
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+import app as app_module
+from models.database_models import db, User
+from models.behavior_analyzer import BehaviorAnalyzer
+from utils.session_metrics import compute_session_metrics
+from tests import TestHelpers
+
+@pytest.fixture(scope='session')
+def app():
+    """Create application for testing"""
+    # TestingConfig uses a shared in-memory SQLite database
+    flask_app = app_module.app
+    
+    with flask_app.app_context():
+        @event.listens_for(db.engine, 'connect')
+        def _configure_sqlite(dbapi_connection, connection_record):
+            # Let SQLAlchemy emit BEGIN itself so SAVEPOINTs work with pysqlite
+            dbapi_connection.isolation_level = None
+            # Durability is irrelevant for a throwaway test database
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA synchronous=OFF')
+            cursor.close()
+        
+        @event.listens_for(db.engine, 'begin')
+        def _begin_sqlite(connection):
+            connection.exec_driver_sql('BEGIN')
+        
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture(scope='session', autouse=True)
+def warm_jit_kernels():
+    """Compile JIT kernels once so compile time stays out of test timings"""
+    compute_session_metrics(np.zeros(1), np.zeros(1))
+    BehaviorAnalyzer()._calculate_detailed_metrics({'reactionTimes': [500.0] * 6, 'hesitationTimes': [1200.0]})
+
+@pytest.fixture(autouse=True)
+def db_session(app, _auth_user):
+    """Run each test inside an outer transaction that is rolled back afterwards"""
+    # Depending on _auth_user makes the shared user exist before the first transaction
+    connection = db.engine.connect()
+    transaction = connection.begin()
+    
+    # Commits made by the app become SAVEPOINT releases inside the outer transaction.
+    # Objects are not expired on commit, so verification reads skip a reload SELECT.
+    original_session = db.session
+    db.session = scoped_session(sessionmaker(
+        bind=connection,
+        join_transaction_mode='create_savepoint',
+        expire_on_commit=False,
+        query_cls=db.Query
+    ))
+    
+    yield db.session
+    
+    db.session.remove()
+    db.session = original_session
+    transaction.rollback()
+    connection.close()
+    
+    # Row ids are reused once a test's rows are rolled back, so identities
+    # cached by token_required must not outlive the test
+    with app_module._user_cache_lock:
+        app_module._user_cache.clear()
+
+@pytest.fixture(autouse=True)
+def analysis_jobs(monkeypatch):
+    """Collect background analysis jobs instead of running them on worker threads
+    
+    Worker threads would share the test connection; tests run the collected
+    (fn, args) pairs themselves when they need the analysis to exist.
+    """
+    jobs = []
+    
+    class _CollectingExecutor:
+        def submit(self, fn, *args):
+            jobs.append((fn, args))
+    
+    monkeypatch.setattr(app_module, 'analysis_executor', _CollectingExecutor())
+    return jobs
+
+@pytest.fixture
+def client(app):
+    """Create test client"""
+    return app.test_client()
+
+@pytest.fixture
+def runner(app):
+    """Create test CLI runner"""
+    return app.test_cli_runner()
+
+@pytest.fixture(scope='session')
+def _auth_user(app):
+    """Create the shared authenticated user and log in once per test run"""
+    # Distinct from TestHelpers.create_test_user() defaults so tests can still create 'testuser'
+    user = User(
+        username='authuser',
+        email='auth@example.com',
+        age=20,
+        consent_given=True,
+        parental_consent=True
+    )
+    user.set_password('TestPassword123')
+    db.session.add(user)
+    db.session.commit()
+    
+    # Password hashing and login run once; later clients replay the signed session cookie
+    client = app.test_client()
+    client.post('/login', json={
+        'email': 'auth@example.com',
+        'password': 'TestPassword123'
+    })
+    session_cookie = client.get_cookie('session')
+    
+    db.session.refresh(user)
+    db.session.expunge(user)
+    # Hand the single StaticPool connection back without an open transaction
+    db.session.remove()
+    
+    return user, session_cookie.value
+
+@pytest.fixture
+def auth_client(app, _auth_user):
+    """Create authenticated test client"""
+    user, session_cookie = _auth_user
+    
+    client = app.test_client()
+    client.set_cookie('session', session_cookie)
+    # Access tokens live for 15 minutes, less than a full run may take, so
+    # each client gets a freshly signed one instead of the login's
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {app_module.issue_access_token(user.id)}'
+    
+    yield client, user
+
+@pytest.fixture
+def game_session(auth_client, game_type):
+    """Start a game session of the parametrized game_type"""
+    client, user = auth_client
+    
+    response = client.post('/api/games/session', json={'game_type': game_type})
+    
+    yield client, response.get_json()['session_id']
+
+@pytest.fixture
+def sample_game_session(app, _auth_user):
+    """Create sample game session for testing"""
+    user = _auth_user[0]
+    return TestHelpers.create_test_session(user.id, 'catch_thought')
@@ -0,0 +1,413 @@
+import pytest
+import itertools
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError, InvalidRequestError
+from sqlalchemy.orm import contains_eager, undefer_group
+
+from app import build_analysis_row, bulk_save_analyses
+from models.database_models import db, GameSession, BehaviorAnalysis, TherapistAccess, RISK_INDICATOR_MESSAGES
+from tests import TestHelpers, SAMPLE_BEHAVIORAL_DATA
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements executed inside the block"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # SAVEPOINTs come from the per-test transaction, not from the code under test
+        if not statement.startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')):
+            statements.append(statement)
+    
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+@pytest.fixture
+def user(_auth_user):
+    """The shared test user"""
+    return _auth_user[0]
+
+class TestAnalysisSessionLoading:
+    """Test BehaviorAnalysis.session never lazy loads per row"""
+    
+    @pytest.fixture
+    def analyses(self, user):
+        """Three analyses, each linked to its own session"""
+        for score in (100, 200, 300):
+            session = TestHelpers.create_test_session(user.id, score=score)
+            TestHelpers.create_test_analysis(user.id, session.id)
+        db.session.expunge_all()
+    
+    def test_lazy_load_raises(self, user, analyses):
+        """Touching analysis.session without eager loading raises instead of querying"""
+        analysis = BehaviorAnalysis.query.filter_by(user_id=user.id).first()
+        
+        with count_queries() as statements:
+            with pytest.raises(InvalidRequestError):
+                analysis.session
+        assert statements == []
+    
+    def test_identity_map_hit_needs_no_sql(self, user, analyses):
+        """A session already in the identity map resolves without a query"""
+        analysis = BehaviorAnalysis.query.filter_by(user_id=user.id).first()
+        session = db.session.get(GameSession, analysis.session_id)
+        
+        with count_queries() as statements:
+            assert analysis.session is session
+        assert statements == []
+    
+    def test_contains_eager_matches_per_row_lookup(self, user, analyses):
+        """The joined listing loads the same sessions as one lookup per row, in one query"""
+        with count_queries() as statements:
+            listing = BehaviorAnalysis.query.filter_by(user_id=user.id).join(BehaviorAnalysis.session).options(
+                contains_eager(BehaviorAnalysis.session)
+            ).order_by(BehaviorAnalysis.id).all()
+            eager = [(analysis.id, analysis.session.id, analysis.session.score) for analysis in listing]
+        assert len(statements) == 1
+        
+        db.session.expunge_all()
+        per_row = []
+        for analysis in BehaviorAnalysis.query.filter_by(user_id=user.id).order_by(BehaviorAnalysis.id):
+            session = db.session.get(GameSession, analysis.session_id)
+            per_row.append((analysis.id, session.id, session.score))
+        assert eager == per_row
+        assert [score for _, _, score in eager] == [100, 200, 300]
+
+# Score sets raising no, some and all risk indicators
+RISKY_SCORES = (
+    dict(anxiety_score=20.0, depression_score=15.0, attention_score=80.0, impulsivity_score=10.0),
+    dict(anxiety_score=75.0, depression_score=40.0, attention_score=25.0, impulsivity_score=10.0),
+    dict(anxiety_score=70.0, depression_score=70.5, attention_score=30.0, impulsivity_score=71.0),
+    dict(anxiety_score=95.0, depression_score=90.0, attention_score=5.0, impulsivity_score=85.0)
+)
+
+class TestBulkSerialization:
+    """Test BehaviorAnalysis.bulk_to_dict against to_dict"""
+    
+    def test_bulk_to_dict_matches_to_dict(self, user):
+        """Each bulk row equals the instance's to_dict, in the order of ids"""
+        analyses = [TestHelpers.create_test_analysis(user.id, **scores) for scores in RISKY_SCORES]
+        analyses[1].emotional_regulation_score = 20.0
+        analyses[1].insights = None
+        db.session.commit()
+        
+        ids = [analysis.id for analysis in reversed(analyses)] + [999999]
+        assert BehaviorAnalysis.bulk_to_dict(db.session, ids) == [
+            analysis.to_dict() for analysis in reversed(analyses)
+        ]
+        assert BehaviorAnalysis.bulk_to_dict(db.session, [999999]) == []
+
+def reference_risk_indicators(analysis):
+    """get_risk_indicators as it was before risk_flags, comparing the scores"""
+    flags = (
+        analysis.anxiety_score > 70,
+        analysis.depression_score > 70,
+        analysis.attention_score < 30,
+        analysis.impulsivity_score > 70,
+        analysis.emotional_regulation_score < 30
+    )
+    return [message for message, flagged in zip(RISK_INDICATOR_MESSAGES, flags) if flagged]
+
+class TestRiskFlags:
+    """Test the stored risk_flags bitmask against the score comparisons it replaced"""
+    
+    def test_every_indicator_combination(self, user):
+        """Inserted analyses decode to the indicators the scores raise"""
+        # Each score just inside, exactly on and just past its threshold
+        for anxiety, depression, attention, impulsivity, regulation in itertools.product(
+            (70.0, 70.01), (69.99, 70.0, 71.0), (29.99, 30.0), (70.0, 85.0), (29.0, 30.0)
+        ):
+            analysis = BehaviorAnalysis(
+                user_id=user.id, anxiety_score=anxiety, depression_score=depression,
+                attention_score=attention, impulsivity_score=impulsivity,
+                emotional_regulation_score=regulation
+            )
+            db.session.add(analysis)
+            db.session.flush()
+            assert analysis.get_risk_indicators() == reference_risk_indicators(analysis)
+    
+    def test_updates_refresh_flags(self, user):
+        """Changing scores through the ORM rewrites the stored flags"""
+        analysis = BehaviorAnalysis(user_id=user.id, emotional_regulation_score=50.0, **RISKY_SCORES[0])
+        db.session.add(analysis)
+        db.session.commit()
+        assert analysis.risk_flags == 0
+        
+        analysis.anxiety_score = 90.0
+        analysis.emotional_regulation_score = 10.0
+        db.session.commit()
+        db.session.expire(analysis)
+        
+        assert analysis.risk_flags == 0b10001
+        assert analysis.get_risk_indicators() == reference_risk_indicators(analysis)
+    
+    def test_unflushed_score_changes(self, user):
+        """Indicators follow scores changed in memory before the next flush"""
+        analysis = BehaviorAnalysis(user_id=user.id, emotional_regulation_score=50.0, **RISKY_SCORES[0])
+        db.session.add(analysis)
+        db.session.commit()
+        assert analysis.get_risk_indicators() == []
+        
+        analysis.attention_score = 10.0
+        assert analysis.get_risk_indicators() == reference_risk_indicators(analysis) == [RISK_INDICATOR_MESSAGES[2]]
+        
+        analysis.attention_score = 80.0
+        assert analysis.get_risk_indicators() == []
+        db.session.commit()
+        assert analysis.risk_flags == 0
+    
+    def test_core_insert_rows_carry_flags(self, user):
+        """Rows bulk-inserted from build_analysis_row decode like ORM-written ones"""
+        bulk_save_analyses([build_analysis_row(user.id, None, scores) for scores in RISKY_SCORES])
+        
+        for analysis in BehaviorAnalysis.query.filter_by(user_id=user.id):
+            assert analysis.get_risk_indicators() == reference_risk_indicators(analysis)
+
+class TestGameDataPatch:
+    """Test update_game_data_field against rewriting the whole document"""
+    
+    @pytest.mark.parametrize('key, value', [
+        ('emotionalChoices', [4, 0, 2]),
+        ('accuracy', 91.5),
+        ('mistakes', 0),
+        ('notes', 'said "stop" — twice'),
+        ('settings', {'level': 3, 'hints': [True, False], 'theme': None}),
+        ('cleared', None),
+        ('newKey', []),
+        ('level.bonus', 2),
+        ('hints[0]', 'first')
+    ])
+    def test_patch_matches_rewrite(self, user, key, value):
+        """Patching one key in SQL stores what a read-modify-write would"""
+        patched = TestHelpers.create_test_session(user.id)
+        rewritten = TestHelpers.create_test_session(user.id)
+        assert patched.game_data == rewritten.game_data
+        
+        patched.update_game_data_field(key, value)
+        rewritten.game_data = {**rewritten.game_data, key: value}
+        db.session.commit()
+        db.session.expire_all()
+        
+        assert patched.game_data == rewritten.game_data
+        assert patched.game_data[key] == value
+    
+    @pytest.mark.parametrize('key', ['say "hi"', 'back\\slash'])
+    def test_unaddressable_keys_are_rejected(self, user, key):
+        """Keys the JSON path cannot quote raise instead of being silently skipped"""
+        session = TestHelpers.create_test_session(user.id)
+        
+        with pytest.raises(ValueError):
+            session.update_game_data_field(key, 1)
+        assert session.game_data == SAMPLE_BEHAVIORAL_DATA
+    
+    def test_patch_empty_document(self, user):
+        """A session without game_data gets a one-key document"""
+        session = TestHelpers.create_test_session(user.id, game_data={})
+        session.game_data = None
+        db.session.commit()
+        
+        session.update_game_data_field('accuracy', 80)
+        db.session.commit()
+        
+        # The loaded attribute was expired, so this reads the patched row
+        assert session.game_data == {'accuracy': 80}
+
+def column_values(session):
+    """A game session's stored column values, without its id"""
+    return {column.key: getattr(session, column.key) for column in GameSession.__table__.columns if column.key != 'id'}
+
+class TestBulkLog:
+    """Test GameSession.bulk_log against adding sessions through the ORM"""
+    
+    def test_bulk_log_matches_orm_inserts(self, user):
+        """Bulk-logged rows equal the rows ORM inserts of the same records store"""
+        records = [
+            {
+                'user_id': user.id, 'game_type': 'catch_thought', 'score': 120, 'duration': 240,
+                'completed': True, 'accuracy': 0.9, 'game_data': SAMPLE_BEHAVIORAL_DATA,
+                'start_time': '2024-03-01T10:00:00', 'end_time': '2024-03-01T10:04:00.250000',
+                'created_at': datetime(2024, 3, 1, 10, 4)
+            },
+            {
+                # Unset columns fall back to their defaults
+                'user_id': user.id, 'game_type': 'decision_maker', 'game_data': None,
+                'start_time': datetime(2024, 3, 2, 9, 30), 'created_at': '2024-03-02T09:30:00'
+            }
+        ]
+        
+        GameSession.bulk_log(db.session, records)
+        logged = GameSession.query.order_by(GameSession.id).all()
+        
+        for record in records:
+            values = dict(record)
+            for column in ('start_time', 'end_time', 'created_at'):
+                if isinstance(values.get(column), str):
+                    values[column] = datetime.fromisoformat(values[column])
+            db.session.add(GameSession(**values))
+        db.session.commit()
+        added = GameSession.query.order_by(GameSession.id).all()[len(logged):]
+        
+        assert [column_values(session) for session in logged] == [column_values(session) for session in added]
+        assert logged[1].completed is False and logged[1].game_data is None
+    
+    def test_bulk_log_nothing(self):
+        """An empty batch inserts nothing"""
+        GameSession.bulk_log(db.session, [])
+        assert GameSession.query.count() == 0
+
+class TestDeferredDocuments:
+    """Test the deferred JSON document groups load the same data as eager columns"""
+    
+    def test_listing_skips_documents(self, user):
+        """Plain listings leave the documents out; first access loads the whole group once"""
+        TestHelpers.create_test_analysis(user.id)
+        db.session.expunge_all()
+        
+        with count_queries() as statements:
+            analysis = BehaviorAnalysis.query.filter_by(user_id=user.id).one()
+        assert 'analysis_data' not in statements[0] and 'insights' not in statements[0]
+        
+        with count_queries() as statements:
+            assert analysis.insights == ['Test insight']
+            assert analysis.analysis_data == {'insights': ['Test insight']}
+        assert len(statements) == 1
+    
+    def test_undefer_group_matches_deferred_loads(self, user):
+        """undefer_group loads every row's documents in the listing query itself"""
+        for score in (100, 200, 300):
+            session = TestHelpers.create_test_session(user.id, score=score, game_data=SAMPLE_BEHAVIORAL_DATA | {'score': score})
+            TestHelpers.create_test_analysis(user.id, session.id)
+        db.session.expunge_all()
+        
+        deferred_sessions = [(s.id, s.game_data) for s in GameSession.query.order_by(GameSession.id)]
+        deferred_analyses = [(a.id, a.analysis_data, a.insights) for a in BehaviorAnalysis.query.order_by(BehaviorAnalysis.id)]
+        db.session.expunge_all()
+        
+        with count_queries() as statements:
+            sessions = GameSession.query.options(undefer_group('game_documents')).order_by(GameSession.id).all()
+            analyses = BehaviorAnalysis.query.options(undefer_group('analysis_documents')).order_by(BehaviorAnalysis.id).all()
+            undeferred_sessions = [(s.id, s.game_data) for s in sessions]
+            undeferred_analyses = [(a.id, a.analysis_data, a.insights) for a in analyses]
+        assert len(statements) == 2
+        
+        assert undeferred_sessions == deferred_sessions
+        assert undeferred_analyses == deferred_analyses
+    
+    def test_full_analysis_listing_query_count_is_constant(self, user, client):
+        """The full-detail analysis listing does not add a query per row"""
+        headers = TestHelpers.auth_headers(user.id)
+        
+        def listing_queries(n_analyses):
+            while BehaviorAnalysis.query.count() < n_analyses:
+                TestHelpers.create_test_analysis(user.id)
+            db.session.expunge_all()
+            with count_queries() as statements:
+                response = client.get(f'/api/analysis/{user.id}', headers=headers)
+            assert [row['insights'] for row in response.get_json()] == [['Test insight']] * n_analyses
+            return len(statements)
+        
+        # The first call also caches the caller's identity
+        listing_queries(1)
+        assert listing_queries(1) == listing_queries(5)
+
+class TestListingQueryCounts:
+    """Test served listing pages issue a fixed number of queries"""
+    
+    def test_therapist_dashboard_query_count_is_constant(self, client):
+        """Listing active users does not add a query per user"""
+        therapist = TestHelpers.create_test_user('therapist', 'therapist@example.com', age=40, is_therapist=True)
+        client.post('/login', json={'email': 'therapist@example.com', 'password': 'TestPassword123'})
+        
+        def dashboard_queries(n_users):
+            for i in range(n_users):
+                patient = TestHelpers.create_test_user(f'patient{n_users}_{i}', f'patient{n_users}_{i}@example.com')
+                TestHelpers.create_test_session(patient.id)
+                TestHelpers.create_test_analysis(patient.id)
+            db.session.expunge_all()
+            with count_queries() as statements:
+                assert client.get('/therapist/dashboard').status_code == 200
+            return len(statements)
+        
+        assert dashboard_queries(1) == dashboard_queries(5)
+    
+    def test_report_query_count_is_constant(self, user, client):
+        """The report reads sessions and analyses without a query per row"""
+        headers = TestHelpers.auth_headers(user.id)
+        
+        def report_queries(n_sessions):
+            while GameSession.query.count() < n_sessions:
+                session = TestHelpers.create_test_session(user.id)
+                TestHelpers.create_test_analysis(user.id, session.id)
+            db.session.expunge_all()
+            with count_queries() as statements:
+                assert client.get(f'/api/report/{user.id}', headers=headers).status_code == 200
+            return len(statements)
+        
+        # The first call also caches the caller's identity
+        report_queries(1)
+        assert report_queries(1) == report_queries(5)
+
+class TestRiskCounts:
+    """Test BehaviorAnalysis.risk_counts against counting rows in Python"""
+    
+    def test_risk_counts_match_row_counts(self, user):
+        """The aggregate query counts what checking every row would"""
+        for scores in RISKY_SCORES:
+            for regulation in (10.0, 30.0, 60.0):
+                db.session.add(BehaviorAnalysis(user_id=user.id, emotional_regulation_score=regulation, **scores))
+        db.session.commit()
+        
+        expected = dict.fromkeys(('anxiety', 'depression', 'attention', 'impulsivity', 'emotional_regulation'), 0)
+        for analysis in BehaviorAnalysis.query:
+            for name, message in zip(expected, RISK_INDICATOR_MESSAGES):
+                expected[name] += message in reference_risk_indicators(analysis)
+        
+        assert BehaviorAnalysis.risk_counts(db.session) == expected
+        assert expected == {'anxiety': 6, 'depression': 6, 'attention': 6, 'impulsivity': 6, 'emotional_regulation': 4}
+    
+    def test_risk_counts_empty(self):
+        """No analyses count as zero for every indicator"""
+        assert set(BehaviorAnalysis.risk_counts(db.session).values()) == {0}
+
+class TestTherapistAccess:
+    """Test TherapistAccess.has_access and the one-grant-per-pair constraint"""
+    
+    @pytest.fixture
+    def therapist(self):
+        """A therapist account"""
+        return TestHelpers.create_test_user('therapist', 'therapist@example.com', age=40, is_therapist=True)
+    
+    def grant(self, therapist, user, **fields):
+        """Record a therapist access grant"""
+        access = TherapistAccess(therapist_id=therapist.id, user_id=user.id, **({'access_granted': True} | fields))
+        db.session.add(access)
+        db.session.commit()
+        return access
+    
+    @pytest.mark.parametrize('fields, expected', [
+        ({}, True),
+        ({'expires_at': datetime.utcnow() + timedelta(days=30)}, True),
+        ({'access_granted': False}, False),
+        ({'expires_at': datetime.utcnow() - timedelta(days=1)}, False)
+    ], ids=['open_ended', 'unexpired', 'not_granted', 'expired'])
+    def test_has_access(self, therapist, user, fields, expected):
+        """Only granted, unexpired rows count as access"""
+        self.grant(therapist, user, **fields)
+        assert TherapistAccess.has_access(therapist.id, user.id) is expected
+    
+    def test_grant_covers_only_its_user(self, therapist, user):
+        """A grant from one user says nothing about another"""
+        self.grant(therapist, user)
+        other = TestHelpers.create_test_user()
+        assert not TherapistAccess.has_access(therapist.id, other.id)
+    
+    def test_one_grant_per_pair(self, therapist, user):
+        """A second row for the same therapist and user is rejected"""
+        self.grant(therapist, user)
+        with pytest.raises(IntegrityError):
+            self.grant(therapist, user, access_granted=False)
+        db.session.rollback()
@@ -6,52 +6,114 @@ Tests the game logic, scoring, achievements, and user interactions.
 import unittest
 from unittest.mock import Mock, patch, MagicMock
 import sys
-import os
 import json
+import math
+from collections.abc import MutableMapping
 from datetime import datetime, timedelta
 
-# Add project root to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
 
 # Mock the game logic since it's primarily JavaScript-based
+class _StatRecord(MutableMapping):
+    """Legacy per-stat dict view backed by the game's value array."""
+    
+    __slots__ = ('_game', '_index')
+    
+    _KEYS = ('value', 'color', 'name', 'emoji')
+    
+    def __init__(self, game, index):
+        self._game = game
+        self._index = index
+    
+    def __getitem__(self, key):
+        if key == 'value':
+            return self._game._values[self._index]
+        _, name, color, emoji = self._game.STAT_META[self._index]
+        return {'name': name, 'color': color, 'emoji': emoji}[key]
+    
+    def __setitem__(self, key, value):
+        if key != 'value':
+            raise TypeError(f"Stat metadata is read-only: {key}")
+        self._game._values[self._index] = value
+    
+    def __delitem__(self, key):
+        raise TypeError("Stat records do not support deletion")
+    
+    def __iter__(self):
+        return iter(self._KEYS)
+    
+    def __len__(self):
+        return len(self._KEYS)
+
+
 class MockEmotionalBalanceGame:
     """Mock class representing the JavaScript game logic for testing."""
     
+    # Immutable stat metadata: (key, name, color, emoji)
+    STAT_META = (
+        ('happiness', 'Happiness', '#FFD700', '😊'),
+        ('calm', 'Calm', '#87CEEB', '😌'),
+        ('confidence', 'Confidence', '#FF6B6B', '💪'),
+        ('focus', 'Focus', '#4ECDC4', '🎯'),
+        ('energy', 'Energy', '#45B7D1', '⚡'),
+        ('empathy', 'Empathy', '#96CEB4', '❤️')
+    )
+    STAT_INDEX = {meta[0]: i for i, meta in enumerate(STAT_META)}
+    
+    # Unit-change effect of each source stat (row) on every stat (column),
+    # columns ordered as in STAT_META
+    INTERACTION_MATRIX = np.array([
+        [0.0, 0.3, 0.2, 0.0, 0.4, 0.0],     # happiness
+        [0.2, 0.0, 0.1, 0.5, 0.0, 0.0],     # calm
+        [0.3, 0.0, 0.0, 0.0, 0.2, -0.1],    # confidence
+        [0.0, 0.3, 0.0, 0.0, -0.2, -0.1],   # focus
+        [0.2, -0.3, 0.3, 0.0, 0.0, 0.0],    # energy
+        [0.2, 0.3, -0.1, 0.0, 0.0, 0.0]     # empathy
+    ], dtype=np.float32)
+    
+    # Achievement state template, copied on every (re)initialisation
+    _ACH_TEMPLATE = {
+        'first-balance': False,
+        'perfectionist': False,
+        'efficient': False,
+        'level5': False,
+        'streak': False
+    }
+    
     def __init__(self):
-        self.stats = {
-            'happiness': {'value': 50, 'color': '#FFD700', 'name': 'Happiness', 'emoji': '😊'},
-            'calm': {'value': 50, 'color': '#87CEEB', 'name': 'Calm', 'emoji': '😌'},
-            'confidence': {'value': 50, 'color': '#FF6B6B', 'name': 'Confidence', 'emoji': '💪'},
-            'focus': {'value': 50, 'color': '#4ECDC4', 'name': 'Focus', 'emoji': '🎯'},
-            'energy': {'value': 50, 'color': '#45B7D1', 'name': 'Energy', 'emoji': '⚡'},
-            'empathy': {'value': 50, 'color': '#96CEB4', 'name': 'Empathy', 'emoji': '❤️'}
-        }
+        # Hot-path stat values live in a single contiguous array
+        self._values = np.full(len(self.STAT_META), 50.0)
+        self._stats_view = None
         self.level = 1
         self.score = 0
         self.moves = 30
         self.target_balance = 85
-        self.achievements = {
-            'first-balance': False,
-            'perfectionist': False,
-            'efficient': False,
-            'level5': False,
-            'streak': False
-        }
+        self.achievements = MockEmotionalBalanceGame._ACH_TEMPLATE.copy()
         self.level_streak = 0
     
+    @property
+    def stats(self):
+        """Legacy dict-of-dicts view of the stats, built lazily on first access."""
+        if self._stats_view is None:
+            self._stats_view = {
+                meta[0]: _StatRecord(self, i) for i, meta in enumerate(self.STAT_META)
+            }
+        return self._stats_view
+    
     def adjust_stat(self, stat_name, change):
         """Adjust a stat value and apply interactions."""
         if self.moves <= 0:
             return False
         
-        if stat_name not in self.stats:
+        index = self.STAT_INDEX.get(stat_name)
+        if index is None:
             raise ValueError(f"Invalid stat name: {stat_name}")
         
-        old_value = self.stats[stat_name]['value']
+        old_value = self._values[index]
         new_value = max(0, min(100, old_value + change))
         
         if old_value != new_value:
-            self.stats[stat_name]['value'] = new_value
+            self._values[index] = new_value
             self.moves -= 1
             self.apply_stat_interactions(stat_name, change)
             return True
@@ -60,31 +122,18 @@ class MockEmotionalBalanceGame:
     
     def apply_stat_interactions(self, changed_stat, change):
         """Apply stat interactions based on the changed stat."""
-        interactions = {
-            'happiness': {'calm': 0.3, 'confidence': 0.2, 'energy': 0.4},
-            'calm': {'happiness': 0.2, 'focus': 0.5, 'confidence': 0.1},
-            'confidence': {'happiness': 0.3, 'energy': 0.2, 'empathy': -0.1},
-            'focus': {'calm': 0.3, 'energy': -0.2, 'empathy': -0.1},
-            'energy': {'happiness': 0.2, 'confidence': 0.3, 'calm': -0.3},
-            'empathy': {'happiness': 0.2, 'calm': 0.3, 'confidence': -0.1}
-        }
-        
-        relations = interactions.get(changed_stat, {})
-        
-        for target_stat, multiplier in relations.items():
-            if target_stat in self.stats:
-                effect = change * multiplier
-                current_value = self.stats[target_stat]['value']
-                new_value = max(0, min(100, current_value + effect))
-                self.stats[target_stat]['value'] = new_value
+        index = self.STAT_INDEX.get(changed_stat)
+        if index is None:
+            return
+        
+        self._values += float(change) * self.INTERACTION_MATRIX[index]
+        np.clip(self._values, 0, 100, out=self._values)
     
     def calculate_balance(self):
         """Calculate the current balance percentage."""
-        values = [stat['value'] for stat in self.stats.values()]
-        avg = sum(values) / len(values)
-        variance = sum((val - avg) ** 2 for val in values) / len(values)
-        balance = max(0, 100 - (variance ** 0.5))
-        return round(balance)
+        values = self._values
+        variance = float(((values - values.mean()) ** 2).mean())
+        return int(max(0.0, 100.0 - math.sqrt(variance)) + 0.5)
     
     def is_level_complete(self):
         """Check if the current level is complete."""
@@ -103,12 +152,15 @@ class MockEmotionalBalanceGame:
     
     def reset_stats(self):
         """Reset all stats to starting values with some randomization."""
-        import random
         random_factor = 20 if self.level > 3 else 10
         
-        for stat in self.stats.values():
-            base_value = 50 + (random.random() - 0.5) * random_factor
-            stat['value'] = max(20, min(80, round(base_value)))
+        values = self._values
+        values[:] = np.random.random(values.size)
+        values -= 0.5
+        values *= random_factor
+        values += 50
+        np.rint(values, out=values)
+        np.clip(values, 20, 80, out=values)
     
     def reset_game(self):
         """Reset the entire game to initial state."""
@@ -362,6 +414,8 @@ class TestGameIntegration(unittest.TestCase):
         self.assertEqual(self.game.moves, 30)
         
         # Make strategic moves to balance stats
+        import random
+        stat_keys = tuple(self.game.stats.keys())
         moves_made = 0
         while not self.game.is_level_complete() and self.game.moves > 0:
             # Simple strategy: adjust the most extreme stats toward 50
@@ -376,9 +430,8 @@ class TestGameIntegration(unittest.TestCase):
                     break
             else:
                 # If no extreme stats, make small random adjustments
-                import random
-                stat_name = random.choice(list(self.game.stats.keys()))
-                change = random.choice([-1, 1])
+                stat_name = random.choice(stat_keys)
+                change = 1 if random.random() < 0.5 else -1
                 self.game.adjust_stat(stat_name, change)
                 moves_made += 1
         
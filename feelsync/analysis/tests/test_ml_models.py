@@ -1,137 +1,47 @@
 import pytest
 import numpy as np
-import pandas as pd
-from unittest.mock import Mock, patch
+import orjson
 import tempfile
-import os
 
-from models.ml_models import MentalHealthClassifier, BehaviorPredictor, AttentionAnalyzer
-from models.behavior_analyzer import BehaviorAnalyzer
-from models.database_models import db, User, GameSession, BehaviorData
-from tests import TestHelpers
+from models.ml_models import BehaviorPredictor, BEHAVIOR_CLUSTER_NAMES
+from models.behavior_analyzer import (
+    BehaviorAnalyzer, _batch_reaction_time_stats, _detailed_metrics_kernel, _detailed_metrics_numpy, _reaction_time_stats
+)
+from utils.session_metrics import compute_session_metrics
+from tests import TestHelpers, SAMPLE_BEHAVIORAL_DATA
 
-class TestMentalHealthClassifier:
-    """Test cases for MentalHealthClassifier"""
-    
-    @pytest.fixture
-    def classifier(self):
-        """Create classifier instance for testing"""
-        return MentalHealthClassifier()
-    
-    @pytest.fixture
-    def sample_data(self):
-        """Create sample training data"""
-        return pd.DataFrame({
-            'reaction_time_mean': [250, 180, 320, 200, 450],
-            'reaction_time_std': [50, 30, 80, 40, 120],
-            'accuracy': [0.85, 0.92, 0.78, 0.88, 0.65],
-            'hesitation_frequency': [0.1, 0.05, 0.25, 0.08, 0.4],
-            'stress_level_avg': [3, 2, 6, 3, 8],
-            'decision_consistency': [0.8, 0.9, 0.6, 0.85, 0.4],
-            # Target labels: 0=normal, 1=anxiety, 2=depression, 3=attention_deficit
-            'mental_health_indicator': [0, 0, 1, 0, 2]
+# Sessions with slow, erratic reactions and negative choices
+ANXIOUS_BEHAVIORAL_DATA = {
+    'reactionTimes': [400.0, 1900.0, 450.0, 2100.0, 500.0, 1800.0],
+    'hesitationTimes': [1500.0, 1700.0, 1600.0, 1900.0],
+    'accuracy': 55,
+    'totalClicks': 20,
+    'mistakes': 9,
+    'emotionalChoices': [6, 1, 1]
+}
+
+def make_training_data(n=30):
+    """Synthetic labelled sessions spanning calm to anxious behavior"""
+    rng = np.random.default_rng(42)
+    training_data = []
+    for i in range(n):
+        level = i / (n - 1)
+        reaction_times = rng.normal(500 + 900 * level, 50 + 500 * level, size=12).clip(150)
+        training_data.append({
+            'behavioral_data': {
+                'reactionTimes': reaction_times.tolist(),
+                'hesitationTimes': [1000.0] * int(level * 6),
+                'accuracy': 95 - 40 * level,
+                'totalClicks': 20,
+                'mistakes': int(level * 8),
+                'emotionalChoices': [int(level * 6), 2, int((1 - level) * 6)]
+            },
+            'anxiety_score': 10 + 70 * level,
+            'depression_score': 5 + 60 * level,
+            'attention_score': 90 - 50 * level,
+            'cluster': BEHAVIOR_CLUSTER_NAMES[0 if level < 0.5 else 2]
         })
-    
-    def test_classifier_initialization(self, classifier):
-        """Test classifier initialization"""
-        assert classifier is not None
-        assert hasattr(classifier, 'model')
-        assert hasattr(classifier, 'scaler')
-        assert hasattr(classifier, 'feature_names')
-    
-    def test_feature_extraction(self, classifier, app, auth_client):
-        """Test feature extraction from user data"""
-        client, user = auth_client
-        
-        with app.app_context():
-            # Create test sessions and behavior data
-            for i in range(3):
-                session = TestHelpers.create_test_session(user.id, 'catch_thought', score=100+i*10)
-                TestHelpers.create_test_behavior_data(user.id, session.id)
-            
-            features = classifier.extract_features(user.id)
-            
-            assert isinstance(features, dict)
-            assert 'reaction_time_mean' in features
-            assert 'accuracy' in features
-            assert 'stress_level_avg' in features
-    
-    def test_model_training(self, classifier, sample_data):
-        """Test model training process"""
-        # Prepare features and labels
-        feature_cols = ['reaction_time_mean', 'reaction_time_std', 'accuracy', 
-                       'hesitation_frequency', 'stress_level_avg', 'decision_consistency']
-        X = sample_data[feature_cols]
-        y = sample_data['mental_health_indicator']
-        
-        # Train model
-        accuracy = classifier.train(X, y)
-        
-        assert accuracy is not None
-        assert 0 <= accuracy <= 1
-        assert classifier.model is not None
-        assert classifier.scaler is not None
-    
-    def test_prediction(self, classifier, sample_data):
-        """Test prediction functionality"""
-        # Train model first
-        feature_cols = ['reaction_time_mean', 'reaction_time_std', 'accuracy', 
-                       'hesitation_frequency', 'stress_level_avg', 'decision_consistency']
-        X = sample_data[feature_cols]
-        y = sample_data['mental_health_indicator']
-        classifier.train(X, y)
-        
-        # Test prediction
-        test_features = {
-            'reaction_time_mean': 300,
-            'reaction_time_std': 60,
-            'accuracy': 0.8,
-            'hesitation_frequency': 0.15,
-            'stress_level_avg': 4,
-            'decision_consistency': 0.75
-        }
-        
-        prediction = classifier.predict(test_features)
-        
-        assert 'class' in prediction
-        assert 'confidence' in prediction
-        assert 'probabilities' in prediction
-        assert 0 <= prediction['confidence'] <= 1
-    
-    def test_model_persistence(self, classifier, sample_data):
-        """Test model saving and loading"""
-        # Train model
-        feature_cols = ['reaction_time_mean', 'reaction_time_std', 'accuracy', 
-                       'hesitation_frequency', 'stress_level_avg', 'decision_consistency']
-        X = sample_data[feature_cols]
-        y = sample_data['mental_health_indicator']
-        classifier.train(X, y)
-        
-        # Save model
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pkl') as tmp:
-            classifier.save_model(tmp.name)
-            
-            # Load model in new instance
-            new_classifier = MentalHealthClassifier()
-            new_classifier.load_model(tmp.name)
-            
-            # Test that loaded model works
-            test_features = {
-                'reaction_time_mean': 300,
-                'reaction_time_std': 60,
-                'accuracy': 0.8,
-                'hesitation_frequency': 0.15,
-                'stress_level_avg': 4,
-                'decision_consistency': 0.75
-            }
-            
-            original_pred = classifier.predict(test_features)
-            loaded_pred = new_classifier.predict(test_features)
-            
-            assert original_pred['class'] == loaded_pred['class']
-            
-            # Cleanup
-            os.unlink(tmp.name)
+    return training_data
 
 class TestBehaviorPredictor:
     """Test cases for BehaviorPredictor"""
@@ -144,110 +54,336 @@ class TestBehaviorPredictor:
     def test_predictor_initialization(self, predictor):
         """Test predictor initialization"""
         assert predictor is not None
-        assert hasattr(predictor, 'anxiety_model')
-        assert hasattr(predictor, 'depression_model')
-        assert hasattr(predictor, 'attention_model')
+        assert set(predictor.models) >= {'anxiety', 'depression', 'attention', 'cluster'}
+        assert len(predictor.feature_names) == 11
+    
+    def test_feature_extraction(self, predictor):
+        """Test feature extraction from a session payload"""
+        features = predictor.extract_features(SAMPLE_BEHAVIORAL_DATA)
+        
+        assert features.shape == (len(predictor.feature_names),)
+        assert features[0] == pytest.approx(np.mean(SAMPLE_BEHAVIORAL_DATA['reactionTimes']))
+        assert features[2] == pytest.approx(0.82)
+        assert features[3] == 2
+        
+        # Unusable payloads give an all-zero vector
+        assert not predictor.extract_features({'reactionTimes': 'garbage'}).any()
+    
+    def test_feature_extraction_zero_reaction_times(self, predictor, capsys):
+        """Test all-zero reaction times keep the other features"""
+        features = predictor.extract_features(SAMPLE_BEHAVIORAL_DATA | {'reactionTimes': [0] * 6})
+        
+        assert features[7] == 0.0
+        assert features[2] == pytest.approx(0.82)
+        assert features[3] == 2
+        assert capsys.readouterr().out == ''
     
-    def test_anxiety_prediction(self, predictor, app, auth_client):
+    def test_anxiety_prediction(self, predictor):
         """Test anxiety indicator prediction"""
-        client, user = auth_client
-        
-        with app.app_context():
-            # Create test data indicating anxiety patterns
-            for i in range(5):
-                session = TestHelpers.create_test_session(user.id, 'decision_maker')
-                behavior = BehaviorData(
-                    user_id=user.id,
-                    session_id=session.id,
-                    reaction_time=400 + i*50,  # High reaction times
-                    hesitation_time=150 + i*20,  # High hesitation
-                    stress_level=7 + i,  # High stress
-                    decision_type='avoidant_choice',
-                    accuracy=False
-                )
-                db.session.add(behavior)
-            
-            db.session.commit()
-            
-            anxiety_indicators = predictor.predict_anxiety_indicators(user.id)
-            
-            assert isinstance(anxiety_indicators, dict)
-            assert 'high_reaction_time_variance' in anxiety_indicators
-            assert 'frequent_hesitation' in anxiety_indicators
-            assert 'avoidant_choices' in anxiety_indicators
+        calm = predictor.predict_anxiety(SAMPLE_BEHAVIORAL_DATA)
+        anxious = predictor.predict_anxiety(ANXIOUS_BEHAVIORAL_DATA)
+        
+        assert 0 <= calm <= 100
+        assert anxious > calm
     
-    def test_depression_prediction(self, predictor, app, auth_client):
+    def test_depression_prediction(self, predictor):
         """Test depression indicator prediction"""
-        client, user = auth_client
-        
-        with app.app_context():
-            # Create test data indicating depression patterns
-            for i in range(5):
-                session = TestHelpers.create_test_session(user.id, 'catch_thought', score=50-i*5)  # Declining performance
-                behavior = BehaviorData(
-                    user_id=user.id,
-                    session_id=session.id,
-                    reaction_time=300,
-                    stress_level=2,  # Low engagement
-                    decision_type='pessimistic_choice',
-                    emotional_state='sad',
-                    accuracy=i < 2  # Declining accuracy
-                )
-                db.session.add(behavior)
-            
-            db.session.commit()
+        calm = predictor.predict_depression(SAMPLE_BEHAVIORAL_DATA)
+        anxious = predictor.predict_depression(ANXIOUS_BEHAVIORAL_DATA)
+        
+        assert 0 <= calm <= 100
+        assert anxious > calm
+    
+    @pytest.mark.parametrize('behavioral_data, expected_anxiety, expected_cluster', [
+        # Accuracy of exactly 70% is not below the 0.7 low-accuracy threshold
+        ({'reactionTimes': [400.0, 420.0], 'accuracy': 70, 'totalClicks': 10}, 0.0, 'erratic'),
+        # Accuracy of exactly 80% is not above the 0.8 fast_accurate threshold
+        ({'reactionTimes': [400.0, 420.0], 'accuracy': 80, 'totalClicks': 10}, 0.0, 'erratic'),
+        # A negative bias of exactly 0.2 is not above the 0.2 threshold
+        ({'reactionTimes': [400.0, 420.0], 'accuracy': 90, 'totalClicks': 10,
+          'emotionalChoices': [2, 8, 0]}, 0.0, 'fast_accurate'),
+    ])
+    def test_rule_thresholds_at_boundaries(self, predictor, behavioral_data, expected_anxiety, expected_cluster):
+        """Test values on a rule threshold score as the float64 baseline did"""
+        assert predictor.predict_anxiety(behavioral_data) == expected_anxiety
+        assert predictor.predict_depression(behavioral_data) == 0.0
+        assert predictor.predict_attention(behavioral_data) == 59.523809523809526
+        assert predictor.predict_cluster(behavioral_data) == expected_cluster
+    
+    def test_model_training(self, predictor):
+        """Test model training process"""
+        predictor.train_models(make_training_data())
+        
+        assert hasattr(predictor.models['anxiety'], 'feature_importances_')
+        assert hasattr(predictor.models['cluster'], 'cluster_centers_')
+        assert 0 <= predictor.predict_anxiety(SAMPLE_BEHAVIORAL_DATA) <= 100
+        assert predictor.predict_cluster(SAMPLE_BEHAVIORAL_DATA) in BEHAVIOR_CLUSTER_NAMES
+    
+    def test_cached_scaling_matches_scaler(self, predictor):
+        """Test the cached affine scaling against StandardScaler.transform"""
+        predictor.train_models(make_training_data())
+        features = np.stack([predictor.extract_features(d['behavioral_data']) for d in make_training_data(12)])
+        
+        for model_name in ('anxiety', 'depression', 'attention', 'cluster'):
+            np.testing.assert_allclose(
+                predictor._scale(model_name, features),
+                predictor.scalers[model_name].transform(features),
+                rtol=1e-12, atol=1e-12
+            )
+    
+    def test_model_persistence(self, predictor):
+        """Test model saving and loading"""
+        predictor.train_models(make_training_data())
+        
+        with tempfile.TemporaryDirectory() as model_dir:
+            predictor.save_models(model_dir)
             
-            depression_indicators = predictor.predict_depression_indicators(user.id)
+            # Load models in new instance
+            loaded = BehaviorPredictor()
+            loaded.load_models(model_dir)
             
-            assert isinstance(depression_indicators, dict)
-            assert 'low_engagement' in depression_indicators
-            assert 'pessimistic_choices' in depression_indicators
+            assert loaded.predict_anxiety(SAMPLE_BEHAVIORAL_DATA) == pytest.approx(
+                predictor.predict_anxiety(SAMPLE_BEHAVIORAL_DATA)
+            )
+            assert loaded.predict_cluster(SAMPLE_BEHAVIORAL_DATA) == predictor.predict_cluster(SAMPLE_BEHAVIORAL_DATA)
+    
+    @pytest.mark.parametrize('trained', [False, True], ids=['rule_based', 'trained'])
+    @pytest.mark.parametrize('n_sessions', [12, 80])
+    def test_predict_batch_matches_single_predictions(self, predictor, trained, n_sessions):
+        """Test each predict_batch row equals the per-session predictions"""
+        if trained:
+            predictor.train_models(make_training_data())
+        features = np.stack([
+            predictor.extract_features(d['behavioral_data']) for d in make_training_data(n_sessions)
+        ])
+        
+        # Batches of 64+ rows sum the trees on several threads in completion
+        # order, so the last bits of a trained score may differ
+        batch = predictor.predict_batch(features)
+        for i, row in enumerate(features):
+            assert batch['anxiety'][i] == pytest.approx(predictor.predict_anxiety_from_features(row), rel=1e-12)
+            assert batch['depression'][i] == pytest.approx(predictor.predict_depression_from_features(row), rel=1e-12)
+            assert batch['attention'][i] == pytest.approx(predictor.predict_attention_from_features(row), rel=1e-12)
+            assert batch['cluster'][i] == predictor.predict_cluster_from_features(row)
+    
+    def predictions(self, predictor, behavioral_data):
+        """Uncached predictions for one session"""
+        features = predictor.extract_features(behavioral_data)
+        return (
+            predictor.predict_anxiety_from_features(features),
+            predictor.predict_depression_from_features(features),
+            predictor.predict_attention_from_features(features),
+            predictor.predict_cluster_from_features(features)
+        )
+    
+    def test_prediction_cache(self, predictor):
+        """Test session predictions are cached until the models change"""
+        first = predictor.predict_session(ANXIOUS_BEHAVIORAL_DATA)
+        assert first == self.predictions(predictor, ANXIOUS_BEHAVIORAL_DATA)
+        assert predictor.predict_session(dict(ANXIOUS_BEHAVIORAL_DATA)) is first
+        
+        # Training replaces the rule-based predictions
+        predictor.train_models(make_training_data())
+        trained = predictor.predict_session(ANXIOUS_BEHAVIORAL_DATA)
+        assert trained is not first
+        assert trained == self.predictions(predictor, ANXIOUS_BEHAVIORAL_DATA)
+        
+        with tempfile.TemporaryDirectory() as model_dir:
+            predictor.save_models(model_dir)
+            predictor.load_models(model_dir)
+        assert predictor.predict_session(ANXIOUS_BEHAVIORAL_DATA) is not trained
+    
+    def test_analyzer_predictions_follow_training(self):
+        """Test analyses pick up retrained models instead of cached predictions"""
+        analyzer = BehaviorAnalyzer()
+        before = analyzer.analyze_session(ANXIOUS_BEHAVIORAL_DATA, detail='scores')
+        
+        analyzer.predictor.train_models(make_training_data())
+        anxiety, depression, attention, cluster = self.predictions(analyzer.predictor, ANXIOUS_BEHAVIORAL_DATA)
+        
+        # The full analysis is not cached yet, so it runs on the trained models
+        result = analyzer.analyze_session(ANXIOUS_BEHAVIORAL_DATA)
+        assert result['anxiety_score'] == round(anxiety, 2)
+        assert result['predicted_cluster'] == cluster
+        assert result['anxiety_score'] != before['anxiety_score']
 
-class TestAttentionAnalyzer:
-    """Test cases for AttentionAnalyzer"""
+class TestBehaviorAnalyzer:
+    """Test cases for BehaviorAnalyzer"""
     
     @pytest.fixture
     def analyzer(self):
         """Create analyzer instance for testing"""
-        return AttentionAnalyzer()
+        return BehaviorAnalyzer()
     
-    def test_analyzer_initialization(self, analyzer):
-        """Test analyzer initialization"""
-        assert analyzer is not None
-        assert hasattr(analyzer, 'attention_threshold')
-        assert hasattr(analyzer, 'consistency_threshold')
+    def test_analyze_session(self, analyzer):
+        """Test a full session analysis"""
+        result = analyzer.analyze_session(SAMPLE_BEHAVIORAL_DATA)
+        
+        for key in ('anxiety_score', 'depression_score', 'attention_score', 'predicted_cluster',
+                    'risk_level', 'detailed_metrics', 'insights', 'recommendations', 'analysis_timestamp'):
+            assert key in result
+        assert result['detailed_metrics']['error_rate'] == pytest.approx(6 / 40)
     
-    def test_attention_pattern_detection(self, analyzer, app, auth_client):
-        """Test attention pattern detection"""
-        client, user = auth_client
+    def test_analyze_session_scores_only(self, analyzer):
+        """Test detail='scores' skips insights and recommendations"""
+        result = analyzer.analyze_session(SAMPLE_BEHAVIORAL_DATA, detail='scores')
         
-        with app.app_context():
-            # Create test data with attention issues
-            reaction_times = [200, 500, 180, 600, 190, 550, 175, 580]  # Inconsistent
-            
-            for i, rt in enumerate(reaction_times):
-                session = TestHelpers.create_test_session(user.id, 'catch_thought')
-                behavior = BehaviorData(
-                    user_id=user.id,
-                    session_id=session.id,
-                    reaction_time=rt,
-                    accuracy=rt < 300,  # Accuracy correlates with reaction time
-                    game_level=1,
-                    game_phase=f'phase_{i%3}'
-                )
-                db.session.add(behavior)
-            
-            db.session.commit()
-            
-            attention_patterns = analyzer.analyze_attention_patterns(user.id)
-            
-            assert isinstance(attention_patterns, dict)
-            assert 'inconsistent_performance' in attention_patterns
-            assert 'attention_lapses' in attention_patterns
+        assert 'insights' not in result
+        assert 'detailed_metrics' not in result
+        assert result['anxiety_score'] == analyzer.analyze_session(SAMPLE_BEHAVIORAL_DATA)['anxiety_score']
+        
+        with pytest.raises(ValueError):
+            analyzer.analyze_session(SAMPLE_BEHAVIORAL_DATA, detail='everything')
+    
+    def test_cached_results_are_independent(self, analyzer):
+        """Test mutating one caller's result leaves later results untouched"""
+        first = analyzer.analyze_session(ANXIOUS_BEHAVIORAL_DATA)
+        expected = analyzer._analyze_session(ANXIOUS_BEHAVIORAL_DATA)
+        
+        first['insights'].clear()
+        first['recommendations'].append({'text': 'injected'})
+        first['detailed_metrics']['accuracy'] = -1
+        
+        second = analyzer.analyze_session(ANXIOUS_BEHAVIORAL_DATA)
+        assert {k: v for k, v in second.items() if k != 'analysis_timestamp'} == expected
+        for batch_result in analyzer.analyze_sessions([ANXIOUS_BEHAVIORAL_DATA] * 2):
+            assert batch_result['insights'] is not second['insights']
+            assert batch_result['insights'] == expected['insights']
+    
+    def test_cache_cleared_when_models_change(self, analyzer):
+        """Test cached analyses are dropped once the predictor's models change"""
+        before = analyzer.analyze_session(ANXIOUS_BEHAVIORAL_DATA, detail='scores')
+        
+        analyzer.predictor.train_models(make_training_data())
+        after = analyzer.analyze_session(ANXIOUS_BEHAVIORAL_DATA, detail='scores')
+        assert after['anxiety_score'] != before['anxiety_score']
+        
+        with tempfile.TemporaryDirectory() as model_dir:
+            analyzer.predictor.save_models(model_dir)
+            analyzer.predictor.load_models(model_dir)
+        assert analyzer.analyze_session(ANXIOUS_BEHAVIORAL_DATA, detail='scores')['anxiety_score'] == pytest.approx(
+            after['anxiety_score']
+        )
+        assert analyzer._session_cache_version == analyzer.predictor.model_version
+    
+    def test_reaction_time_stats_match_numpy(self):
+        """Test the one-partition statistics equal the NumPy calls they replaced"""
+        rng = np.random.default_rng(7)
+        for size in list(range(1, 12)) + [25, 64, 129, 300]:
+            rt = rng.normal(700, 300, size=size).clip(100)
+            assert _reaction_time_stats(rt) == (
+                float(np.min(rt)), float(np.percentile(rt, 25)), float(np.median(rt)),
+                float(np.percentile(rt, 75)), float(np.max(rt)), float(np.mean(rt)), float(np.std(rt))
+            )
+    
+    def test_analyze_sessions_matches_analyze_session(self):
+        """Test batch analysis gives each session's analyze_session result"""
+        batch = [d['behavioral_data'] for d in make_training_data(12)] + [
+            SAMPLE_BEHAVIORAL_DATA,
+            ANXIOUS_BEHAVIORAL_DATA | {'reactionTimes': [650.0, 700.0, 2400.0]},
+            {'accuracy': 90, 'totalClicks': 10, 'mistakes': 1},
+            orjson.dumps(ANXIOUS_BEHAVIORAL_DATA)
+        ]
+        
+        # Separate analyzers, so neither path is answered from the other's cache
+        batch_results = BehaviorAnalyzer().analyze_sessions(batch)
+        single = BehaviorAnalyzer()
+        for data, batch_result in zip(batch, batch_results):
+            result = single.analyze_session(data)
+            del result['analysis_timestamp'], batch_result['analysis_timestamp']
+            assert batch_result == result
+        
+        scores_only = BehaviorAnalyzer().analyze_sessions(batch, detail='scores')
+        for data, batch_result in zip(batch, scores_only):
+            result = single.analyze_session(data, detail='scores')
+            del result['analysis_timestamp'], batch_result['analysis_timestamp']
+            assert batch_result == result
+    
+    def test_batch_reaction_time_stats_match_single(self):
+        """Test the padded batch statistics equal _reaction_time_stats per array"""
+        rng = np.random.default_rng(11)
+        arrays = [rng.normal(700, 300, size=size).clip(100) for size in (1, 2, 3, 7, 8, 9, 40, 0, 129)]
+        
+        for rt, stats in zip(arrays, _batch_reaction_time_stats(arrays)):
+            assert stats == (_reaction_time_stats(rt) if rt.size else None)
+    
+    @pytest.mark.parametrize('reaction_times', [[0], [0] * 6, [0.0, 0.0, 0.0], [0] * 10])
+    def test_zero_reaction_times(self, reaction_times):
+        """Test all-zero reaction times analyze instead of dividing by a zero mean"""
+        data = SAMPLE_BEHAVIORAL_DATA | {'reactionTimes': reaction_times}
+        
+        result = BehaviorAnalyzer().analyze_session(data)
+        assert result['detailed_metrics']['reaction_consistency'] == 0
+        
+        # The batch path used by analyze-pending takes the same guard
+        batch = BehaviorAnalyzer().analyze_sessions([data, SAMPLE_BEHAVIORAL_DATA])
+        assert batch[0]['detailed_metrics'] == result['detailed_metrics']
+    
+    @pytest.mark.parametrize('rt', [
+        np.random.default_rng(3).normal(450.0, 120.0, 40),
+        np.random.default_rng(4).normal(1e6, 1.0, 40),
+        np.zeros(10)
+    ], ids=['typical', 'large_offset', 'zeros'])
+    def test_detailed_metrics_kernel_matches_numpy(self, rt):
+        """Test the loop kernel's chunk consistency matches np.std, without cancellation"""
+        hes = np.array([1200.0, 900.0])
+        kernel = _detailed_metrics_kernel(rt, rt[:10], hes, 800.0)
+        reference = _detailed_metrics_numpy(rt, rt[:10], hes, 800.0)
+        
+        assert kernel[:3] == reference[:3]
+        assert kernel[3] == pytest.approx(reference[3], rel=1e-12, abs=1e-15)
+        assert kernel[4:] == pytest.approx(reference[4:])
     
     def test_consistency_scoring(self, analyzer):
-        """Test consistency scoring algorithm"""
-        # Test data with different consistency patterns
-        consistent_data = [200, 210, 195, 205, 198, 202, 190, 208]
-        inconsistent_data = [200, 400, 150, 500, 180, 450, 170, 520]
+        """Test steadier reaction times score as more consistent"""
+        consistent = analyzer.analyze_session(SAMPLE_BEHAVIORAL_DATA | {'reactionTimes': [200, 210, 195, 205, 198, 202, 190, 208]})
+        inconsistent = analyzer.analyze_session(SAMPLE_BEHAVIORAL_DATA | {'reactionTimes': [200, 400, 150, 500, 180, 450, 170, 520]})
+        
+        assert consistent['detailed_metrics']['reaction_consistency'] > inconsistent['detailed_metrics']['reaction_consistency']
+    
+    def test_attention_pattern_detection(self, analyzer):
+        """Test attention lapses are detected in inconsistent sessions"""
+        consistent = analyzer._calculate_detailed_metrics({'reactionTimes': [200, 210, 195, 205, 198, 202, 190, 208]})
+        inconsistent = analyzer._calculate_detailed_metrics({'reactionTimes': [200, 210, 195, 205, 198, 202, 190, 2500]})
+        
+        assert consistent['attention_lapse_frequency'] == 0
+        assert inconsistent['attention_lapse_frequency'] == pytest.approx(1 / 8)
+        assert inconsistent['reaction_consistency'] < consistent['reaction_consistency']
+    
+    def test_analyze_stored_session(self, analyzer, sample_game_session):
+        """Test analyzing the game_data stored on a session row"""
+        result = analyzer.analyze_session(sample_game_session.game_data)
+        
+        assert result['anxiety_score'] == analyzer.analyze_session(SAMPLE_BEHAVIORAL_DATA)['anxiety_score']
+
+class TestSessionMetrics:
+    """Test cases for session metric reductions"""
+    
+    def test_session_metrics(self):
+        """Test average reaction time, accuracy and consistency"""
+        performance_data = [
+            {'reaction_time': 250.0, 'accuracy': 1.0},
+            {'reaction_time': 300.0, 'accuracy': 0.0},
+            {'reaction_time': 410.0, 'accuracy': 1.0},
+            {'reaction_time': 320.0, 'accuracy': 1.0}
+        ]
+        reaction_times = np.asarray([d['reaction_time'] for d in performance_data], dtype=np.float64)
+        accuracies = np.asarray([d['accuracy'] for d in performance_data], dtype=np.float64)
+        
+        avg_reaction_time, accuracy, consistency = compute_session_metrics(reaction_times, accuracies)
+        
+        assert avg_reaction_time == pytest.approx(np.mean(reaction_times))
+        assert accuracy == pytest.approx(0.75)
+        assert consistency == pytest.approx(1 - np.std(reaction_times) / np.mean(reaction_times))
+    
+    def test_session_metrics_skips_missing_values(self):
+        """Test that missing reaction times and accuracies are ignored"""
+        avg_reaction_time, accuracy, consistency = compute_session_metrics(
+            [0.0, np.nan, 400.0], [np.nan, 0.5, np.nan]
+        )
+        
+        assert avg_reaction_time == pytest.approx(400.0)
+        assert accuracy == pytest.approx(0.5)
+        assert consistency == pytest.approx(1.0)
         
+        assert compute_session_metrics([], []) == (0.0, 0.0, 0.0)
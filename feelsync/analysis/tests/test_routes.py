@@ -1,488 +1,642 @@
 import pytest
-import json
-from flask import url_for
-from models.database_models import db, User, GameSession, BehaviorData, AnalysisReport
-from tests import TestHelpers, SAMPLE_USER_DATA, SAMPLE_GAME_DATA
+import jwt
+from datetime import datetime, timedelta
+from sqlalchemy import inspect
+from app import app as flask_app, decode_token, get_behavior_analyzer, issue_access_token
+from models.database_models import db, User, GameSession, BehaviorAnalysis, RefreshToken
+from tests import TestHelpers, SAMPLE_USER_DATA, SAMPLE_GAME_DATA, SAMPLE_BEHAVIORAL_DATA
 
 class TestAuthRoutes:
     """Test authentication routes"""
     
     def test_registration_page_loads(self, client):
         """Test registration page loads correctly"""
-        response = client.get('/auth/register')
+        response = client.get('/register')
         assert response.status_code == 200
-        assert b'Register' in response.data
+        assert b'Create Account' in response.data
     
-    def test_successful_registration(self, client, app):
+    def test_successful_registration(self, client):
         """Test successful user registration"""
-        with app.app_context():
-            response = client.post('/auth/register', data={
-                'username': 'newuser',
-                'email': 'newuser@example.com',
-                'password': 'TestPassword123',
-                'confirm_password': 'TestPassword123',
-                'age': 20,
-                'gender': 'other'
-            })
-            
-            # Should redirect to login page
-            assert response.status_code == 302
-            
-            # Check user was created
-            user = User.query.filter_by(username='newuser').first()
-            assert user is not None
-            assert user.email == 'newuser@example.com'
-            assert user.age == 20
+        response = client.post('/register', json=SAMPLE_USER_DATA | {'consent': True})
+        
+        assert response.status_code == 200
+        data = response.get_json()
+        assert 'token' in data
+        assert client.get_cookie('refresh_token', path='/api/refresh') is not None
+        
+        # Check user was created
+        user = User.query.filter_by(username='testuser').first()
+        assert user is not None
+        assert user.id == data['user_id']
+        assert user.email == 'test@example.com'
+        assert user.age == 20
+        assert user.consent_given is True
     
     def test_registration_validation(self, client):
-        """Test registration form validation"""
-        # Test password mismatch
-        response = client.post('/auth/register', data={
-            'username': 'testuser',
-            'email': 'test@example.com',
-            'password': 'TestPassword123',
-            'confirm_password': 'DifferentPassword',
-            'age': 20
+        """Test registration payload validation"""
+        # Missing password
+        response = client.post('/register', json={'username': 'testuser', 'email': 'test@example.com'})
+        assert response.status_code == 400
+        assert 'Missing' in response.get_json()['error']
+        
+        # Invalid email
+        response = client.post('/register', json=SAMPLE_USER_DATA | {'email': 'invalid-email'})
+        assert response.status_code == 400
+        assert 'email' in response.get_json()['error']
+        
+        # Short password
+        response = client.post('/register', json=SAMPLE_USER_DATA | {'password': 'short'})
+        assert response.status_code == 400
+        assert '8 characters' in response.get_json()['error']
+        
+        # Age must be a number
+        response = client.post('/register', json=SAMPLE_USER_DATA | {'age': 'ten'})
+        assert response.status_code == 400
+        assert 'Age' in response.get_json()['error']
+        
+        # Duplicate email
+        TestHelpers.create_test_user()
+        response = client.post('/register', json=SAMPLE_USER_DATA | {'username': 'other'})
+        assert response.status_code == 400
+        assert 'already registered' in response.get_json()['error']
+    
+    def test_minor_registration_consent(self, client):
+        """Test minors keep the parental consent they registered with"""
+        client.post('/register', data=SAMPLE_USER_DATA | {
+            'username': 'minoruser',
+            'email': 'minor@example.com',
+            'age': '16',
+            'parental_consent': 'false'
         })
-        assert response.status_code == 200
-        assert b'Passwords do not match' in response.data
-        
-        # Test invalid email
-        response = client.post('/auth/register', data={
-            'username': 'testuser',
-            'email': 'invalid-email',
-            'password': 'TestPassword123',
-            'confirm_password': 'TestPassword123',
-            'age': 20
+        client.post('/register', data=SAMPLE_USER_DATA | {'age': '20'})
+        
+        minor = User.query.filter_by(username='minoruser').first()
+        adult = User.query.filter_by(username='testuser').first()
+        assert minor.parental_consent is False
+        assert minor.can_participate() is False
+        assert adult.parental_consent is True
+    
+    def test_login_success(self, client):
+        """Test successful login"""
+        TestHelpers.create_test_user()
+        
+        # Form logins land on the dashboard
+        response = client.post('/login', data={
+            'email': 'test@example.com',
+            'password': 'TestPassword123'
         })
-        assert response.status_code == 200
-        assert b'valid email' in response.data
+        assert response.status_code == 302
         
-        # Test age requirement
-        response = client.post('/auth/register', data={
-            'username': 'testuser',
+        # API logins get an access token
+        response = client.post('/login', json={
             'email': 'test@example.com',
-            'password': 'TestPassword123',
-            'confirm_password': 'TestPassword123',
-            'age': 10
+            'password': 'TestPassword123'
         })
         assert response.status_code == 200
-        assert b'at least' in response.data
-    
-    def test_minor_registration_consent(self, client, app):
-        """Test minor registration requiring parental consent"""
-        with app.app_context():
-            # Register minor
-            response = client.post('/auth/register', data={
-                'username': 'minoruser',
-                'email': 'minor@example.com',
-                'password': 'TestPassword123',
-                'confirm_password': 'TestPassword123',
-                'age': 16,
-                'gender': 'other'
-            })
-            
-            # Should redirect to consent page
-            assert response.status_code == 302
-            
-            # Follow redirect to consent page
-            response = client.get(response.location, follow_redirects=True)
-            assert b'parental consent' in response.data.lower()
-    
-    def test_login_success(self, client, app):
-        """Test successful login"""
-        with app.app_context():
-            # Create user first
-            user = TestHelpers.create_test_user()
-            
-            response = client.post('/auth/login', data={
-                'username_or_email': 'testuser',
-                'password': 'TestPassword123'
-            })
-            
-            assert response.status_code == 302  # Redirect after login
+        assert 'token' in response.get_json()
     
     def test_login_failure(self, client):
         """Test login with invalid credentials"""
-        response = client.post('/auth/login', data={
-            'username_or_email': 'nonexistent',
+        response = client.post('/login', json={
+            'email': 'nonexistent@example.com',
             'password': 'wrongpassword'
         })
         
-        assert response.status_code == 200
-        assert b'Invalid username' in response.data or b'Invalid' in response.data
+        assert response.status_code == 401
+        assert 'Invalid' in response.get_json()['error']
     
-    def test_logout(self, client, app, auth_client):
+    def test_logout(self, auth_client):
         """Test user logout"""
-        auth_client_obj, user = auth_client
+        client, user = auth_client
         
-        response = auth_client_obj.get('/auth/logout')
+        response = client.get('/logout')
         assert response.status_code == 302  # Redirect after logout
         
         # Try to access protected page
-        response = auth_client_obj.get('/dashboard/')
+        response = client.get('/dashboard')
         assert response.status_code == 302  # Should redirect to login
 
-class TestGameRoutes:
-    """Test game-related routes"""
+class TestTokenChecks:
+    """Test the bearer token fast paths against plain PyJWT"""
     
-    def test_games_menu_requires_auth(self, client):
-        """Test games menu requires authentication"""
-        response = client.get('/games/')
-        assert response.status_code == 302  # Redirect to login
+    def status_for(self, client, token):
+        """Status of an authenticated API call made with token"""
+        return client.get('/api/analysis/latest', headers={'Authorization': f'Bearer {token}'}).status_code
     
-    def test_games_menu_authenticated(self, app, auth_client):
-        """Test games menu with authentication"""
-        client, user = auth_client
+    def test_precheck_rejects_only_undecodable_tokens(self, client, _auth_user):
+        """Tokens failing the structural pre-check are ones jwt.decode rejects too"""
+        valid = issue_access_token(_auth_user[0].id)
+        header, payload, signature = valid.split('.')
+        candidates = [
+            valid,
+            '',
+            'not-a-token',
+            f'{header}.{payload}',
+            f'{valid}.{signature}',
+            f'{header}..{payload}.{signature}',
+            f'!{valid}',
+            f'{header}={"=" * 2}.{payload}.{signature}',
+            f'.{payload}.{signature}',
+            f'{header}.{payload}.{signature[::-1]}'
+        ]
+        
+        for token in candidates:
+            try:
+                jwt.decode(token, flask_app.config['SECRET_KEY'], algorithms=['HS256'])
+                decodable = True
+            except jwt.InvalidTokenError:
+                decodable = False
+            
+            # Valid tokens reach the route (202: no analyses yet), the rest are refused
+            assert self.status_for(client, token) == (202 if decodable else 401), token
+    
+    def test_decode_matches_pyjwt(self, _auth_user):
+        """The shared decoder returns jwt.decode's payload and insists on exp"""
+        secret = flask_app.config['SECRET_KEY']
+        token = issue_access_token(_auth_user[0].id)
         
-        response = client.get('/games/')
+        expected = jwt.decode(token, secret, algorithms=['HS256'])
+        assert decode_token(token) == expected
+        # A second decode is served from the validation cache
+        assert decode_token(token) == expected
+        
+        expired = jwt.encode({'user_id': _auth_user[0].id, 'exp': datetime.utcnow() - timedelta(seconds=1)}, secret)
+        without_exp = jwt.encode({'user_id': _auth_user[0].id}, secret)
+        wrong_key = jwt.encode({'user_id': _auth_user[0].id, 'exp': datetime.utcnow() + timedelta(minutes=5)}, 'other')
+        for token in (expired, wrong_key):
+            with pytest.raises(jwt.InvalidTokenError):
+                jwt.decode(token, secret, algorithms=['HS256'])
+            with pytest.raises(jwt.InvalidTokenError):
+                decode_token(token)
+        
+        # Tokens we issue always carry exp, so one without it is refused
+        with pytest.raises(jwt.MissingRequiredClaimError):
+            decode_token(without_exp)
+    
+    def test_issued_token_matches_pyjwt(self, _auth_user):
+        """issue_access_token signs the same token jwt.encode would"""
+        secret = flask_app.config['SECRET_KEY']
+        token = issue_access_token(_auth_user[0].id)
+        
+        payload = jwt.decode(token, secret, algorithms=['HS256'])
+        assert set(payload) == {'user_id', 'exp'}
+        assert token == jwt.encode(payload, secret, algorithm='HS256')
+
+class TestRefreshTokens:
+    """Test refresh token rotation and revocation"""
+    
+    def login(self, client):
+        """Log a fresh user in through the API and return the refresh cookie"""
+        TestHelpers.create_test_user()
+        client.post('/login', json={
+            'email': 'test@example.com',
+            'password': 'TestPassword123'
+        })
+        return client.get_cookie('refresh_token', path='/api/refresh').value
+    
+    def test_refresh_rotates_token(self, client):
+        """Each refresh revokes the presented token and issues one in the same family"""
+        first = self.login(client)
+        
+        response = client.post('/api/refresh')
         assert response.status_code == 200
-        assert b'catch_thought' in response.data or b'Catch the Thought' in response.data
+        assert 'token' in response.get_json()
+        second = client.get_cookie('refresh_token', path='/api/refresh').value
+        assert second != first
+        
+        tokens = RefreshToken.query.order_by(RefreshToken.created_at).all()[-2:]
+        assert [token.revoked for token in tokens] == [True, False]
+        assert tokens[0].family == tokens[1].family
     
-    def test_game_pages_load(self, app, auth_client):
-        """Test individual game pages load"""
-        client, user = auth_client
+    def test_refresh_reuse_revokes_family(self, client):
+        """Presenting an already-rotated token revokes the whole chain"""
+        first = self.login(client)
+        client.post('/api/refresh')
+        user = User.query.filter_by(username='testuser').one()
+        family = user.refresh_tokens[0].family
+        
+        # Replay the rotated token
+        client.set_cookie('refresh_token', first, path='/api/refresh')
+        response = client.post('/api/refresh')
+        assert response.status_code == 401
+        assert RefreshToken.query.filter_by(family=family, revoked=False).count() == 0
+        
+        # The stolen chain's newest token no longer works either
+        assert client.post('/api/refresh').status_code == 401
+    
+    def test_refresh_requires_cookie(self, client):
+        """Refreshing without the cookie is rejected"""
+        response = client.post('/api/refresh')
+        assert response.status_code == 401
+    
+    def test_logout_revokes_family(self, client):
+        """Logout revokes the login's token family and deletes the refresh cookie"""
+        token = self.login(client)
+        client.post('/api/refresh')
+        
+        response = client.get('/logout')
+        assert response.status_code == 302
+        assert client.get_cookie('refresh_token', path='/api/refresh') is None
+        
+        user = User.query.filter_by(username='testuser').one()
+        assert RefreshToken.query.filter_by(user_id=user.id, revoked=False).count() == 0
+        
+        # A copy of the cookie kept from before logout is dead
+        client.set_cookie('refresh_token', token, path='/api/refresh')
+        assert client.post('/api/refresh').status_code == 401
+    
+    def test_logout_after_registration_revokes_family(self, client):
+        """Logout revokes the token family issued at registration"""
+        client.post('/register', json=SAMPLE_USER_DATA | {'consent': True})
+        token = client.get_cookie('refresh_token', path='/api/refresh').value
+        client.post('/api/refresh')
         
-        game_routes = ['/games/catch_thought', '/games/stat_balance', '/games/decision_maker']
+        client.get('/logout')
         
-        for route in game_routes:
+        user = User.query.filter_by(username='testuser').one()
+        assert RefreshToken.query.filter_by(user_id=user.id, revoked=False).count() == 0
+        client.set_cookie('refresh_token', token, path='/api/refresh')
+        assert client.post('/api/refresh').status_code == 401
+    
+    def test_user_deletion_removes_tokens(self, client):
+        """Refresh tokens are deleted with their user"""
+        self.login(client)
+        user = User.query.filter_by(username='testuser').one()
+        user_id = user.id
+        
+        db.session.delete(user)
+        db.session.commit()
+        
+        assert RefreshToken.query.filter_by(user_id=user_id).count() == 0
+
+class TestGameRoutes:
+    """Test game-related routes"""
+    
+    def test_game_pages_require_auth(self, client):
+        """Test game pages require a logged-in session"""
+        for route in ['/games/catch-thought', '/games/stat-balance', '/games/decision-maker']:
             response = client.get(route)
-            assert response.status_code == 200
+            assert response.status_code == 302  # Redirect to login
     
-    def test_start_game_session(self, app, auth_client):
-        """Test starting a game session"""
+    def test_game_pages_load(self, auth_client):
+        """Test individual game pages load"""
         client, user = auth_client
         
-        with app.app_context():
-            response = client.post('/games/start_session',
-                                 json={'game_type': 'catch_thought'},
-                                 content_type='application/json')
-            
+        for route in ['/games/catch-thought', '/games/stat-balance', '/games/decision-maker']:
+            response = client.get(route)
             assert response.status_code == 200
-            data = json.loads(response.data)
-            assert data['success'] is True
-            assert 'session_id' in data
-            
-            # Check session was created in database
-            session = GameSession.query.filter_by(user_id=user.id).first()
-            assert session is not None
-            assert session.game_type == 'catch_thought'
     
-    def test_end_game_session(self, app, auth_client):
-        """Test ending a game session"""
+    def test_start_game_session(self, auth_client):
+        """Test starting a game session"""
         client, user = auth_client
         
-        with app.app_context():
-            # Start session first
-            start_response = client.post('/games/start_session',
-                                       json={'game_type': 'catch_thought'},
-                                       content_type='application/json')
-            start_data = json.loads(start_response.data)
-            session_id = start_data['session_id']
-            
-            # End session
-            end_response = client.post('/games/end_session',
-                                     json={
-                                         'session_id': session_id,
-                                         'final_score': 150,
-                                         'completed': True,
-                                         'accuracy': 0.85,
-                                         'average_reaction_time': 250.5
-                                     },
-                                     content_type='application/json')
-            
-            assert end_response.status_code == 200
-            end_data = json.loads(end_response.data)
-            assert end_data['success'] is True
-            
-            # Check session was updated
-            session = GameSession.query.get(session_id)
-            assert session.score == 150
-            assert session.completed is True
+        response = client.post('/api/games/session', json={'game_type': 'catch_thought'})
+        
+        assert response.status_code == 200
+        data = response.get_json()
+        assert 'session_id' in data
+        
+        # Check session was created in database
+        session = db.session.get(GameSession, data['session_id'])
+        assert session is not None
+        assert session.user_id == user.id
+        assert session.game_type == 'catch_thought'
+        assert session.completed is False
     
-    def test_log_behavior_data(self, app, auth_client):
-        """Test logging behavior data during gameplay"""
-        client, user = auth_client
+    @pytest.mark.parametrize('game_type', ['catch_thought', 'stat_balance', 'decision_maker'])
+    def test_game_flow(self, game_session, game_type, analysis_jobs):
+        """Test the start -> save -> analyze flow for each game type"""
+        client, session_id = game_session
+        game_data = SAMPLE_GAME_DATA[game_type]
         
-        with app.app_context():
-            # Start session first
-            start_response = client.post('/games/start_session',
-                                       json={'game_type': 'decision_maker'},
-                                       content_type='application/json')
-            start_data = json.loads(start_response.data)
-            session_id = start_data['session_id']
-            
-            # Log behavior data
-            response = client.post('/games/log_behavior',
-                                 json={
-                                     'session_id': session_id,
-                                     'reaction_time': 275.5,
-                                     'decision_type': 'assertive_choice',
-                                     'decision_value': 'politely_ask_to_stop',
-                                     'stress_level': 4,
-                                     'accuracy': True
-                                 },
-                                 content_type='application/json')
-            
-            assert response.status_code == 200
-            data = json.loads(response.data)
-            assert data['success'] is True
-            
-            # Check behavior data was stored
-            behavior = BehaviorData.query.filter_by(session_id=session_id).first()
-            assert behavior is not None
-            assert behavior.reaction_time == 275.5
-            assert behavior.decision_type == 'assertive_choice'
-    
-    def test_daily_game_limit(self, app, auth_client):
-        """Test daily game session limit"""
-        client, user = auth_client
+        response = TestHelpers.save_game_data(client, session_id, game_data)
+        assert response.status_code == 200
         
-        with app.app_context():
-            # Mock reaching daily limit
-            current_app.config['MAX_GAMES_PER_DAY'] = 2
-            
-            # Create 2 sessions for today
-            for i in range(2):
-                TestHelpers.create_test_session(user.id, 'catch_thought')
-            
-            # Try to start another session
-            response = client.post('/games/start_session',
-                                 json={'game_type': 'catch_thought'},
-                                 content_type='application/json')
-            
-            assert response.status_code == 429  # Too Many Requests
-            data = json.loads(response.data)
-            assert 'limit reached' in data['error'].lower()
+        # Check session was updated
+        session = db.session.get(GameSession, session_id)
+        assert session.game_type == game_type
+        assert session.score == game_data['final_score']
+        assert session.completed is True
+        
+        # Run the queued background analysis
+        for fn, args in analysis_jobs:
+            fn(*args)
+        
+        analysis = BehaviorAnalysis.query.filter_by(session_id=session_id).one()
+        assert analysis.user_id == session.user_id
     
-    def test_get_game_scenarios(self, app, auth_client):
-        """Test getting game scenarios"""
+    def test_save_game_data(self, auth_client, analysis_jobs):
+        """Test saving a finished game's behavioral data"""
         client, user = auth_client
         
-        response = client.get('/games/get_scenarios/decision_maker')
+        session_id = client.post('/api/games/session', json={'game_type': 'decision_maker'}).get_json()['session_id']
+        response = TestHelpers.save_game_data(client, session_id, SAMPLE_GAME_DATA['decision_maker'])
+        
         assert response.status_code == 200
+        data = response.get_json()
+        assert data['session_id'] == session_id
+        
+        session = db.session.get(GameSession, session_id)
+        assert session.completed is True
+        assert session.score == SAMPLE_GAME_DATA['decision_maker']['final_score']
+        assert session.game_data == SAMPLE_BEHAVIORAL_DATA
         
-        data = json.loads(response.data)
-        assert 'scenarios' in data
-        assert isinstance(data['scenarios'], dict)
+        # Analysis is handed to the background executor
+        assert len(analysis_jobs) == 1
     
-    def test_leaderboard(self, app, auth_client):
-        """Test game leaderboard"""
+    def test_save_game_data_validation(self, auth_client):
+        """Test saving game data rejects bad scores and foreign sessions"""
         client, user = auth_client
         
-        with app.app_context():
-            # Create some completed sessions with scores
-            for i in range(3):
-                session = TestHelpers.create_test_session(user.id, 'catch_thought', score=100+i*50)
-                session.completed = True
-                db.session.commit()
-            
-            response = client.get('/games/leaderboard/catch_thought')
-            assert response.status_code == 200
-            
-            data = json.loads(response.data)
-            assert 'leaderboard' in data
-            assert 'user_best_score' in data
+        session_id = client.post('/api/games/session', json={'game_type': 'catch_thought'}).get_json()['session_id']
+        response = client.post(f'/api/games/session/{session_id}/data', json={'score': 'lots'})
+        assert response.status_code == 400
+        
+        other = TestHelpers.create_test_user('otheruser', 'other@example.com')
+        other_session = TestHelpers.create_test_session(other.id)
+        response = TestHelpers.save_game_data(client, other_session.id, SAMPLE_GAME_DATA['catch_thought'])
+        assert response.status_code == 404
 
 class TestDashboardRoutes:
-    """Test dashboard routes"""
-    
-    def test_dashboard_requires_auth(self, client):
-        """Test dashboard requires authentication"""
-        response = client.get('/dashboard/')
-        assert response.status_code == 302
+    """Test the dashboard pages"""
     
-    def test_dashboard_loads(self, app, auth_client):
-        """Test dashboard loads for authenticated user"""
+    def test_dashboard_loads(self, auth_client):
+        """Test dashboard loads with the user's sessions and latest analysis"""
         client, user = auth_client
         
-        response = client.get('/dashboard/')
+        session = TestHelpers.create_test_session(user.id)
+        TestHelpers.create_test_analysis(user.id, session.id)
+        
+        response = client.get('/dashboard')
         assert response.status_code == 200
-        assert b'dashboard' in response.data.lower() or b'welcome' in response.data.lower()
+        assert b'dashboard' in response.data.lower()
     
-    def test_progress_page(self, app, auth_client):
-        """Test progress tracking page"""
-        client, user = auth_client
+    def test_therapist_dashboard(self, client, auth_client):
+        """Test the therapist dashboard lists recently active users and refuses others"""
+        user_client, user = auth_client
+        TestHelpers.create_test_session(user.id)
         
-        with app.app_context():
-            # Create some test sessions
-            for i in range(3):
-                TestHelpers.create_test_session(user.id, 'catch_thought', score=100+i*25)
-            
-            response = client.get('/dashboard/progress')
-            assert response.status_code == 200
-            assert b'progress' in response.data.lower()
-    
-    def test_insights_insufficient_data(self, app, auth_client):
-        """Test insights page with insufficient data"""
-        client, user = auth_client
+        assert user_client.get('/therapist/dashboard').status_code == 403
         
-        response = client.get('/dashboard/insights', follow_redirects=True)
-        # Should redirect to games if insufficient data
-        assert b'complete at least' in response.data.lower() or b'insights' in response.data.lower()
-    
-    def test_insights_sufficient_data(self, app, auth_client):
-        """Test insights page with sufficient data"""
-        client, user = auth_client
+        therapist = TestHelpers.create_test_user('therapist', 'therapist@example.com', age=40, is_therapist=True)
+        client.post('/login', json={'email': 'therapist@example.com', 'password': 'TestPassword123'})
         
-        with app.app_context():
-            # Create sufficient test data
-            for i in range(5):
-                session = TestHelpers.create_test_session(user.id, 'catch_thought')
-                TestHelpers.create_test_behavior_data(user.id, session.id)
-            
-            response = client.get('/dashboard/insights')
-            assert response.status_code == 200 or response.status_code == 302  # May redirect if no analysis yet
+        response = client.get('/therapist/dashboard')
+        assert response.status_code == 200
 
 class TestAnalysisRoutes:
     """Test analysis routes"""
     
-    def test_analysis_index_insufficient_data(self, app, auth_client):
-        """Test analysis index with insufficient data"""
+    def test_user_analysis(self, auth_client):
+        """Test listing a user's analyses"""
         client, user = auth_client
         
-        response = client.get('/analysis/', follow_redirects=True)
+        session = TestHelpers.create_test_session(user.id)
+        TestHelpers.create_test_analysis(user.id, session.id, anxiety_score=35.0)
+        
+        response = client.get(f'/api/analysis/{user.id}')
         assert response.status_code == 200
-        # Should show message about needing more sessions
+        
+        data = response.get_json()
+        assert len(data) == 1
+        assert data[0]['anxiety_score'] == 35.0
+        assert data[0]['insights'] == ['Test insight']
     
-    def test_generate_analysis_insufficient_data(self, app, auth_client):
-        """Test analysis generation with insufficient data"""
+    def test_user_analysis_scores_only(self, auth_client):
+        """Test ?detail=scores leaves out the insights"""
         client, user = auth_client
         
-        response = client.post('/analysis/generate',
-                             json={'days_back': 30},
-                             content_type='application/json')
+        TestHelpers.create_test_analysis(user.id)
+        
+        data = client.get(f'/api/analysis/{user.id}?detail=scores').get_json()
+        assert 'insights' not in data[0]
         
+        response = client.get(f'/api/analysis/{user.id}?detail=everything')
         assert response.status_code == 400
-        data = json.loads(response.data)
-        assert 'insufficient' in data['error'].lower()
     
-    def test_generate_analysis_sufficient_data(self, app, auth_client):
-        """Test analysis generation with sufficient data"""
+    def test_generate_report(self, auth_client):
+        """Test the report endpoint builds a report from the user's analyses"""
         client, user = auth_client
         
-        with app.app_context():
-            # Create sufficient test data
-            for i in range(5):
-                session = TestHelpers.create_test_session(user.id, 'catch_thought')
-                TestHelpers.create_test_behavior_data(user.id, session.id)
-            
-            # Mock the analysis generation to avoid ML complexity in tests
-            with patch('models.behavior_analyzer.BehaviorAnalyzer.generate_comprehensive_report') as mock_generate:
-                mock_report = AnalysisReport(
-                    user_id=user.id,
-                    report_type='personal',
-                    sessions_analyzed=5,
-                    insights={'test': 'data'},
-                    overall_wellbeing_score=0.75
-                )
-                db.session.add(mock_report)
-                db.session.commit()
-                
-                mock_generate.return_value = mock_report
-                
-                response = client.post('/analysis/generate',
-                                     json={'days_back': 30},
-                                     content_type='application/json')
-                
-                assert response.status_code == 200
-                data = json.loads(response.data)
-                assert data['success'] is True
-    
-    def test_view_report(self, app, auth_client):
-        """Test viewing analysis report"""
+        session = TestHelpers.create_test_session(user.id)
+        TestHelpers.create_test_analysis(user.id, session.id)
+        
+        response = client.get(f'/api/report/{user.id}')
+        assert response.status_code == 200
+        assert response.get_json()
+    
+    def test_therapist_reads_other_user(self, _auth_user):
+        """Test therapists can read another user's analyses and report"""
+        user = _auth_user[0]
+        TestHelpers.create_test_analysis(user.id, anxiety_score=35.0)
+        therapist = TestHelpers.create_test_user('therapist', 'therapist@example.com', age=40, is_therapist=True)
+        headers = TestHelpers.auth_headers(therapist.id)
+        
+        client = flask_app.test_client()
+        response = client.get(f'/api/analysis/{user.id}', headers=headers)
+        assert response.status_code == 200
+        assert response.get_json()[0]['anxiety_score'] == 35.0
+        assert client.get(f'/api/report/{user.id}', headers=headers).status_code == 200
+
+class TestEmotionalChoices:
+    """Test both emotionalChoices payload shapes end to end"""
+    
+    def test_list_and_legacy_dict_payloads_analyze_alike(self, auth_client, analysis_jobs):
+        """Sessions saved with the list and the legacy dict get the same analysis"""
         client, user = auth_client
         
-        with app.app_context():
-            # Create test report
-            report = AnalysisReport(
-                user_id=user.id,
-                report_type='personal',
-                sessions_analyzed=5,
-                insights={'anxiety': {'score': 0.3}, 'depression': {'score': 0.2}},
-                overall_wellbeing_score=0.75,
-                summary='Test report summary'
-            )
-            db.session.add(report)
-            db.session.commit()
-            
-            response = client.get(f'/analysis/report/{report.id}')
-            assert response.status_code == 200
+        session_ids = []
+        for choices in ([1, 2, 3], {'negative': 1, 'neutral': 2, 'positive': 3}):
+            session_id = client.post('/api/games/session', json={'game_type': 'catch_thought'}).get_json()['session_id']
+            TestHelpers.save_game_data(client, session_id, SAMPLE_GAME_DATA['catch_thought'],
+                                       SAMPLE_BEHAVIORAL_DATA | {'emotionalChoices': choices})
+            session_ids.append(session_id)
+        
+        for fn, args in analysis_jobs:
+            fn(*args)
+        
+        list_analysis, dict_analysis = [
+            BehaviorAnalysis.query.filter_by(session_id=session_id).one() for session_id in session_ids
+        ]
+        for score in ('anxiety_score', 'depression_score', 'attention_score', 'impulsivity_score'):
+            assert getattr(list_analysis, score) == getattr(dict_analysis, score)
+        
+        list_metrics = list_analysis.analysis_data['detailed_metrics']
+        dict_metrics = dict_analysis.analysis_data['detailed_metrics']
+        assert list_metrics == dict_metrics
+        assert list_metrics['negative_choice_ratio'] == pytest.approx(1 / 6)
     
-    def test_api_activity_data(self, app, auth_client):
-        """Test activity data API endpoint"""
+    def test_migrate_legacy_dicts(self, runner, auth_client):
+        """flask migrate-emotional-choices rewrites legacy dicts in place"""
         client, user = auth_client
         
-        with app.app_context():
-            # Create test session
-            TestHelpers.create_test_session(user.id, 'catch_thought')
-            
-            response = client.get('/dashboard/api/activity_data?days=7')
-            assert response.status_code == 200
-            
-            data = json.loads(response.data)
-            assert isinstance(data, list)
+        legacy = TestHelpers.create_test_session(
+            user.id, game_data=SAMPLE_BEHAVIORAL_DATA | {'emotionalChoices': {'negative': 4, 'neutral': 0, 'positive': 2}}
+        )
+        current = TestHelpers.create_test_session(user.id, game_data=SAMPLE_BEHAVIORAL_DATA | {'emotionalChoices': [1, 2, 3]})
+        
+        result = runner.invoke(args=['migrate-emotional-choices'])
+        assert 'Migrated 1 sessions' in result.output
+        
+        db.session.expire_all()
+        migrated = db.session.get(GameSession, legacy.id).game_data
+        assert migrated == SAMPLE_BEHAVIORAL_DATA | {'emotionalChoices': [4, 0, 2]}
+        assert db.session.get(GameSession, current.id).game_data['emotionalChoices'] == [1, 2, 3]
+        
+        # Nothing is left to migrate on a second run
+        assert 'Migrated 0 sessions' in runner.invoke(args=['migrate-emotional-choices']).output
+
+class TestBackgroundAnalysis:
+    """Test analyses run off the request and are polled for"""
     
-    def test_api_performance_data(self, app, auth_client):
-        """Test performance data API endpoint"""
+    def test_save_reports_analysis_pending(self, auth_client, analysis_jobs):
+        """Saving answers before the analysis exists; polling returns it once stored"""
         client, user = auth_client
         
-        response = client.get('/dashboard/api/performance_data?game_type=all')
+        session_id = client.post('/api/games/session', json={'game_type': 'catch_thought'}).get_json()['session_id']
+        response = TestHelpers.save_game_data(client, session_id, SAMPLE_GAME_DATA['catch_thought'])
+        assert response.get_json()['analysis_pending'] is True
+        assert analysis_jobs[0][1] == (user.id, session_id, SAMPLE_BEHAVIORAL_DATA)
+        
+        response = client.get(f'/api/analysis/latest?session_id={session_id}')
+        assert response.status_code == 202
+        assert response.get_json() == {'analysis_pending': True}
+        
+        fn, args = analysis_jobs[0]
+        fn(*args)
+        
+        response = client.get(f'/api/analysis/latest?session_id={session_id}')
         assert response.status_code == 200
+        data = response.get_json()
+        assert data['analysis_pending'] is False
+        assert data['session_id'] == session_id
+        assert data['insights']
+    
+    def test_latest_without_analyses_is_pending(self, auth_client):
+        """A user with no analyses gets 202 rather than an error"""
+        client, user = auth_client
+        
+        response = client.get('/api/analysis/latest')
+        assert response.status_code == 202
+        assert response.get_json()['analysis_pending'] is True
+    
+    def test_analyze_pending_backfill(self, runner, auth_client):
+        """flask analyze-pending analyzes completed sessions that have no analysis"""
+        client, user = auth_client
         
-        data = json.loads(response.data)
-        assert isinstance(data, list)
+        analyzed = TestHelpers.create_test_session(user.id)
+        TestHelpers.create_test_analysis(user.id, analyzed.id)
+        pending = TestHelpers.create_test_session(user.id, game_data=SAMPLE_BEHAVIORAL_DATA | {'accuracy': 55})
+        unfinished = GameSession(user_id=user.id, game_type='catch_thought', completed=False)
+        db.session.add(unfinished)
+        db.session.commit()
+        
+        result = runner.invoke(args=['analyze-pending'])
+        assert result.output == 'Analyzed 1 sessions\n'
+        
+        backfilled = BehaviorAnalysis.query.filter_by(session_id=pending.id).one()
+        expected = get_behavior_analyzer().analyze_session(pending.game_data)
+        assert backfilled.user_id == user.id
+        assert backfilled.anxiety_score == expected['anxiety_score']
+        assert backfilled.attention_score == expected['attention_score']
+        assert TestHelpers.analysis_counts([analyzed.id, pending.id, unfinished.id]) == {
+            analyzed.id: 1,
+            pending.id: 1,
+            unfinished.id: 0
+        }
+        
+        # Nothing is left pending on a second run
+        assert runner.invoke(args=['analyze-pending']).output == 'Analyzed 0 sessions\n'
+    
+    def test_analyze_pending_zero_reaction_times(self, runner, auth_client):
+        """A session whose reaction times are all zero doesn't stall the backfill"""
+        client, user = auth_client
+        
+        zero = TestHelpers.create_test_session(user.id, game_data=SAMPLE_BEHAVIORAL_DATA | {'reactionTimes': [0] * 6})
+        other = TestHelpers.create_test_session(user.id)
+        
+        result = runner.invoke(args=['analyze-pending'])
+        assert result.output == 'Analyzed 2 sessions\n'
+        assert TestHelpers.count_analyses(zero.id) == 1
+        assert TestHelpers.count_analyses(other.id) == 1
 
 class TestErrorHandling:
     """Test error handling across routes"""
     
     def test_404_error(self, client):
-        """Test 404 error handling"""
+        """Test unknown pages render the 404 page"""
         response = client.get('/nonexistent-page')
         assert response.status_code == 404
+        assert b'could not be found' in response.data
     
-    def test_invalid_json_request(self, app, auth_client):
+    def test_invalid_json_request(self, auth_client):
         """Test handling of invalid JSON in API requests"""
         client, user = auth_client
         
-        response = client.post('/games/start_session',
+        response = client.post('/api/games/session',
                              data='invalid json',
                              content_type='application/json')
         
-        assert response.status_code == 400 or response.status_code == 500
+        assert response.status_code == 400
     
-    def test_unauthorized_access(self, client, app):
+    def test_unauthorized_access(self, client):
         """Test unauthorized access to protected routes"""
-        protected_routes = [
-            '/dashboard/',
-            '/games/',
-            '/analysis/',
-            '/auth/profile'
-        ]
-        
-        for route in protected_routes:
+        for route in ['/dashboard', '/analysis/personal', '/therapist/dashboard']:
             response = client.get(route)
             assert response.status_code == 302  # Redirect to login
+        
+        response = client.get('/api/analysis/latest')
+        assert response.status_code == 401
+        
+        response = client.get('/api/analysis/latest', headers={'Authorization': 'Bearer not-a-token'})
+        assert response.status_code == 401
     
-    def test_access_other_user_data(self, app, auth_client):
+    def test_access_other_user_data(self, auth_client):
         """Test that users cannot access other users' data"""
         client, user1 = auth_client
         
-        with app.app_context():
-            # Create another user and their report
-            user2 = TestHelpers.create_test_user('otheruser', 'other@example.com')
-            report2 = AnalysisReport(
-                user_id=user2.id,
-                report_type='personal',
-                sessions_analyzed=3,
-                insights={'test': 'data'}
-            )
-            db.session.add(report2)
-            db.session.commit()
-            
-            # Try to access other user's report
-            response = client.get(f'/analysis/report/{report2.id}')
-            assert response.status_code == 404  # Should not be found
+        user2 = TestHelpers.create_test_user('otheruser', 'other@example.com')
+        TestHelpers.create_test_analysis(user2.id)
+        
+        response = client.get(f'/api/analysis/{user2.id}')
+        assert response.status_code == 403
+        
+        response = client.get(f'/api/report/{user2.id}')
+        assert response.status_code == 403
 
-# Import patch for mocking
-from unittest.mock import patch
+class TestTransactionIsolation:
+    """Test that each test's writes are rolled back"""
+    
+    def test_commit_inside_test(self, auth_client):
+        """Rows committed through a route are visible within the test"""
+        client, user = auth_client
+        
+        client.post('/register', json=SAMPLE_USER_DATA | {'username': 'isolated', 'email': 'isolated@example.com'})
+        
+        assert User.query.filter_by(username='isolated').count() == 1
+        assert RefreshToken.query.count() >= 2
+    
+    def test_committed_objects_stay_loaded(self):
+        """Commits do not expire loaded attributes, so verification reads skip a reload"""
+        user = TestHelpers.create_test_user()
+        
+        assert not inspect(user).expired_attributes
+        assert user.username == 'testuser'
+    
+    def test_auth_client_reuses_shared_login(self, auth_client):
+        """auth_client authenticates without logging in again"""
+        client, user = auth_client
+        
+        # The session cookie opens the HTML pages, the bearer token the API
+        assert client.get('/games/catch-thought').status_code == 200
+        assert client.get(f'/api/analysis/{user.id}').status_code == 200
+        
+        # Only the login made once by _auth_user issued a refresh token
+        assert RefreshToken.query.filter_by(user_id=user.id).count() == 1
+    
+    def test_commit_rolled_back_after_test(self):
+        """The previous test's commit was released into a SAVEPOINT and rolled back"""
+        assert User.query.filter_by(username='isolated').count() == 0
+        # Only the shared user and its login token survive between tests
+        assert User.query.count() == 1
+        assert RefreshToken.query.count() == 1
@@ -2,18 +2,33 @@ from flask import Flask, render_template, request, jsonify, session, redirect, u
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_migrate import Migrate
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy import insert, select
+from sqlalchemy.orm import undefer_group
 from datetime import datetime, timedelta
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
-from functools import wraps
-import json
+from functools import lru_cache, wraps
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TLRUCache, TTLCache
+import base64
+import click
+import hashlib
+import hmac
+import orjson
+import re
+import threading
+import time
+import uuid
 
 # Import custom modules
-from models.database_models import db, User, GameSession, BehaviorAnalysis
+from config import Config, config as config_classes
+from models.database_models import db, User, GameSession, BehaviorAnalysis, RefreshToken, compute_risk_flags
 from models.ml_models import BehaviorPredictor
-from models.behavior_analyzer import BehaviorAnalyzer
+from models.behavior_analyzer import BehaviorAnalyzer, ANALYSIS_DETAIL_LEVELS
 from utils.report_generator import ReportGenerator
+from utils.passwords import ARGON2_METHOD, hash_password
 
 app = Flask(__name__)
 
@@ -21,16 +36,169 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'feelsync-dev-key-2024')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///feelsync.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(Config.SQLALCHEMY_ENGINE_OPTIONS)
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', ARGON2_METHOD)
+
+# FEELSYNC_CONFIG names a class in config.config (e.g. 'testing') whose
+# settings replace the defaults above; the engine is built from them below
+if os.environ.get('FEELSYNC_CONFIG'):
+    app.config.from_object(config_classes[os.environ['FEELSYNC_CONFIG']])
 
 # Initialize extensions
 db.init_app(app)
 CORS(app)
 migrate = Migrate(app, db)
 
-# Initialize ML components
-behavior_predictor = BehaviorPredictor()
-behavior_analyzer = BehaviorAnalyzer()
-report_generator = ReportGenerator()
+# ASGI entry point for production: uvicorn app:asgi_app --workers N
+asgi_app = WsgiToAsgi(app)
+
+# ML components are built on first use so imports, tests and CLI commands
+# that never analyze anything don't pay for model construction
+@lru_cache(maxsize=1)
+def get_behavior_predictor():
+    return BehaviorPredictor()
+
+@lru_cache(maxsize=1)
+def get_behavior_analyzer():
+    return BehaviorAnalyzer()
+
+@lru_cache(maxsize=1)
+def get_report_generator():
+    return ReportGenerator()
+
+# Behavioral analysis runs off the request thread so saving game data only
+# waits on the database write
+analysis_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ANALYSIS_WORKERS', 2)),
+    thread_name_prefix='feelsync-analysis'
+)
+
+# Successful token validations keyed by the SHA-256 of the raw token. Entries
+# expire after TOKEN_CACHE_TTL seconds or at the token's own 'exp', whichever
+# comes first, so an expired token is never served from the cache.
+TOKEN_CACHE_TTL = 30
+_JWT_SEGMENT = re.compile(r'^[A-Za-z0-9_-]+$')
+_token_cache = TLRUCache(
+    maxsize=10000,
+    ttu=lambda key, payload, now: min(now + TOKEN_CACHE_TTL, payload.get('exp', now)),
+    timer=time.time
+)
+_token_cache_lock = threading.Lock()
+
+# Reused decoder; every token we issue carries 'exp', so insist on it
+_jwt = jwt.PyJWT()
+_JWT_OPTIONS = {'verify_signature': True, 'require': ['exp']}
+
+def decode_token(token):
+    """Decode and verify a JWT, reusing recent successful validations"""
+    key = hashlib.sha256(token.encode()).digest()
+    
+    with _token_cache_lock:
+        payload = _token_cache.get(key)
+    
+    if payload is None:
+        # Raises for invalid or expired tokens, which are never cached
+        payload = _jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'], options=_JWT_OPTIONS)
+        with _token_cache_lock:
+            _token_cache[key] = payload
+    
+    return payload
+
+# API routes only need to know who the caller is and whether they are a
+# therapist, so token_required hands them this instead of a full User row
+AuthenticatedUser = namedtuple('AuthenticatedUser', ['id', 'is_therapist'])
+
+USER_CACHE_TTL = 60
+_user_cache = TTLCache(maxsize=10000, ttl=USER_CACHE_TTL, timer=time.time)
+_user_cache_lock = threading.Lock()
+
+def load_authenticated_user(user_id):
+    """Look up the caller's identity, hitting the database at most once per TTL"""
+    with _user_cache_lock:
+        principal = _user_cache.get(user_id)
+    
+    if principal is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        principal = AuthenticatedUser(user.id, user.is_therapist)
+        with _user_cache_lock:
+            _user_cache[user_id] = principal
+    
+    return principal
+
+def invalidate_user_cache(user_id):
+    """Drop a cached identity after logout or a profile change"""
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+# Stored timestamps are naive UTC; orjson writes them as RFC 3339 with a Z
+OJSON_OPTIONS = (
+    orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+)
+
+def ojson(obj, status=200):
+    """Serialize a JSON response with orjson instead of the stdlib encoder"""
+    return app.response_class(
+        orjson.dumps(obj, option=OJSON_OPTIONS),
+        status=status,
+        mimetype='application/json'
+    )
+
+# Short-lived access tokens go in the Authorization header; the refresh token
+# lives in an httpOnly cookie scoped to the refresh endpoint and is rotated
+# on every use
+ACCESS_TOKEN_TTL = timedelta(minutes=15)
+REFRESH_TOKEN_TTL = timedelta(days=7)
+REFRESH_COOKIE = 'refresh_token'
+
+# The HS256 header never changes, so its base64url segment is built once
+_JWT_HEADER_B64 = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b'=')
+
+def issue_access_token(user_id):
+    """Create a short-lived API access token.
+    
+    Produces the same HS256 token as jwt.encode({'user_id', 'exp'}) but only
+    encodes the payload and signs, reusing the precomputed header segment.
+    """
+    exp = int(time.time() + ACCESS_TOKEN_TTL.total_seconds())
+    payload = f'{{"user_id":{int(user_id)},"exp":{exp}}}'.encode()
+    signing_input = _JWT_HEADER_B64 + b'.' + base64.urlsafe_b64encode(payload).rstrip(b'=')
+    signature = hmac.new(app.config['SECRET_KEY'].encode(), signing_input, hashlib.sha256).digest()
+    return (signing_input + b'.' + base64.urlsafe_b64encode(signature).rstrip(b'=')).decode()
+
+def issue_refresh_token(user_id, family=None):
+    """Create and record a refresh token; rotated tokens keep their family"""
+    jti = uuid.uuid4().hex
+    expires_at = datetime.utcnow() + REFRESH_TOKEN_TTL
+    
+    db.session.add(RefreshToken(
+        jti=jti,
+        user_id=user_id,
+        family=family or jti,
+        expires_at=expires_at
+    ))
+    
+    return jwt.encode({
+        'user_id': user_id,
+        'jti': jti,
+        'type': 'refresh',
+        'exp': expires_at
+    }, app.config['SECRET_KEY'])
+
+def token_response(user_id, refresh_token):
+    """JSON response carrying a new access token and the refresh cookie"""
+    response = jsonify({'token': issue_access_token(user_id), 'user_id': user_id})
+    response.set_cookie(
+        REFRESH_COOKIE,
+        refresh_token,
+        max_age=int(REFRESH_TOKEN_TTL.total_seconds()),
+        httponly=True,
+        secure=app.config.get('SESSION_COOKIE_SECURE', False),
+        samesite='Lax',
+        path='/api/refresh'
+    )
+    return response
 
 def token_required(f):
     """Decorator for routes that require authentication"""
@@ -40,14 +208,24 @@ def token_required(f):
         if not token:
             return jsonify({'message': 'Token is missing!'}), 401
         
+        if token.startswith('Bearer '):
+            token = token[7:]
+        
+        # Cheap structural check before any HMAC work: header.payload.signature
+        if token.count('.') != 2 or not _JWT_SEGMENT.match(token.partition('.')[0]):
+            return jsonify({'message': 'Token is invalid!'}), 401
+        
         try:
-            if token.startswith('Bearer '):
-                token = token[7:]
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
+            data = decode_token(token)
+            if data.get('type') == 'refresh':
+                raise jwt.InvalidTokenError('Refresh tokens cannot be used for API access')
+            current_user = load_authenticated_user(data['user_id'])
         except:
             return jsonify({'message': 'Token is invalid!'}), 401
         
+        if current_user is None:
+            return jsonify({'message': 'Token is invalid!'}), 401
+        
         return f(current_user, *args, **kwargs)
     return decorated
 
@@ -62,7 +240,7 @@ def dashboard():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    user = User.query.get(session['user_id'])
+    user = db.session.get(User, session['user_id'])
     recent_sessions = GameSession.query.filter_by(user_id=user.id).order_by(
         GameSession.created_at.desc()
     ).limit(5).all()
@@ -77,6 +255,40 @@ def dashboard():
                          recent_sessions=recent_sessions,
                          latest_analysis=latest_analysis)
 
+_EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_TRUE_VALUES = frozenset(['true', 'on', '1', 'yes'])
+
+def parse_registration(data):
+    """Validate and type a registration payload in a single pass.
+    
+    Returns (fields, None) on success or (None, error message). Form posts
+    deliver every value as a string, so age and the consent flags are cast here.
+    """
+    username = data.get('username')
+    email = data.get('email')
+    password = data.get('password')
+    
+    if not username or not email or not password:
+        return None, 'Missing required fields'
+    if not _EMAIL_PATTERN.match(email):
+        return None, 'Invalid email address'
+    if len(password) < 8:
+        return None, 'Password must be at least 8 characters long'
+    
+    try:
+        age = int(data.get('age', 16))
+    except (TypeError, ValueError):
+        return None, 'Age must be a whole number'
+    
+    return {
+        'username': username,
+        'email': email,
+        'password': password,
+        'age': age,
+        'consent': str(data.get('consent', False)).lower() in _TRUE_VALUES,
+        'parental_consent': str(data.get('parental_consent', False)).lower() in _TRUE_VALUES
+    }, None
+
 # Authentication Routes
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -85,33 +297,34 @@ def register():
         data = request.get_json() if request.is_json else request.form
         
         # Validate input
-        if not data.get('username') or not data.get('email') or not data.get('password'):
-            return jsonify({'error': 'Missing required fields'}), 400
+        fields, error = parse_registration(data)
+        if error:
+            return jsonify({'error': error}), 400
         
         # Check if user exists
-        if User.query.filter_by(email=data['email']).first():
+        if User.query.filter_by(email=fields['email']).first():
             return jsonify({'error': 'Email already registered'}), 400
         
         # Create new user
         user = User(
-            username=data['username'],
-            email=data['email'],
-            password_hash=generate_password_hash(data['password']),
-            age=data.get('age', 16),
-            consent_given=data.get('consent', False),
-            parental_consent=data.get('parental_consent', False) if int(data.get('age', 18)) < 18 else True
+            username=fields['username'],
+            email=fields['email'],
+            password_hash=hash_password(fields['password'], method=app.config['PASSWORD_HASH_METHOD']),
+            age=fields['age'],
+            consent_given=fields['consent'],
+            parental_consent=fields['parental_consent'] if fields['age'] < 18 else True
         )
         
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
         
-        # Generate token
-        token = jwt.encode({
-            'user_id': user.id,
-            'exp': datetime.utcnow() + timedelta(hours=24)
-        }, app.config['SECRET_KEY'])
+        # Generate tokens; as on login, the session remembers the family
+        # so /logout can revoke it
+        session['refresh_family'] = uuid.uuid4().hex
+        refresh_token = issue_refresh_token(user.id, session['refresh_family'])
+        db.session.commit()
         
-        return jsonify({'token': token, 'user_id': user.id})
+        return token_response(user.id, refresh_token)
     
     return render_template('auth/register.html')
 
@@ -123,17 +336,17 @@ def login():
         
         user = User.query.filter_by(email=data['email']).first()
         
-        if user and check_password_hash(user.password_hash, data['password']):
+        if user and user.check_password(data['password']):
             session['user_id'] = user.id
             
-            # Generate token for API access
-            token = jwt.encode({
-                'user_id': user.id,
-                'exp': datetime.utcnow() + timedelta(hours=24)
-            }, app.config['SECRET_KEY'])
-            
+            # Generate tokens for API access
             if request.is_json:
-                return jsonify({'token': token, 'user_id': user.id})
+                # The refresh cookie never reaches /logout, so the session
+                # remembers which token family to revoke there
+                session['refresh_family'] = uuid.uuid4().hex
+                refresh_token = issue_refresh_token(user.id, session['refresh_family'])
+                db.session.commit()
+                return token_response(user.id, refresh_token)
             else:
                 return redirect(url_for('dashboard'))
         
@@ -144,11 +357,50 @@ def login():
     
     return render_template('auth/login.html')
 
+@app.route('/api/refresh', methods=['POST'])
+def refresh():
+    """Exchange a refresh token for a new access token and refresh token"""
+    token = request.cookies.get(REFRESH_COOKIE)
+    if not token:
+        return jsonify({'message': 'Refresh token is missing!'}), 401
+    
+    try:
+        data = _jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'], options=_JWT_OPTIONS)
+    except jwt.InvalidTokenError:
+        return jsonify({'message': 'Refresh token is invalid!'}), 401
+    
+    record = db.session.get(RefreshToken, data.get('jti')) if data.get('type') == 'refresh' else None
+    if not record:
+        return jsonify({'message': 'Refresh token is invalid!'}), 401
+    
+    if record.revoked:
+        # An already-rotated token came back: treat the chain as stolen
+        RefreshToken.query.filter_by(family=record.family).update({'revoked': True})
+        db.session.commit()
+        return jsonify({'message': 'Refresh token is invalid!'}), 401
+    
+    record.revoked = True
+    refresh_token = issue_refresh_token(record.user_id, record.family)
+    db.session.commit()
+    
+    return token_response(record.user_id, refresh_token)
+
 @app.route('/logout')
 def logout():
     """User logout"""
-    session.pop('user_id', None)
-    return redirect(url_for('index'))
+    user_id = session.pop('user_id', None)
+    if user_id is not None:
+        invalidate_user_cache(user_id)
+    
+    # Revoke every token rotated from this login so the refresh cookie is dead
+    family = session.pop('refresh_family', None)
+    if family is not None:
+        RefreshToken.query.filter_by(family=family).update({'revoked': True})
+        db.session.commit()
+    
+    response = redirect(url_for('index'))
+    response.delete_cookie(REFRESH_COOKIE, path='/api/refresh')
+    return response
 
 # Game Routes
 @app.route('/games/catch-thought')
@@ -196,67 +448,196 @@ def save_game_data(current_user, session_id):
     """Save game session data"""
     data = request.get_json()
     
-    session_obj = GameSession.query.get(session_id)
+    session_obj = db.session.get(GameSession, session_id)
     if not session_obj or session_obj.user_id != current_user.id:
         return jsonify({'error': 'Session not found'}), 404
     
-    # Update session with game data
-    session_obj.score = data.get('score', 0)
-    session_obj.duration = data.get('duration', 0)
-    session_obj.game_data = json.dumps(data.get('behavioral_data', {}))
-    session_obj.end_time = datetime.utcnow()
-    session_obj.completed = True
-    
-    db.session.commit()
+    try:
+        score = int(data.get('score', 0))
+        duration = int(data.get('duration', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Score and duration must be whole numbers'}), 400
     
-    # Trigger behavioral analysis
     behavioral_data = data.get('behavioral_data', {})
-    analysis_result = behavior_analyzer.analyze_session(behavioral_data)
     
-    # Save analysis
-    analysis = BehaviorAnalysis(
-        user_id=current_user.id,
-        session_id=session_id,
-        anxiety_score=analysis_result.get('anxiety_score', 0),
-        depression_score=analysis_result.get('depression_score', 0),
-        attention_score=analysis_result.get('attention_score', 0),
-        impulsivity_score=analysis_result.get('impulsivity_score', 0),
-        analysis_data=json.dumps(analysis_result)
-    )
+    try:
+        # Update session with game data
+        session_obj.score = score
+        session_obj.duration = duration
+        session_obj.game_data = behavioral_data
+        session_obj.end_time = datetime.utcnow()
+        session_obj.completed = True
+        
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Failed to save game data: {str(e)}")
+        return jsonify({'error': 'Failed to save game data'}), 500
     
-    db.session.add(analysis)
-    db.session.commit()
+    # Trigger behavioral analysis; clients poll /api/analysis/latest
+    analysis_executor.submit(run_analysis, current_user.id, session_id, behavioral_data)
     
-    return jsonify({
+    return ojson({
         'message': 'Data saved successfully',
+        'session_id': session_id,
+        'analysis_pending': True
+    })
+
+def build_analysis_row(user_id, session_id, analysis_result):
+    """Column values for a BehaviorAnalysis row from an analyzer result"""
+    anxiety = analysis_result.get('anxiety_score', 0)
+    depression = analysis_result.get('depression_score', 0)
+    attention = analysis_result.get('attention_score', 0)
+    impulsivity = analysis_result.get('impulsivity_score', 0)
+    return {
+        'user_id': user_id,
+        'session_id': session_id,
+        'anxiety_score': anxiety,
+        'depression_score': depression,
+        'attention_score': attention,
+        'impulsivity_score': impulsivity,
+        # Core inserts skip the ORM write hook, so the bitmask is set here;
+        # emotional_regulation_score is left at its 0.0 column default
+        'risk_flags': compute_risk_flags(anxiety, depression, attention, impulsivity, 0.0),
+        'analysis_data': analysis_result,
+        'insights': analysis_result.get('insights', [])
+    }
+
+def bulk_save_analyses(rows):
+    """Insert many BehaviorAnalysis rows in one executemany, bypassing the unit of work"""
+    if not rows:
+        return
+    db.session.execute(insert(BehaviorAnalysis), rows)
+    db.session.commit()
+
+def run_analysis(user_id, session_id, behavioral_data):
+    """Analyze a finished game session and store the result"""
+    with app.app_context():
+        try:
+            analysis_result = get_behavior_analyzer().analyze_session(behavioral_data)
+            db.session.add(BehaviorAnalysis(**build_analysis_row(user_id, session_id, analysis_result)))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Failed to analyze session {session_id}: {str(e)}")
+
+def analyze_pending_sessions(limit=500):
+    """Analyze completed sessions that have no analysis yet, e.g. after a restart"""
+    pending = GameSession.query.options(undefer_group('game_documents')).outerjoin(
+        BehaviorAnalysis, BehaviorAnalysis.session_id == GameSession.id
+    ).filter(
+        GameSession.completed.is_(True),
+        BehaviorAnalysis.id.is_(None)
+    ).limit(limit).all()
+    
+    results = get_behavior_analyzer().analyze_sessions([s.game_data or {} for s in pending])
+    rows = [
+        build_analysis_row(s.user_id, s.id, result)
+        for s, result in zip(pending, results)
+    ]
+    bulk_save_analyses(rows)
+    return len(rows)
+
+@app.cli.command('analyze-pending')
+def analyze_pending_command():
+    """Analyze completed sessions whose background analysis never ran"""
+    click.echo(f"Analyzed {analyze_pending_sessions()} sessions")
+
+def migrate_emotional_choices(batch_size=500):
+    """Rewrite legacy emotionalChoices dicts as [negative, neutral, positive] lists
+    
+    Sessions are scanned in id order, batch_size at a time, and only the
+    emotionalChoices key of a legacy document is patched. Returns the number
+    of sessions rewritten; running it again finds nothing left to do.
+    """
+    migrated = 0
+    last_id = 0
+    while True:
+        batch = GameSession.query.options(undefer_group('game_documents')).filter(
+            GameSession.id > last_id
+        ).order_by(GameSession.id).limit(batch_size).all()
+        if not batch:
+            return migrated
+        
+        for session_obj in batch:
+            choices = (session_obj.game_data or {}).get('emotionalChoices')
+            if isinstance(choices, dict):
+                session_obj.update_game_data_field('emotionalChoices', [
+                    choices.get('negative', 0), choices.get('neutral', 0), choices.get('positive', 0)
+                ])
+                migrated += 1
+        
+        last_id = batch[-1].id
+        db.session.commit()
+
+@app.cli.command('migrate-emotional-choices')
+def migrate_emotional_choices_command():
+    """Rewrite stored emotionalChoices dicts in the list form"""
+    click.echo(f"Migrated {migrate_emotional_choices()} sessions")
+
+@app.route('/api/analysis/latest')
+@token_required
+def get_latest_analysis(current_user):
+    """Get the most recent analysis, optionally for a specific session"""
+    query = BehaviorAnalysis.query.filter_by(user_id=current_user.id)
+    
+    session_id = request.args.get('session_id', type=int)
+    if session_id is not None:
+        query = query.filter_by(session_id=session_id)
+    
+    analysis = query.order_by(BehaviorAnalysis.created_at.desc()).first()
+    if not analysis:
+        return ojson({'analysis_pending': True}, status=202)
+    
+    return ojson({
+        'analysis_pending': False,
         'analysis_id': analysis.id,
-        'preliminary_insights': analysis_result.get('insights', [])
+        'session_id': analysis.session_id,
+        'insights': analysis.get_insights_list()
     })
 
+def analysis_insights(analysis):
+    """An analysis row's insights list"""
+    if analysis.insights is not None:
+        return analysis.insights
+    # Rows written before insights had their own column only carry them
+    # inside the full analysis blob
+    return (analysis.analysis_data or {}).get('insights', [])
+
 @app.route('/api/analysis/<int:user_id>')
 @token_required
 def get_user_analysis(current_user, user_id):
-    """Get behavioral analysis for a user"""
+    """Get behavioral analysis for a user
+    
+    ?detail=scores returns only the numeric scores, skipping the insights
+    (for chart clients that never display them).
+    """
     if current_user.id != user_id and not current_user.is_therapist:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    analyses = BehaviorAnalysis.query.filter_by(user_id=user_id).order_by(
-        BehaviorAnalysis.created_at.desc()
-    ).limit(10).all()
-    
-    analysis_data = []
-    for analysis in analyses:
-        analysis_data.append({
-            'id': analysis.id,
-            'date': analysis.created_at.isoformat(),
-            'anxiety_score': analysis.anxiety_score,
-            'depression_score': analysis.depression_score,
-            'attention_score': analysis.attention_score,
-            'impulsivity_score': analysis.impulsivity_score,
-            'insights': json.loads(analysis.analysis_data).get('insights', [])
-        })
-    
-    return jsonify(analysis_data)
+    detail = request.args.get('detail', 'full')
+    if detail not in ANALYSIS_DETAIL_LEVELS:
+        return jsonify({'error': f"detail must be one of {', '.join(ANALYSIS_DETAIL_LEVELS)}"}), 400
+    
+    query = BehaviorAnalysis.query.filter_by(user_id=user_id)
+    if detail == 'full':
+        query = query.options(undefer_group('analysis_documents'))
+    analyses = query.order_by(BehaviorAnalysis.created_at.desc()).limit(10).all()
+    
+    analysis_data = [{
+        'id': analysis.id,
+        'date': analysis.created_at,
+        'anxiety_score': analysis.anxiety_score,
+        'depression_score': analysis.depression_score,
+        'attention_score': analysis.attention_score,
+        'impulsivity_score': analysis.impulsivity_score
+    } for analysis in analyses]
+    
+    if detail == 'full':
+        for row, analysis in zip(analysis_data, analyses):
+            row['insights'] = analysis_insights(analysis)
+    
+    return ojson(analysis_data)
 
 @app.route('/api/report/<int:user_id>')
 @token_required
@@ -265,8 +646,8 @@ def generate_report(current_user, user_id):
     if current_user.id != user_id and not current_user.is_therapist:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    user = User.query.get(user_id)
-    analyses = BehaviorAnalysis.query.filter_by(user_id=user_id).order_by(
+    user = db.session.get(User, user_id)
+    analyses = BehaviorAnalysis.query.options(undefer_group('analysis_documents')).filter_by(user_id=user_id).order_by(
         BehaviorAnalysis.created_at.desc()
     ).all()
     
@@ -274,9 +655,9 @@ def generate_report(current_user, user_id):
         GameSession.created_at.desc()
     ).all()
     
-    report_data = report_generator.generate_comprehensive_report(user, analyses, sessions)
+    report_data = get_report_generator().generate_comprehensive_report(user, analyses, sessions)
     
-    return jsonify(report_data)
+    return ojson(report_data)
 
 @app.route('/analysis/personal')
 def personal_analysis():
@@ -284,7 +665,7 @@ def personal_analysis():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    user = User.query.get(session['user_id'])
+    user = db.session.get(User, session['user_id'])
     analyses = BehaviorAnalysis.query.filter_by(user_id=user.id).order_by(
         BehaviorAnalysis.created_at.desc()
     ).all()
@@ -297,14 +678,17 @@ def therapist_dashboard():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    user = User.query.get(session['user_id'])
+    user = db.session.get(User, session['user_id'])
     if not user.is_therapist:
         return jsonify({'error': 'Access denied'}), 403
     
-    # Get users with recent activity
-    recent_users = db.session.query(User).join(GameSession).filter(
-        GameSession.created_at > datetime.utcnow() - timedelta(days=30)
-    ).distinct().all()
+    # Get users with recent activity; the subquery is answered from the
+    # (created_at, user_id) index without joining or de-duplicating users
+    cutoff = datetime.utcnow() - timedelta(days=30)
+    active_user_ids = select(GameSession.user_id).where(GameSession.created_at > cutoff)
+    recent_users = db.session.execute(
+        select(User).where(User.id.in_(active_user_ids))
+    ).scalars().all()
     
     return render_template('analysis/therapist_view.html', users=recent_users)
 
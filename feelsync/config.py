@@ -1,5 +1,7 @@
 import os
 from datetime import timedelta
+from types import MappingProxyType
+from sqlalchemy.pool import StaticPool
 
 class Config:
     """Base configuration class"""
@@ -11,11 +13,23 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///feelsync.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_RECORD_QUERIES = True
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 20,
+        'max_overflow': 40,
+        'pool_timeout': 10,  # Fail fast instead of queueing requests for 30s
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+        'query_cache_size': 1000,  # Compiled-statement cache per engine (default 500)
+    }
     
     # Security Configuration
     WTF_CSRF_ENABLED = True
     WTF_CSRF_TIME_LIMIT = None
     
+    # Password hashing: 'argon2' (Argon2id via argon2-cffi, scrypt if it is
+    # not installed) or any Werkzeug method string
+    PASSWORD_HASH_METHOD = 'argon2'
+    
     # Session Configuration
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
     SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
@@ -115,6 +129,10 @@ class TestingConfig(Config):
     TESTING = True
     WTF_CSRF_ENABLED = False
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'  # In-memory database for tests
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': StaticPool,  # Share the single in-memory connection
+        'connect_args': {'check_same_thread': False}
+    }
     
     # Disable external services during testing
     MAIL_SUPPRESS_SEND = True
@@ -122,6 +140,7 @@ class TestingConfig(Config):
     
     # Speed up password hashing for tests
     BCRYPT_LOG_ROUNDS = 4
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1'
 
 class ProductionConfig(Config):
     """Production configuration"""
@@ -133,10 +152,6 @@ class ProductionConfig(Config):
     
     # Database configuration
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_recycle': 300,
-        'pool_pre_ping': True,
-    }
     
     # Enhanced logging
     LOG_LEVEL = 'WARNING'
@@ -155,36 +170,36 @@ config = {
     'default': DevelopmentConfig
 }
 
-# Mental health assessment thresholds
-MENTAL_HEALTH_THRESHOLDS = {
-    'anxiety': {
+# Mental health assessment thresholds, read-only so callers cannot mutate them
+MENTAL_HEALTH_THRESHOLDS = MappingProxyType({
+    'anxiety': MappingProxyType({
         'low': 30,
         'moderate': 60,
         'high': 80
-    },
-    'depression': {
+    }),
+    'depression': MappingProxyType({
         'low': 30,
         'moderate': 60,  
         'high': 80
-    },
-    'attention': {
+    }),
+    'attention': MappingProxyType({
         'excellent': 80,
         'good': 60,
         'concerning': 40,
         'significant_difficulty': 20
-    },
-    'impulsivity': {
+    }),
+    'impulsivity': MappingProxyType({
         'low': 30,
         'moderate': 60,
         'high': 80
-    },
-    'emotional_regulation': {
+    }),
+    'emotional_regulation': MappingProxyType({
         'excellent': 80,
         'good': 60,
         'concerning': 40,
         'difficult': 20
-    }
-}
+    })
+})
 
 # Risk assessment configuration
 RISK_ASSESSMENT_CONFIG = {
@@ -206,7 +221,7 @@ RISK_ASSESSMENT_CONFIG = {
 }
 
 # Behavioral cluster definitions
-BEHAVIORAL_CLUSTERS = {
+BEHAVIORAL_CLUSTERS = MappingProxyType({
     'fast_accurate': {
         'name': 'Fast & Accurate',
         'description': 'Quick decision-makers with high accuracy',
@@ -222,7 +237,7 @@ BEHAVIORAL_CLUSTERS = {
         'description': 'Variable performance with inconsistent patterns',
         'characteristics': ['high_variance', 'moderate_accuracy', 'emotional_reactivity']
     }
-}
+})
 
 # Data validation rules
 DATA_VALIDATION_RULES = {
@@ -268,7 +283,7 @@ CONSENT_CONFIG = {
 }
 
 # Notification settings
-NOTIFICATION_CONFIG = {
+NOTIFICATION_CONFIG = MappingProxyType({
     'enabled': True,
     'channels': ['email', 'in_app'],
     'triggers': {
@@ -287,7 +302,7 @@ NOTIFICATION_CONFIG = {
             'days_inactive': 7
         }
     }
-}
+})
 
 # API versioning
 API_CONFIG = {
@@ -0,0 +1,7 @@
+"""
+Root pytest configuration for FeelSync.
+
+Living at the project root, this file makes pytest put the project directory
+on ``sys.path`` once per run, so test modules can import ``app``, ``config``,
+``models`` and ``utils`` without patching the path themselves.
+"""
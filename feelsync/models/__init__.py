@@ -1,16 +1,15 @@
 """
 FeelSync Models Package
 
-This package contains machine learning models for mood prediction,
-behavioral pattern analysis, and therapeutic insights.
+This package contains the database models, the machine learning models
+for behavioral prediction, and the behavior analyzer built on them.
 """
 
-from .mood_predictor import MoodPredictor
-from .behavioral_analyzer import BehavioralAnalyzer
-from .therapy_insights import TherapyInsights
+from .ml_models import BehaviorPredictor
+from .behavior_analyzer import BehaviorAnalyzer
 
 __version__ = "1.0.0"
-__all__ = ["MoodPredictor", "BehavioralAnalyzer", "TherapyInsights"]
+__all__ = ["BehaviorPredictor", "BehaviorAnalyzer"]
 
 # Model configurations
 MODEL_CONFIG = {
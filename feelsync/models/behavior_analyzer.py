@@ -1,7 +1,417 @@
-import json
+import copy
+import heapq
+import math
+import threading
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
 import numpy as np
-from datetime import datetime, timedelta
-from .ml_models import BehaviorPredictor
+from datetime import datetime, timedelta, timezone
+from types import MappingProxyType
+import orjson
+from cachetools import LRUCache
+from .ml_models import BehaviorPredictor, _emotional_choice_counts, _session_digest
+from utils.jit import njit, NUMBA_AVAILABLE
+
+# Rule-based analysis guidelines, shared read-only by every analyzer
+_ANALYSIS_RULES = MappingProxyType({
+    'anxiety_thresholds': MappingProxyType({'low': 30, 'medium': 60, 'high': 80}),
+    'depression_thresholds': MappingProxyType({'low': 30, 'medium': 60, 'high': 80}),
+    'attention_thresholds': MappingProxyType({'high': 80, 'medium': 60, 'low': 30}),
+    'reaction_time_norms': MappingProxyType({'fast': 500, 'normal': 1000, 'slow': 1500}),
+    'accuracy_norms': MappingProxyType({'high': 0.8, 'medium': 0.6, 'low': 0.4}),
+    'hesitation_thresholds': MappingProxyType({'low': 0.1, 'medium': 0.3, 'high': 0.5})
+})
+
+_QUANTILES = (0.25, 0.5, 0.75)
+
+# Score cut-offs for the graded risk factors; each one crossed adds a point
+_ANXIETY_RISK_CUTOFFS = (40, 60, 80)
+_DEPRESSION_RISK_CUTOFFS = (40, 60, 80)
+_ATTENTION_RISK_CUTOFFS = (20, 40, 60)
+
+def _lerp(lower, upper, frac):
+    """np.percentile's linear interpolation between neighbouring order statistics
+    
+    Like NumPy, fractions of one half or more interpolate back from the upper
+    value, so results match np.percentile bit for bit.
+    """
+    diff = upper - lower
+    if frac >= 0.5:
+        return upper - diff * (1 - frac)
+    return lower + diff * frac
+
+def _reaction_time_moments(rt):
+    """Mean and std of a non-empty array, summed as np.mean and np.std do"""
+    mean = float(rt.sum()) / rt.size
+    deviation = rt - mean
+    return mean, math.sqrt(float((deviation * deviation).sum()) / rt.size)
+
+def _reaction_time_stats(rt):
+    """Order statistics and moments of a non-empty reaction-time array.
+    
+    One partition yields min, max and the neighbours needed for the
+    25th/50th/75th percentiles, interpolated as np.percentile and np.median
+    do; mean and std are two-pass sums as in np.mean and np.std.
+    
+    Returns (min, p25, median, p75, max, mean, std).
+    """
+    n = rt.size
+    last = n - 1
+    
+    positions = [q * last for q in _QUANTILES]
+    kth = {0, last}
+    for pos in positions:
+        lo = int(pos)
+        kth.add(lo)
+        kth.add(min(lo + 1, last))
+    part = np.partition(rt, sorted(kth))
+    
+    quantiles = []
+    for q, pos in zip(_QUANTILES, positions):
+        lo = int(pos)
+        frac = pos - lo
+        if not frac:
+            value = part[lo]
+        elif q == 0.5:
+            # np.median averages the two middle values
+            value = (part[lo] + part[lo + 1]) / 2
+        else:
+            value = _lerp(part[lo], part[lo + 1], frac)
+        quantiles.append(float(value))
+    
+    mean, std = _reaction_time_moments(rt)
+    
+    return (float(part[0]), quantiles[0], quantiles[1], quantiles[2], float(part[last]),
+            mean, std)
+
+def _batch_reaction_time_stats(arrays):
+    """_reaction_time_stats for many reaction-time arrays at once.
+    
+    The arrays are padded into one (B, max_len) matrix and sorted row-wise
+    in a single call, and the quantiles are interpolated by fancy indexing.
+    The moments are summed per array, since a padded row reduction adds in
+    a different order and would not match _reaction_time_stats exactly.
+    Empty arrays yield None.
+    """
+    lengths = np.fromiter((a.size for a in arrays), dtype=np.intp, count=len(arrays))
+    stats = [None] * len(arrays)
+    rows = np.flatnonzero(lengths)
+    if not rows.size:
+        return stats
+    
+    n = lengths[rows]
+    padded = np.full((rows.size, n.max()), np.nan)
+    for i, row in enumerate(rows):
+        padded[i, :n[i]] = arrays[row]
+    
+    # NaN padding sorts to the end of each row
+    ordered = np.sort(padded, axis=1)
+    index = np.arange(rows.size)
+    last = n - 1
+    
+    positions = np.multiply.outer(_QUANTILES, last)
+    lo = positions.astype(np.intp)
+    frac = positions - lo
+    hi = np.minimum(lo + 1, last)
+    lower = ordered[index, lo]
+    upper = ordered[index, hi]
+    diff = upper - lower
+    # The same interpolation as _lerp, and np.median's average for the middle pair
+    quantiles = np.where(frac >= 0.5, upper - diff * (1 - frac), lower + diff * frac)
+    quantiles[1] = np.where(frac[1] > 0, (lower[1] + upper[1]) / 2, lower[1])
+    
+    mean, std = zip(*(_reaction_time_moments(arrays[row]) for row in rows.tolist()))
+    
+    columns = (ordered[:, 0], quantiles[0], quantiles[1], quantiles[2],
+               ordered[index, last], np.array(mean), np.array(std))
+    for row, row_stats in zip(rows.tolist(), zip(*(c.tolist() for c in columns))):
+        stats[row] = row_stats
+    return stats
+
+@njit(cache=True)
+def _detailed_metrics_kernel(rt, rt_head, hes, lapse_threshold):
+    """Single-pass loop kernel behind _detailed_metrics_scan"""
+    n_fast = 0
+    n_lapses = 0
+    for x in rt:
+        if x < 300:
+            n_fast += 1
+        if x > lapse_threshold:
+            n_lapses += 1
+    
+    n_fast_errors = 0
+    for x in rt_head:
+        if x < 500:
+            n_fast_errors += 1
+    
+    n_chunks = rt.size // 5
+    chunk_sum = 0.0
+    for c in range(n_chunks):
+        i = 5 * c
+        chunk_sum += (rt[i] + rt[i + 1] + rt[i + 2] + rt[i + 3] + rt[i + 4]) / 5.0
+    
+    # All-zero chunks have no scale to measure spread against
+    chunk_consistency = 1.0
+    if n_chunks > 1 and chunk_sum != 0.0:
+        chunk_avg = chunk_sum / n_chunks
+        squares = 0.0
+        for c in range(n_chunks):
+            i = 5 * c
+            deviation = (rt[i] + rt[i + 1] + rt[i + 2] + rt[i + 3] + rt[i + 4]) / 5.0 - chunk_avg
+            squares += deviation * deviation
+        chunk_consistency = 1.0 - np.sqrt(squares / n_chunks) / chunk_avg
+    
+    hes_sum = 0.0
+    severe_sum = 0.0
+    n_severe = 0
+    for h in hes:
+        hes_sum += h
+        if h > 1000:
+            severe_sum += h
+            n_severe += 1
+    
+    hes_mean = hes_sum / hes.size if hes.size > 0 else 0.0
+    hes_severity = severe_sum / n_severe if n_severe > 0 else 0.0
+    
+    return n_fast, n_fast_errors, n_lapses, chunk_consistency, hes_mean, hes_severity
+
+def _detailed_metrics_numpy(rt, rt_head, hes, lapse_threshold):
+    """NumPy implementation of _detailed_metrics_scan"""
+    n_fast = int(np.count_nonzero(rt < 300))
+    n_fast_errors = int(np.count_nonzero(rt_head < 500))
+    n_lapses = int(np.count_nonzero(rt > lapse_threshold))
+    
+    # Means of consecutive full 5-response chunks; a trailing partial chunk is dropped
+    full = (rt.size // 5) * 5
+    chunk_means = rt[:full].reshape(-1, 5).mean(axis=1)
+    chunk_avg = float(chunk_means.mean()) if chunk_means.size > 1 else 0.0
+    if chunk_avg:
+        chunk_consistency = 1 - float(chunk_means.std()) / chunk_avg
+    else:
+        chunk_consistency = 1.0
+    
+    hes_mean = float(hes.mean()) if hes.size else 0.0
+    severe = hes > 1000
+    n_severe = int(np.count_nonzero(severe))
+    hes_severity = float(np.dot(severe, hes)) / n_severe if n_severe else 0.0
+    
+    return n_fast, n_fast_errors, n_lapses, chunk_consistency, hes_mean, hes_severity
+
+def _detailed_metrics_scan(rt, rt_head, hes, lapse_threshold):
+    """Element-wise counts and means over one session's arrays.
+    
+    Args:
+        rt: Reaction times as a float64 array
+        rt_head: Reaction times attributed to mistakes (the first ``mistakes``)
+        hes: Hesitation times as a float64 array
+        lapse_threshold: Reaction time above which a response is a lapse
+        
+    Returns:
+        Tuple of (n_fast, n_fast_errors, n_lapses, chunk_consistency,
+        hes_mean, hes_severity); hes_severity is 0 when no hesitation
+        exceeds one second.
+    """
+    if NUMBA_AVAILABLE:
+        return _detailed_metrics_kernel(rt, rt_head, hes, lapse_threshold)
+    return _detailed_metrics_numpy(rt, rt_head, hes, lapse_threshold)
+
+# Outcome codes of the trend and trajectory kernels index these labels
+_TREND_LABELS = ('increasing', 'decreasing', 'stable')
+_TRAJECTORY_LABELS = ('improving', 'declining', 'stable')
+
+# Explicit signatures compile these eagerly at import (or load them from the
+# on-disk cache), so the first longitudinal request pays no JIT pause
+@njit('i8(f8[:])', cache=True)
+def _trend_kernel(y):
+    """Loop kernel behind _trend_code"""
+    n = y.size
+    sum_y = 0.0
+    sum_xy = 0.0
+    for i in range(n):
+        sum_y += y[i]
+        sum_xy += i * y[i]
+    
+    sum_x = n * (n - 1) / 2.0
+    sum_xx = (n - 1) * n * (2 * n - 1) / 6.0
+    slope = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x * sum_x)
+    
+    if slope > 2:
+        return 0
+    if slope < -2:
+        return 1
+    return 2
+
+def _trend_numpy(y):
+    """NumPy implementation of _trend_code"""
+    # Least-squares slope against x = 0..n-1; the x sums have closed forms
+    n = y.size
+    sum_x = n * (n - 1) / 2.0
+    sum_xx = (n - 1) * n * (2 * n - 1) / 6.0
+    sum_xy = float(np.dot(np.arange(n, dtype=np.float64), y))
+    slope = (n * sum_xy - sum_x * float(y.sum())) / (n * sum_xx - sum_x * sum_x)
+    
+    if slope > 2:
+        return 0
+    if slope < -2:
+        return 1
+    return 2
+
+def _trend_code(y):
+    """Index into _TREND_LABELS for a float64 series of at least 3 scores"""
+    if NUMBA_AVAILABLE:
+        return _trend_kernel(y)
+    return _trend_numpy(y)
+
+@njit('i8(f8[:, :])', cache=True)
+def _trajectory_kernel(scores):
+    """Loop kernel behind _trajectory_code"""
+    n = scores.shape[0]
+    split = max(2, n // 2)
+    if n <= split:
+        # No recent block to compare against
+        return 2
+    
+    early = np.zeros(3)
+    recent = np.zeros(3)
+    for i in range(split):
+        for j in range(3):
+            early[j] += scores[i, j]
+    for i in range(split, n):
+        for j in range(3):
+            recent[j] += scores[i, j]
+    early /= split
+    recent /= n - split
+    
+    improvement_score = (
+        (early[0] - recent[0]) + (early[1] - recent[1]) + (recent[2] - early[2])
+    ) / 3
+    
+    if improvement_score > 10:
+        return 0
+    if improvement_score < -10:
+        return 1
+    return 2
+
+def _trajectory_numpy(scores):
+    """NumPy implementation of _trajectory_code"""
+    split = max(2, len(scores) // 2)
+    if len(scores) <= split:
+        return 2
+    
+    # Recent vs. early averages, all three columns at once
+    early_anxiety, early_depression, early_attention = scores[:split].mean(axis=0)
+    recent_anxiety, recent_depression, recent_attention = scores[split:].mean(axis=0)
+    
+    # Improvement = lower anxiety/depression, higher attention
+    improvement_score = (
+        (early_anxiety - recent_anxiety) +
+        (early_depression - recent_depression) +
+        (recent_attention - early_attention)
+    ) / 3
+    
+    if improvement_score > 10:
+        return 0
+    if improvement_score < -10:
+        return 1
+    return 2
+
+def _trajectory_code(scores):
+    """Index into _TRAJECTORY_LABELS for an (n, 3) float64 score history"""
+    if NUMBA_AVAILABLE:
+        return _trajectory_kernel(scores)
+    return _trajectory_numpy(scores)
+
+# Recommendation templates. The entries are shared by every analysis result
+# (and serialized as-is), so callers must treat them as read-only.
+_RISK_LEVEL_RECOMMENDATIONS = MappingProxyType({
+    'high': ({
+        'category': 'professional_help',
+        'priority': 'high',
+        'text': 'Consider speaking with a mental health professional for comprehensive assessment',
+        'type': 'urgent'
+    },),
+    'medium': ({
+        'category': 'monitoring',
+        'priority': 'medium',
+        'text': 'Continue monitoring symptoms and consider professional consultation if patterns persist',
+        'type': 'advisory'
+    },)
+})
+
+_CONCERN_RECOMMENDATIONS = MappingProxyType({
+    'anxiety': (
+        {
+            'category': 'self_care',
+            'priority': 'medium',
+            'text': 'Practice relaxation techniques like deep breathing or mindfulness',
+            'type': 'self_help'
+        },
+        {
+            'category': 'lifestyle',
+            'priority': 'medium',
+            'text': 'Consider regular exercise and consistent sleep schedule',
+            'type': 'lifestyle'
+        }
+    ),
+    'depression': (
+        {
+            'category': 'social',
+            'priority': 'medium',
+            'text': 'Maintain social connections and engage in enjoyable activities',
+            'type': 'lifestyle'
+        },
+        {
+            'category': 'professional_help',
+            'priority': 'medium',
+            'text': 'Consider counseling or therapy for mood support',
+            'type': 'advisory'
+        }
+    ),
+    'attention_deficit': (
+        {
+            'category': 'cognitive',
+            'priority': 'medium',
+            'text': 'Break tasks into smaller chunks and minimize distractions',
+            'type': 'self_help'
+        },
+        {
+            'category': 'evaluation',
+            'priority': 'medium',
+            'text': 'Consider evaluation for attention-related disorders if difficulties persist',
+            'type': 'advisory'
+        }
+    ),
+    'impulsivity': ({
+        'category': 'behavioral',
+        'priority': 'medium',
+        'text': 'Practice pause-and-think strategies before making decisions',
+        'type': 'self_help'
+    },),
+    'emotional_dysregulation': ({
+        'category': 'emotional',
+        'priority': 'medium',
+        'text': 'Learn emotion regulation techniques like cognitive reframing',
+        'type': 'self_help'
+    },)
+})
+
+_WELLNESS_RECOMMENDATIONS = (
+    {
+        'category': 'wellness',
+        'priority': 'low',
+        'text': 'Maintain regular sleep, exercise, and healthy eating habits',
+        'type': 'lifestyle'
+    },
+    {
+        'category': 'monitoring',
+        'priority': 'low',
+        'text': 'Continue periodic self-assessment through FeelSync games',
+        'type': 'platform'
+    }
+)
+
+# Result shapes for analyze_session(detail=...)
+ANALYSIS_DETAIL_LEVELS = ('full', 'scores')
 
 class BehaviorAnalyzer:
     """Main behavioral analysis engine for processing game session data"""
@@ -9,34 +419,108 @@ class BehaviorAnalyzer:
     def __init__(self):
         self.predictor = BehaviorPredictor()
         self.analysis_rules = self._load_analysis_rules()
+        self._trend_cache = LRUCache(maxsize=256)
+        self._trend_cache_lock = threading.Lock()
+        self._session_cache = LRUCache(maxsize=1024)
+        self._session_cache_lock = threading.Lock()
+        # predictor.model_version the cached analyses were made with
+        self._session_cache_version = self.predictor.model_version
     
-    def analyze_session(self, behavioral_data):
-        """Analyze a single game session and return comprehensive results"""
+    def analyze_session(self, behavioral_data, *, detail='full'):
+        """Analyze a single game session and return comprehensive results
         
-        if isinstance(behavioral_data, str):
-            behavioral_data = json.loads(behavioral_data)
+        Results are cached by a hash of the canonical session payload, so
+        replays, retries and dashboard refreshes of the same session skip
+        the predictor. The analysis timestamp is stamped fresh on every call.
         
-        # Basic ML predictions
-        anxiety_score = self.predictor.predict_anxiety(behavioral_data)
-        depression_score = self.predictor.predict_depression(behavioral_data)
-        attention_score = self.predictor.predict_attention(behavioral_data)
-        cluster = self.predictor.predict_cluster(behavioral_data)
+        With detail='scores' only the numeric scores, cluster and risk level
+        are returned; insights, recommendations and detailed metrics are
+        not built.
+        """
         
-        # Detailed behavioral metrics
-        detailed_metrics = self._calculate_detailed_metrics(behavioral_data)
+        if detail not in ANALYSIS_DETAIL_LEVELS:
+            raise ValueError(f"detail must be one of {ANALYSIS_DETAIL_LEVELS}")
         
-        # Generate insights
-        insights = self._generate_insights(
-            anxiety_score, depression_score, attention_score, 
-            cluster, detailed_metrics, behavioral_data
+        # Raw JSON (e.g. a request body or a stored game_data column) is decoded
+        # natively by orjson, without a UTF-8 decode for byte payloads
+        if isinstance(behavioral_data, (str, bytes, bytearray, memoryview)):
+            behavioral_data = orjson.loads(behavioral_data)
+        
+        result = self._cached_analysis(behavioral_data, detail=detail)
+        result['analysis_timestamp'] = datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+        return result
+    
+    def analyze_sessions(self, batch, *, detail='full'):
+        """Analyze a batch of game sessions, e.g. for bulk re-analysis
+        
+        Equivalent to calling analyze_session on each item, but the
+        reaction-time statistics of the whole batch are computed in one
+        vectorized pass. Results come back in input order.
+        """
+        
+        if detail not in ANALYSIS_DETAIL_LEVELS:
+            raise ValueError(f"detail must be one of {ANALYSIS_DETAIL_LEVELS}")
+        sessions = [
+            orjson.loads(data) if isinstance(data, (str, bytes, bytearray, memoryview)) else data
+            for data in batch
+        ]
+        rt_stats = _batch_reaction_time_stats([
+            np.asarray(data.get('reactionTimes', []), dtype=np.float64) for data in sessions
+        ])
+        
+        timestamp = datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+        results = [self._cached_analysis(data, stats, detail) for data, stats in zip(sessions, rt_stats)]
+        for result in results:
+            result['analysis_timestamp'] = timestamp
+        return results
+    
+    def _cached_analysis(self, behavioral_data, rt_stats=None, detail='full'):
+        """Session analysis through the payload-hash cache
+        
+        Callers get a deep copy, so mutating a result (or its insights,
+        recommendations and detailed metrics) never reaches the cached
+        entry or another caller. The cache is emptied when the predictor's
+        models change.
+        """
+        digest = _session_digest(behavioral_data)
+        if digest is None:
+            return self._analyze_session(behavioral_data, rt_stats, detail)
+        
+        key = (detail, digest)
+        with self._session_cache_lock:
+            if self._session_cache_version != self.predictor.model_version:
+                self._session_cache.clear()
+                self._session_cache_version = self.predictor.model_version
+            cached = self._session_cache.get(key)
+        if cached is None:
+            model_version = self.predictor.model_version
+            cached = self._analyze_session(behavioral_data, rt_stats, detail, digest)
+            with self._session_cache_lock:
+                # An analysis made while the models were being replaced is not kept
+                if model_version == self._session_cache_version == self.predictor.model_version:
+                    self._session_cache[key] = cached
+        return copy.deepcopy(cached)
+    
+    def _analyze_session(self, behavioral_data, rt_stats=None, detail='full', digest=None):
+        """Session analysis without the analysis timestamp
+        
+        The ML predictions come from the predictor's own payload cache, so
+        a session analyzed at another detail level reuses them.
+        """
+        
+        anxiety_score, depression_score, attention_score, cluster = self.predictor.predict_session(
+            behavioral_data, digest
         )
         
+        # Detailed behavioral metrics
+        detailed_metrics = self._calculate_detailed_metrics(behavioral_data, rt_stats)
+        
         # Risk assessment
         risk_assessment = self._assess_risk_level(
             anxiety_score, depression_score, attention_score, detailed_metrics
         )
         
-        return {
+        result = {
             'anxiety_score': round(anxiety_score, 2),
             'depression_score': round(depression_score, 2),
             'attention_score': round(attention_score, 2),
@@ -44,32 +528,66 @@ class BehaviorAnalyzer:
             'emotional_regulation_score': round(detailed_metrics.get('emotional_regulation_score', 50), 2),
             'predicted_cluster': cluster,
             'confidence_score': detailed_metrics.get('confidence_score', 0.7),
-            'detailed_metrics': detailed_metrics,
-            'insights': insights,
             'risk_level': risk_assessment['level'],
-            'requires_attention': risk_assessment['requires_attention'],
-            'recommendations': self._generate_recommendations(risk_assessment, insights),
-            'analysis_timestamp': datetime.utcnow().isoformat()
+            'requires_attention': risk_assessment['requires_attention']
         }
+        if detail == 'scores':
+            return result
+        
+        # Generate insights
+        insights = self._generate_insights(
+            anxiety_score, depression_score, attention_score, 
+            cluster, detailed_metrics, behavioral_data
+        )
+        
+        result['detailed_metrics'] = detailed_metrics
+        result['insights'] = insights
+        result['recommendations'] = self._generate_recommendations(risk_assessment, insights)
+        return result
     
-    def _calculate_detailed_metrics(self, behavioral_data):
-        """Calculate detailed behavioral metrics from game data"""
+    def _calculate_detailed_metrics(self, behavioral_data, rt_stats=None):
+        """Calculate detailed behavioral metrics from game data
+        
+        rt_stats optionally carries precomputed _reaction_time_stats output
+        (as produced for a whole batch by analyze_sessions).
+        """
         metrics = {}
         
-        # Reaction time analysis
         reaction_times = behavioral_data.get('reactionTimes', [])
-        if reaction_times:
-            metrics['reaction_time_mean'] = np.mean(reaction_times)
-            metrics['reaction_time_std'] = np.std(reaction_times)
-            metrics['reaction_time_median'] = np.median(reaction_times)
-            metrics['reaction_time_range'] = max(reaction_times) - min(reaction_times)
+        total_clicks = behavioral_data.get('totalClicks', 0)
+        # Denominator for the per-click rates below; kept as a division rather
+        # than a reciprocal multiply so rates such as 3/10 stay exactly on the
+        # 0.3/0.4 stress thresholds
+        click_count = max(total_clicks, 1)
+        mistakes = behavioral_data.get('mistakes', 0)
+        hesitation_times = behavioral_data.get('hesitationTimes', [])
+        
+        rt = np.asarray(reaction_times, dtype=np.float64)
+        hes = np.asarray(hesitation_times, dtype=np.float64)
+        
+        # Reaction time analysis
+        if rt.size:
+            if rt_stats is None:
+                rt_stats = _reaction_time_stats(rt)
+            rt_min, rt_p25, rt_median, rt_p75, rt_max, rt_mean, rt_std = rt_stats
+            metrics['reaction_time_mean'] = rt_mean
+            metrics['reaction_time_std'] = rt_std
+            metrics['reaction_time_median'] = rt_median
+            metrics['reaction_time_range'] = rt_max - rt_min
             
             # Percentile analysis
-            metrics['reaction_time_p25'] = np.percentile(reaction_times, 25)
-            metrics['reaction_time_p75'] = np.percentile(reaction_times, 75)
+            metrics['reaction_time_p25'] = rt_p25
+            metrics['reaction_time_p75'] = rt_p75
+            
+            # Consistency measure; all-zero reaction times have no scale to
+            # measure it against, so they score like a session without any
+            if rt_mean:
+                metrics['reaction_consistency'] = 1 - (rt_std / rt_mean)
+            else:
+                metrics['reaction_consistency'] = 0
             
-            # Consistency measure
-            metrics['reaction_consistency'] = 1 - (metrics['reaction_time_std'] / metrics['reaction_time_mean'])
+            # Unusually slow reactions count as attention lapses
+            lapse_threshold = rt_mean + (2 * rt_std)
         else:
             metrics.update({
                 'reaction_time_mean': 0, 'reaction_time_std': 0,
@@ -77,38 +595,43 @@ class BehaviorAnalyzer:
                 'reaction_time_p25': 0, 'reaction_time_p75': 0,
                 'reaction_consistency': 0
             })
+            lapse_threshold = np.inf
         
-        # Error pattern analysis
-        total_clicks = behavioral_data.get('totalClicks', 0)
-        mistakes = behavioral_data.get('mistakes', 0)
+        # Every element-wise count below comes from one scan of the arrays
+        (n_fast, n_fast_errors, n_lapses, chunk_consistency,
+         hes_mean, hes_severity) = _detailed_metrics_scan(rt, rt[:mistakes], hes, lapse_threshold)
         
-        metrics['error_rate'] = mistakes / max(total_clicks, 1)
+        # Error pattern analysis
+        metrics['error_rate'] = mistakes / click_count
         metrics['accuracy'] = 1 - metrics['error_rate']
         
         # Hesitation analysis
-        hesitation_times = behavioral_data.get('hesitationTimes', [])
-        metrics['hesitation_frequency'] = len(hesitation_times) / max(total_clicks, 1)
+        metrics['hesitation_frequency'] = len(hesitation_times) / click_count
         
-        if hesitation_times:
-            metrics['avg_hesitation_duration'] = np.mean(hesitation_times)
-            metrics['hesitation_severity'] = np.mean([h for h in hesitation_times if h > 1000])
+        if hes.size:
+            metrics['avg_hesitation_duration'] = hes_mean
+            metrics['hesitation_severity'] = hes_severity
         else:
             metrics['avg_hesitation_duration'] = 0
             metrics['hesitation_severity'] = 0
         
-        # Emotional choice analysis
-        emotional_choices = behavioral_data.get('emotionalChoices', {})
-        total_emotional = sum(emotional_choices.values())
+        # Emotional choice analysis, from the [negative, neutral, positive]
+        # list or a legacy dict
+        emotional_choices = _emotional_choice_counts(behavioral_data.get('emotionalChoices'))
+        negative_choices, neutral_choices, positive_choices = emotional_choices
+        total_emotional = positive_choices + negative_choices + neutral_choices
         
         if total_emotional > 0:
-            metrics['positive_choice_ratio'] = emotional_choices.get('positive', 0) / total_emotional
-            metrics['negative_choice_ratio'] = emotional_choices.get('negative', 0) / total_emotional
-            metrics['neutral_choice_ratio'] = emotional_choices.get('neutral', 0) / total_emotional
+            # Exact divisions: counts are small integers, so ratios land exactly on
+            # the bias thresholds below, where a reciprocal multiply could round across
+            positive_ratio = positive_choices / total_emotional
+            negative_ratio = negative_choices / total_emotional
+            metrics['positive_choice_ratio'] = positive_ratio
+            metrics['negative_choice_ratio'] = negative_ratio
+            metrics['neutral_choice_ratio'] = neutral_choices / total_emotional
             
             # Emotional bias score (-1 to 1, negative values indicate negative bias)
-            metrics['emotional_bias_score'] = (
-                metrics['positive_choice_ratio'] - metrics['negative_choice_ratio']
-            )
+            metrics['emotional_bias_score'] = positive_ratio - negative_ratio
         else:
             metrics.update({
                 'positive_choice_ratio': 0.33, 'negative_choice_ratio': 0.33,
@@ -116,15 +639,14 @@ class BehaviorAnalyzer:
             })
         
         # Impulsivity indicators
-        if reaction_times:
-            fast_reactions = [rt for rt in reaction_times if rt < 300]  # Very fast reactions
-            metrics['impulsivity_frequency'] = len(fast_reactions) / len(reaction_times)
+        if rt.size:
+            # Very fast reactions
+            metrics['impulsivity_frequency'] = n_fast / rt.size
             
             # Impulsivity score based on fast reactions with high error correlation
-            fast_reaction_errors = sum(1 for rt in reaction_times[:mistakes] if rt < 500)
             metrics['impulsivity_score'] = min(
                 (metrics['impulsivity_frequency'] * 50) + 
-                (fast_reaction_errors / max(mistakes, 1) * 50), 
+                (n_fast_errors / max(mistakes, 1) * 50), 
                 100
             )
         else:
@@ -132,20 +654,11 @@ class BehaviorAnalyzer:
             metrics['impulsivity_score'] = 0
         
         # Attention pattern analysis
-        if reaction_times and len(reaction_times) > 5:
-            # Look for attention lapses (unusually slow reactions)
-            attention_threshold = metrics['reaction_time_mean'] + (2 * metrics['reaction_time_std'])
-            attention_lapses = [rt for rt in reaction_times if rt > attention_threshold]
-            metrics['attention_lapse_frequency'] = len(attention_lapses) / len(reaction_times)
+        if rt.size > 5:
+            metrics['attention_lapse_frequency'] = n_lapses / rt.size
             
-            # Sustained attention measure (consistency over time)
-            chunks = [reaction_times[i:i+5] for i in range(0, len(reaction_times)-4, 5)]
-            chunk_means = [np.mean(chunk) for chunk in chunks if len(chunk) == 5]
-            
-            if len(chunk_means) > 1:
-                metrics['sustained_attention_consistency'] = 1 - (np.std(chunk_means) / np.mean(chunk_means))
-            else:
-                metrics['sustained_attention_consistency'] = 1
+            # Sustained attention measure (consistency of 5-response chunk means)
+            metrics['sustained_attention_consistency'] = chunk_consistency
         else:
             metrics['attention_lapse_frequency'] = 0
             metrics['sustained_attention_consistency'] = 1
@@ -153,26 +666,25 @@ class BehaviorAnalyzer:
         # Emotional regulation assessment
         if 'emotionalStateChanges' in behavioral_data:
             state_changes = behavioral_data['emotionalStateChanges']
-            metrics['emotional_volatility'] = len(state_changes) / max(total_clicks, 1)
+            metrics['emotional_volatility'] = len(state_changes) / click_count
             metrics['emotional_regulation_score'] = max(0, 100 - (metrics['emotional_volatility'] * 100))
         else:
             # Infer from emotional choices and reaction time patterns
-            emotion_variance = np.var(list(emotional_choices.values())) if emotional_choices else 0
+            # Population variance of the three choice counts, on plain scalars
+            mean_count = total_emotional / 3
+            emotion_variance = sum((c - mean_count) ** 2 for c in emotional_choices) / 3
             rt_volatility = metrics['reaction_time_std'] / max(metrics['reaction_time_mean'], 1)
             
             regulation_score = 100 - min((emotion_variance * 10) + (rt_volatility * 30), 100)
             metrics['emotional_regulation_score'] = max(regulation_score, 0)
         
-        # Stress indicators
-        stress_score = 0
-        if metrics['reaction_time_std'] > 800:  # High variance
-            stress_score += 25
-        if metrics['error_rate'] > 0.3:  # High error rate
-            stress_score += 25
-        if metrics['hesitation_frequency'] > 0.4:  # Frequent hesitation
-            stress_score += 25
-        if metrics['emotional_bias_score'] < -0.3:  # Strong negative bias
-            stress_score += 25
+        # Stress indicators: 25 points per indicator present
+        stress_score = 25 * (
+            int(metrics['reaction_time_std'] > 800) +       # High variance
+            int(metrics['error_rate'] > 0.3) +              # High error rate
+            int(metrics['hesitation_frequency'] > 0.4) +    # Frequent hesitation
+            int(metrics['emotional_bias_score'] < -0.3)     # Strong negative bias
+        )
         
         metrics['stress_indicators'] = min(stress_score, 100)
         
@@ -191,10 +703,21 @@ class BehaviorAnalyzer:
         """Generate human-readable insights from the analysis"""
         insights = []
         
+        hesitation_frequency = detailed_metrics['hesitation_frequency']
+        reaction_time_mean = detailed_metrics['reaction_time_mean']
+        attention_lapse_frequency = detailed_metrics['attention_lapse_frequency']
+        impulsivity_score = detailed_metrics['impulsivity_score']
+        emotional_bias_score = detailed_metrics['emotional_bias_score']
+        emotional_regulation_score = detailed_metrics['emotional_regulation_score']
+        accuracy = detailed_metrics['accuracy']
+        reaction_consistency = detailed_metrics['reaction_consistency']
+        stress_indicators = detailed_metrics['stress_indicators']
+        sustained_attention_consistency = detailed_metrics['sustained_attention_consistency']
+        
         # Anxiety-related insights
         if anxiety_score > 70:
             insights.append("High anxiety patterns detected in gameplay behavior")
-            if detailed_metrics['hesitation_frequency'] > 0.3:
+            if hesitation_frequency > 0.3:
                 insights.append("Frequent hesitation suggests decision-making anxiety")
         elif anxiety_score > 40:
             insights.append("Moderate anxiety indicators present")
@@ -202,7 +725,7 @@ class BehaviorAnalyzer:
         # Depression-related insights
         if depression_score > 70:
             insights.append("Behavioral patterns consistent with depressive tendencies")
-            if detailed_metrics['reaction_time_mean'] > 1200:
+            if reaction_time_mean > 1200:
                 insights.append("Slower reaction times may indicate reduced engagement")
         elif depression_score > 40:
             insights.append("Some indicators of low mood or motivation")
@@ -210,7 +733,7 @@ class BehaviorAnalyzer:
         # Attention-related insights
         if attention_score < 30:
             insights.append("Significant attention difficulties observed")
-            if detailed_metrics['attention_lapse_frequency'] > 0.2:
+            if attention_lapse_frequency > 0.2:
                 insights.append("Frequent attention lapses detected during gameplay")
         elif attention_score < 60:
             insights.append("Moderate attention challenges present")
@@ -227,34 +750,34 @@ class BehaviorAnalyzer:
             insights.append("May benefit from strategies to improve consistency")
         
         # Behavioral pattern insights
-        if detailed_metrics['impulsivity_score'] > 70:
+        if impulsivity_score > 70:
             insights.append("High impulsivity indicators in gameplay")
             insights.append("Tendency toward quick decisions without full consideration")
         
-        if detailed_metrics['emotional_bias_score'] < -0.4:
+        if emotional_bias_score < -0.4:
             insights.append("Strong bias toward negative emotional choices")
             insights.append("May indicate current negative mood state")
-        elif detailed_metrics['emotional_bias_score'] > 0.4:
+        elif emotional_bias_score > 0.4:
             insights.append("Positive emotional choice bias observed")
             insights.append("Generally optimistic response patterns")
         
-        if detailed_metrics['emotional_regulation_score'] < 40:
+        if emotional_regulation_score < 40:
             insights.append("Challenges with emotional regulation detected")
             insights.append("Emotional responses show high variability")
         
         # Performance insights
-        if detailed_metrics['accuracy'] > 0.8:
+        if accuracy > 0.8:
             insights.append("Excellent accuracy demonstrates good focus")
-        elif detailed_metrics['accuracy'] < 0.5:
+        elif accuracy < 0.5:
             insights.append("Low accuracy may indicate attention or processing difficulties")
         
-        if detailed_metrics['reaction_consistency'] > 0.7:
+        if reaction_consistency > 0.7:
             insights.append("Consistent reaction times indicate stable attention")
-        elif detailed_metrics['reaction_consistency'] < 0.3:
+        elif reaction_consistency < 0.3:
             insights.append("Highly variable reaction times suggest attention fluctuations")
         
         # Stress-related insights
-        if detailed_metrics['stress_indicators'] > 60:
+        if stress_indicators > 60:
             insights.append("Multiple stress indicators present in behavior")
             insights.append("Consider stress management techniques")
         
@@ -262,7 +785,7 @@ class BehaviorAnalyzer:
         if anxiety_score < 30 and depression_score < 30:
             insights.append("Overall positive mental health indicators")
         
-        if detailed_metrics['sustained_attention_consistency'] > 0.8:
+        if sustained_attention_consistency > 0.8:
             insights.append("Strong sustained attention capabilities")
         
         return insights
@@ -270,42 +793,25 @@ class BehaviorAnalyzer:
     def _assess_risk_level(self, anxiety_score, depression_score, attention_score, detailed_metrics):
         """Assess overall risk level and need for professional attention"""
         
-        risk_factors = 0
-        
-        # High individual scores
-        if anxiety_score > 80:
-            risk_factors += 3
-        elif anxiety_score > 60:
-            risk_factors += 2
-        elif anxiety_score > 40:
-            risk_factors += 1
-        
-        if depression_score > 80:
-            risk_factors += 3
-        elif depression_score > 60:
-            risk_factors += 2
-        elif depression_score > 40:
-            risk_factors += 1
+        impulsivity_score = detailed_metrics['impulsivity_score']
+        emotional_regulation_score = detailed_metrics['emotional_regulation_score']
+        stress_indicators = detailed_metrics['stress_indicators']
+        emotional_bias_score = detailed_metrics['emotional_bias_score']
         
-        if attention_score < 20:
-            risk_factors += 3
-        elif attention_score < 40:
-            risk_factors += 2
-        elif attention_score < 60:
-            risk_factors += 1
+        # High individual scores (1-3 points each, by cut-offs crossed)
+        risk_factors = (
+            bisect_left(_ANXIETY_RISK_CUTOFFS, anxiety_score) +
+            bisect_left(_DEPRESSION_RISK_CUTOFFS, depression_score) +
+            len(_ATTENTION_RISK_CUTOFFS) - bisect_right(_ATTENTION_RISK_CUTOFFS, attention_score)
+        )
         
         # Additional behavioral risk factors
-        if detailed_metrics['impulsivity_score'] > 80:
-            risk_factors += 2
-        
-        if detailed_metrics['emotional_regulation_score'] < 30:
-            risk_factors += 2
-        
-        if detailed_metrics['stress_indicators'] > 80:
-            risk_factors += 2
-        
-        if detailed_metrics['emotional_bias_score'] < -0.6:  # Very negative bias
-            risk_factors += 1
+        risk_factors += 2 * (
+            int(impulsivity_score > 80) +
+            int(emotional_regulation_score < 30) +
+            int(stress_indicators > 80)
+        )
+        risk_factors += int(emotional_bias_score < -0.6)  # Very negative bias
         
         # Determine risk level
         if risk_factors >= 6:
@@ -329,8 +835,6 @@ class BehaviorAnalyzer:
     
     def _identify_primary_concerns(self, anxiety_score, depression_score, attention_score, detailed_metrics):
         """Identify primary areas of concern"""
-        concerns = []
-        
         scores = {
             'anxiety': anxiety_score,
             'depression': depression_score,
@@ -339,128 +843,28 @@ class BehaviorAnalyzer:
             'emotional_dysregulation': 100 - detailed_metrics['emotional_regulation_score']
         }
         
-        # Sort by severity
-        sorted_concerns = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        
-        for concern, score in sorted_concerns:
-            if score > 60:
-                concerns.append(concern)
-        
-        return concerns[:3]  # Return top 3 concerns
+        # Top 3 concerns above the threshold, most severe first
+        top_concerns = heapq.nlargest(
+            3, (item for item in scores.items() if item[1] > 60), key=itemgetter(1)
+        )
+        return [concern for concern, _ in top_concerns]
     
     def _generate_recommendations(self, risk_assessment, insights):
         """Generate personalized recommendations based on analysis"""
-        recommendations = []
-        
-        if risk_assessment['level'] == 'high':
-            recommendations.append({
-                'category': 'professional_help',
-                'priority': 'high',
-                'text': 'Consider speaking with a mental health professional for comprehensive assessment',
-                'type': 'urgent'
-            })
-        elif risk_assessment['level'] == 'medium':
-            recommendations.append({
-                'category': 'monitoring',
-                'priority': 'medium',
-                'text': 'Continue monitoring symptoms and consider professional consultation if patterns persist',
-                'type': 'advisory'
-            })
+        recommendations = list(_RISK_LEVEL_RECOMMENDATIONS.get(risk_assessment['level'], ()))
         
         # Specific recommendations based on primary concerns
         for concern in risk_assessment['primary_concerns']:
-            if concern == 'anxiety':
-                recommendations.extend([
-                    {
-                        'category': 'self_care',
-                        'priority': 'medium',
-                        'text': 'Practice relaxation techniques like deep breathing or mindfulness',
-                        'type': 'self_help'
-                    },
-                    {
-                        'category': 'lifestyle',
-                        'priority': 'medium',
-                        'text': 'Consider regular exercise and consistent sleep schedule',
-                        'type': 'lifestyle'
-                    }
-                ])
-            
-            elif concern == 'depression':
-                recommendations.extend([
-                    {
-                        'category': 'social',
-                        'priority': 'medium',
-                        'text': 'Maintain social connections and engage in enjoyable activities',
-                        'type': 'lifestyle'
-                    },
-                    {
-                        'category': 'professional_help',
-                        'priority': 'medium',
-                        'text': 'Consider counseling or therapy for mood support',
-                        'type': 'advisory'
-                    }
-                ])
-            
-            elif concern == 'attention_deficit':
-                recommendations.extend([
-                    {
-                        'category': 'cognitive',
-                        'priority': 'medium',
-                        'text': 'Break tasks into smaller chunks and minimize distractions',
-                        'type': 'self_help'
-                    },
-                    {
-                        'category': 'evaluation',
-                        'priority': 'medium',
-                        'text': 'Consider evaluation for attention-related disorders if difficulties persist',
-                        'type': 'advisory'
-                    }
-                ])
-            
-            elif concern == 'impulsivity':
-                recommendations.append({
-                    'category': 'behavioral',
-                    'priority': 'medium',
-                    'text': 'Practice pause-and-think strategies before making decisions',
-                    'type': 'self_help'
-                })
-            
-            elif concern == 'emotional_dysregulation':
-                recommendations.append({
-                    'category': 'emotional',
-                    'priority': 'medium',
-                    'text': 'Learn emotion regulation techniques like cognitive reframing',
-                    'type': 'self_help'
-                })
+            recommendations.extend(_CONCERN_RECOMMENDATIONS.get(concern, ()))
         
         # General wellness recommendations
-        recommendations.extend([
-            {
-                'category': 'wellness',
-                'priority': 'low',
-                'text': 'Maintain regular sleep, exercise, and healthy eating habits',
-                'type': 'lifestyle'
-            },
-            {
-                'category': 'monitoring',
-                'priority': 'low',
-                'text': 'Continue periodic self-assessment through FeelSync games',
-                'type': 'platform'
-            }
-        ])
+        recommendations.extend(_WELLNESS_RECOMMENDATIONS)
         
         return recommendations
     
     def _load_analysis_rules(self):
         """Load rule-based analysis guidelines"""
-        return {
-            'anxiety_thresholds': {'low': 30, 'medium': 60, 'high': 80},
-            'depression_thresholds': {'low': 30, 'medium': 60, 'high': 80},
-            'attention_thresholds': {'high': 80, 'medium': 60, 'low': 30},
-            'reaction_time_norms': {'fast': 500, 'normal': 1000, 'slow': 1500},
-            'accuracy_norms': {'high': 0.8, 'medium': 0.6, 'low': 0.4},
-            'hesitation_thresholds': {'low': 0.1, 'medium': 0.3, 'high': 0.5}
-        }
+        return _ANALYSIS_RULES
     
     def compare_with_normative_data(self, user_metrics, age_group='adolescent'):
         """Compare user metrics with normative data for their age group"""
@@ -496,66 +900,55 @@ class BehaviorAnalyzer:
         if len(user_analyses_history) < 2:
             return {'status': 'insufficient_data', 'message': 'Need at least 2 sessions for trend analysis'}
         
-        # Extract time series data
-        dates = [analysis.created_at for analysis in user_analyses_history]
-        anxiety_scores = [analysis.anxiety_score for analysis in user_analyses_history]
-        depression_scores = [analysis.depression_score for analysis in user_analyses_history]
-        attention_scores = [analysis.attention_score for analysis in user_analyses_history]
+        # Successive dashboard hits usually pass the same history; reuse the
+        # trends until a new analysis is appended
+        first, last = user_analyses_history[0], user_analyses_history[-1]
+        cache_key = (getattr(last, 'user_id', None), len(user_analyses_history),
+                     getattr(first, 'id', None), getattr(last, 'id', None))
+        cacheable = None not in cache_key
+        
+        if cacheable:
+            with self._trend_cache_lock:
+                trends = self._trend_cache.get(cache_key)
+            if trends is not None:
+                return dict(trends)
+        
+        # Extract time series data into one (n, 3) score buffer
+        n = len(user_analyses_history)
+        scores = np.empty((n, 3), dtype=np.float64)
+        for i, analysis in enumerate(user_analyses_history):
+            scores[i] = (analysis.anxiety_score, analysis.depression_score, analysis.attention_score)
+        anxiety_scores, depression_scores, attention_scores = scores.T
+        
+        timespan_days = (last.created_at - first.created_at).days
         
         # Calculate trends
         trends = {
             'anxiety_trend': self._calculate_trend(anxiety_scores),
             'depression_trend': self._calculate_trend(depression_scores),
             'attention_trend': self._calculate_trend(attention_scores),
-            'timespan_days': (dates[-1] - dates[0]).days,
-            'session_frequency': len(user_analyses_history) / max((dates[-1] - dates[0]).days, 1),
-            'overall_trajectory': self._assess_overall_trajectory(anxiety_scores, depression_scores, attention_scores)
+            'timespan_days': timespan_days,
+            'session_frequency': n / max(timespan_days, 1),
+            'overall_trajectory': self._assess_overall_trajectory(scores)
         }
         
-        return trends
+        if cacheable:
+            with self._trend_cache_lock:
+                self._trend_cache[cache_key] = trends
+        
+        return dict(trends)
     
     def _calculate_trend(self, scores):
         """Calculate trend direction for a series of scores"""
         if len(scores) < 3:
             return 'insufficient_data'
         
-        # Simple linear trend calculation
-        x = range(len(scores))
-        slope = np.polyfit(x, scores, 1)[0]
-        
-        if slope > 2:
-            return 'increasing'
-        elif slope < -2:
-            return 'decreasing'
-        else:
-            return 'stable'
+        return _TREND_LABELS[_trend_code(np.asarray(scores, dtype=np.float64))]
     
-    def _assess_overall_trajectory(self, anxiety_scores, depression_scores, attention_scores):
-        """Assess overall mental health trajectory"""
-        
-        # Calculate recent vs. early averages
-        n = len(anxiety_scores)
-        split = max(2, n // 2)
-        
-        early_anxiety = np.mean(anxiety_scores[:split])
-        recent_anxiety = np.mean(anxiety_scores[split:])
+    def _assess_overall_trajectory(self, scores):
+        """Assess overall mental health trajectory
         
-        early_depression = np.mean(depression_scores[:split])
-        recent_depression = np.mean(depression_scores[split:])
-        
-        early_attention = np.mean(attention_scores[:split])
-        recent_attention = np.mean(attention_scores[split:])
-        
-        # Improvement = lower anxiety/depression, higher attention
-        improvement_score = (
-            (early_anxiety - recent_anxiety) +
-            (early_depression - recent_depression) +
-            (recent_attention - early_attention)
-        ) / 3
-        
-        if improvement_score > 10:
-            return 'improving'
-        elif improvement_score < -10:
-            return 'declining'
-        else:
-            return 'stable'
+        Args:
+            scores: (n, 3) array of anxiety, depression and attention scores
+        """
+        return _TRAJECTORY_LABELS[_trajectory_code(scores)]
@@ -1,9 +1,71 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
-import json
+from operator import attrgetter
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.dialects.postgresql import JSONB, array as pg_array, insert as pg_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import deferred
+import numpy as np
+import orjson
+import sqlite3
 
-db = SQLAlchemy()
+from utils.passwords import ARGON2_METHOD, hash_password, verify_password_cached
+
+def dump_json_document(obj):
+    """Serialize a JSON column value with orjson (numpy scalars/arrays included)"""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+# JSON columns are (de)serialized by orjson rather than the stdlib json module
+db = SQLAlchemy(engine_options={
+    'json_serializer': dump_json_document,
+    'json_deserializer': orjson.loads,
+})
+
+DEFAULT_PASSWORD_HASH_METHOD = ARGON2_METHOD
+
+# JSON documents are stored natively: JSONB on PostgreSQL, JSON elsewhere.
+# None is written as SQL NULL, never as a JSON 'null' document, so
+# update_game_data_field can coalesce a missing document to {}
+JSONDocument = db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql')
+
+# Low-cardinality string columns are enums: a native 4-byte ENUM on PostgreSQL,
+# a short VARCHAR elsewhere. Values stay plain strings in Python.
+GAME_TYPES = ('catch_thought', 'stat_balance', 'decision_maker')
+RISK_LEVELS = ('low', 'medium', 'high')
+ACCESS_LEVELS = ('basic', 'full')
+BEHAVIOR_CLUSTERS = ('fast_accurate', 'slow_consistent', 'erratic')
+
+GameType = db.Enum(*GAME_TYPES, name='game_type')
+RiskLevel = db.Enum(*RISK_LEVELS, name='risk_level')
+AccessLevel = db.Enum(*ACCESS_LEVELS, name='access_level')
+BehaviorCluster = db.Enum(*BEHAVIOR_CLUSTERS, name='behavior_cluster')
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply write-ahead logging and memory-mapped I/O to SQLite connections"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA mmap_size=268435456')
+    cursor.close()
+
+# Plain column values copied by each model's to_dict, read with one attrgetter.
+# Timestamps are returned as naive UTC datetimes, not strings; responses
+# serialize them with orjson (see ojson in app.py)
+USER_DICT_FIELDS = ('id', 'username', 'age', 'gender', 'anonymized_id')
+GAME_SESSION_DICT_FIELDS = ('id', 'game_type', 'duration', 'completed', 'score', 'accuracy')
+BEHAVIOR_ANALYSIS_DICT_FIELDS = (
+    'id', 'anxiety_score', 'depression_score', 'attention_score', 'impulsivity_score',
+    'emotional_regulation_score', 'predicted_cluster', 'confidence_score', 'risk_level'
+)
+
+_user_dict_values = attrgetter(*USER_DICT_FIELDS)
+_game_session_dict_values = attrgetter(*GAME_SESSION_DICT_FIELDS)
+_behavior_analysis_dict_values = attrgetter(*BEHAVIOR_ANALYSIS_DICT_FIELDS)
 
 class User(db.Model):
     """User model for storing user information and consent data"""
@@ -35,16 +97,22 @@ class User(db.Model):
     last_login = db.Column(db.DateTime)
     
     # Relationships
-    game_sessions = db.relationship('GameSession', backref='user', lazy=True, cascade='all, delete-orphan')
-    behavior_analyses = db.relationship('BehaviorAnalysis', backref='user', lazy=True, cascade='all, delete-orphan')
+    game_sessions = db.relationship('GameSession', back_populates='user', lazy=True, cascade='all, delete-orphan')
+    behavior_analyses = db.relationship('BehaviorAnalysis', back_populates='user', lazy=True, cascade='all, delete-orphan')
+    consent_records = db.relationship('ConsentRecord', back_populates='user')
+    refresh_tokens = db.relationship('RefreshToken', back_populates='user', lazy=True, cascade='all, delete-orphan')
+    therapist_accesses = db.relationship(
+        'TherapistAccess', foreign_keys='TherapistAccess.therapist_id', back_populates='therapist'
+    )
     
     def set_password(self, password):
         """Set password hash"""
-        self.password_hash = generate_password_hash(password)
+        method = current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_PASSWORD_HASH_METHOD)
+        self.password_hash = hash_password(password, method=method)
     
     def check_password(self, password):
         """Check password against hash"""
-        return check_password_hash(self.password_hash, password)
+        return verify_password_cached(self.password_hash, password)
     
     def is_minor(self):
         """Check if user is a minor"""
@@ -60,25 +128,29 @@ class User(db.Model):
     
     def to_dict(self):
         """Convert user to dictionary (excluding sensitive data)"""
-        return {
-            'id': self.id,
-            'username': self.username,
-            'age': self.age,
-            'gender': self.gender,
-            'created_at': self.created_at.isoformat(),
-            'is_minor': self.is_minor(),
-            'anonymized_id': self.anonymized_id
-        }
+        data = dict(zip(USER_DICT_FIELDS, _user_dict_values(self)))
+        data['created_at'] = self.created_at
+        data['is_minor'] = self.age < 18
+        return data
 
 class GameSession(db.Model):
     """Model for storing individual game session data"""
     __tablename__ = 'game_sessions'
+    __table_args__ = (
+        # Per-user "latest sessions" lookups and the completed-only report query
+        db.Index('ix_gs_user_created', 'user_id', db.desc('created_at')),
+        db.Index('ix_gs_user_completed_created', 'user_id', 'completed', db.desc('created_at')),
+        # Covering index for "users active since X" lookups
+        db.Index('ix_gs_created_user', 'created_at', 'user_id'),
+        # Per-user, per-game stats and "latest session of this game" lookups
+        db.Index('ix_gs_user_game', 'user_id', 'game_type'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
     # Game Information
-    game_type = db.Column(db.String(50), nullable=False)  # 'catch_thought', 'stat_balance', 'decision_maker'
+    game_type = db.Column(GameType, nullable=False)
     version = db.Column(db.String(10), default='1.0')
     
     # Session Data
@@ -92,8 +164,8 @@ class GameSession(db.Model):
     level_reached = db.Column(db.Integer, default=1)
     accuracy = db.Column(db.Float, default=0.0)
     
-    # Behavioral Data (JSON stored as text)
-    game_data = db.Column(db.Text)  # JSON string containing all behavioral data
+    # Behavioral Data; deferred, load with .options(undefer_group('game_documents'))
+    game_data = deferred(db.Column(JSONDocument), group='game_documents')  # All behavioral data recorded during the game
     
     # Metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -101,17 +173,62 @@ class GameSession(db.Model):
     browser_info = db.Column(db.String(200))
     
     # Relationships
-    behavior_analysis = db.relationship('BehaviorAnalysis', backref='session', uselist=False)
+    user = db.relationship('User', back_populates='game_sessions')
+    behavior_analysis = db.relationship('BehaviorAnalysis', back_populates='session', uselist=False)
     
     def get_game_data(self):
         """Get parsed game data"""
-        if self.game_data:
-            return json.loads(self.game_data)
-        return {}
+        return self.game_data or {}
     
     def set_game_data(self, data):
-        """Set game data as JSON"""
-        self.game_data = json.dumps(data)
+        """Set game data"""
+        self.game_data = data
+    
+    def update_game_data_field(self, key, value):
+        """Set one top-level key of game_data in the database
+        
+        The document is patched server-side (jsonb_set on PostgreSQL,
+        json_set elsewhere), so it is neither loaded nor re-serialized here.
+        The loaded game_data attribute is expired and reloads on next access.
+        
+        Keys containing a double quote or backslash raise ValueError on every
+        backend: SQLite's JSON path syntax has no portable escape for them, and
+        json_set silently ignores a path whose key contains a double quote.
+        """
+        if '"' in key or '\\' in key:
+            raise ValueError(f"game_data key {key!r} cannot contain a double quote or backslash")
+        document = func.coalesce(GameSession.game_data, '{}')
+        if db.session.get_bind().dialect.name == 'postgresql':
+            patched = func.jsonb_set(document, pg_array([key]), db.literal(value, JSONB()))
+        else:
+            patched = func.json_set(document, f'$."{key}"', func.json(dump_json_document(value)))
+        db.session.execute(
+            update(GameSession).where(GameSession.id == self.id).values(game_data=patched),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.expire(self, ['game_data'])
+    
+    @classmethod
+    def bulk_log(cls, session, records):
+        """Insert many game sessions in one executemany and commit
+        
+        records are dicts of column values; timestamps may be datetimes or
+        ISO 8601 strings. On PostgreSQL, rows whose id already exists are
+        skipped.
+        """
+        if not records:
+            return
+        rows = [dict(record) for record in records]
+        for row in rows:
+            for column in ('start_time', 'end_time', 'created_at'):
+                if isinstance(row.get(column), str):
+                    row[column] = datetime.fromisoformat(row[column])
+        if session.get_bind().dialect.name == 'postgresql':
+            statement = pg_insert(cls).on_conflict_do_nothing(index_elements=[cls.id])
+        else:
+            statement = insert(cls)
+        session.execute(statement, rows)
+        session.commit()
     
     def get_duration_minutes(self):
         """Get duration in minutes"""
@@ -121,25 +238,61 @@ class GameSession(db.Model):
     
     def to_dict(self):
         """Convert session to dictionary"""
-        return {
-            'id': self.id,
-            'game_type': self.game_type,
-            'start_time': self.start_time.isoformat(),
-            'end_time': self.end_time.isoformat() if self.end_time else None,
-            'duration': self.duration,
-            'completed': self.completed,
-            'score': self.score,
-            'accuracy': self.accuracy,
-            'behavioral_data': self.get_game_data()
-        }
+        data = dict(zip(GAME_SESSION_DICT_FIELDS, _game_session_dict_values(self)))
+        data['start_time'] = self.start_time
+        data['end_time'] = self.end_time
+        data['behavioral_data'] = self.game_data or {}
+        return data
+
+# Risk indicator messages, in the order of the anxiety, depression, attention,
+# impulsivity and emotional regulation checks that raise them; check i sets
+# bit i of BehaviorAnalysis.risk_flags
+RISK_INDICATOR_MESSAGES = (
+    "High anxiety patterns detected",
+    "Potential depressive tendencies",
+    "Attention difficulties observed",
+    "Impulsive behavior patterns",
+    "Emotional regulation challenges"
+)
+
+# Indicator messages for every possible risk_flags value
+RISK_INDICATORS_BY_FLAGS = tuple(
+    tuple(message for bit, message in enumerate(RISK_INDICATOR_MESSAGES) if flags >> bit & 1)
+    for flags in range(1 << len(RISK_INDICATOR_MESSAGES))
+)
+
+# The BehaviorAnalysis score attributes risk_flags is computed from
+RISK_SCORE_ATTRIBUTES = (
+    'anxiety_score', 'depression_score', 'attention_score',
+    'impulsivity_score', 'emotional_regulation_score'
+)
+
+def compute_risk_flags(anxiety, depression, attention, impulsivity, emotional_regulation):
+    """Pack the five risk indicator checks into a bitmask"""
+    return (
+        (anxiety > 70) |
+        (depression > 70) << 1 |
+        (attention < 30) << 2 |
+        (impulsivity > 70) << 3 |
+        (emotional_regulation < 30) << 4
+    )
 
 class BehaviorAnalysis(db.Model):
     """Model for storing ML analysis results"""
     __tablename__ = 'behavior_analyses'
+    __table_args__ = (
+        db.Index('ix_ba_user_created', 'user_id', db.desc('created_at')),
+        # Partial index for the alerting query: only flagged analyses are indexed
+        db.Index(
+            'ix_ba_high_risk', 'user_id',
+            postgresql_where=db.text('requires_attention'),
+            sqlite_where=db.text('requires_attention = 1')
+        ),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    session_id = db.Column(db.Integer, db.ForeignKey('game_sessions.id'), nullable=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('game_sessions.id'), nullable=True, index=True)
     
     # Mental Health Indicators (0-100 scale)
     anxiety_score = db.Column(db.Float, default=0.0)
@@ -156,90 +309,160 @@ class BehaviorAnalysis(db.Model):
     hesitation_frequency = db.Column(db.Float)
     
     # ML Model Results
-    predicted_cluster = db.Column(db.String(20))  # 'fast_accurate', 'slow_consistent', 'erratic'
+    predicted_cluster = db.Column(BehaviorCluster)
     confidence_score = db.Column(db.Float, default=0.0)
     
-    # Detailed Analysis (JSON)
-    analysis_data = db.Column(db.Text)  # Detailed analysis results
-    insights = db.Column(db.Text)  # Human-readable insights
+    # Detailed Analysis (JSON); deferred, and loaded together on first access
+    # or with .options(undefer_group('analysis_documents'))
+    analysis_data = deferred(db.Column(JSONDocument), group='analysis_documents')  # Detailed analysis results
+    insights = deferred(db.Column(JSONDocument), group='analysis_documents')  # Human-readable insights
     
     # Risk Assessment
-    risk_level = db.Column(db.String(10), default='low')  # 'low', 'medium', 'high'
+    risk_level = db.Column(RiskLevel, default='low')
     requires_attention = db.Column(db.Boolean, default=False)
+    # Bitmask of raised risk indicators, kept in sync with the scores on write
+    risk_flags = db.Column(db.SmallInteger, default=0, nullable=False)
     
     # Metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     model_version = db.Column(db.String(10), default='1.0')
     
+    # Relationships
+    user = db.relationship('User', back_populates='behavior_analyses')
+    # Listing queries that need the session must join it explicitly, e.g.
+    # .join(BehaviorAnalysis.session).options(contains_eager(BehaviorAnalysis.session));
+    # a per-row lazy load raises instead of silently issuing N queries
+    session = db.relationship('GameSession', back_populates='behavior_analysis', lazy='raise_on_sql')
+    
     def get_analysis_data(self):
         """Get parsed analysis data"""
-        if self.analysis_data:
-            return json.loads(self.analysis_data)
-        return {}
+        return self.analysis_data or {}
     
     def set_analysis_data(self, data):
-        """Set analysis data as JSON"""
-        self.analysis_data = json.dumps(data)
+        """Set analysis data"""
+        self.analysis_data = data
     
     def get_insights_list(self):
         """Get insights as a list"""
-        if self.insights:
-            return json.loads(self.insights)
-        return []
+        return self.insights or []
     
     def set_insights(self, insights_list):
         """Set insights from a list"""
-        self.insights = json.dumps(insights_list)
+        self.insights = insights_list
+    
+    @hybrid_property
+    def overall_score(self):
+        """Overall mental health indicator score; also usable in queries,
+        e.g. order_by(BehaviorAnalysis.overall_score.desc())"""
+        return (
+            self.anxiety_score +
+            self.depression_score +
+            (100 - self.attention_score) +  # Higher attention = better
+            self.impulsivity_score +
+            (100 - self.emotional_regulation_score)  # Higher regulation = better
+        ) / 5.0
     
     def get_overall_score(self):
         """Calculate overall mental health indicator score"""
-        scores = [
-            self.anxiety_score,
-            self.depression_score,
-            100 - self.attention_score,  # Higher attention = better
-            self.impulsivity_score,
-            100 - self.emotional_regulation_score  # Higher regulation = better
-        ]
-        return sum(scores) / len(scores)
+        return self.overall_score
+    
+    def score_risk_flags(self):
+        """The risk_flags bitmask for the current scores (unset scores count as 0)"""
+        return compute_risk_flags(
+            self.anxiety_score or 0.0,
+            self.depression_score or 0.0,
+            self.attention_score or 0.0,
+            self.impulsivity_score or 0.0,
+            self.emotional_regulation_score or 0.0
+        )
+    
+    def update_risk_flags(self):
+        """Recompute risk_flags from the current scores"""
+        self.risk_flags = self.score_risk_flags()
     
     def get_risk_indicators(self):
-        """Get list of risk indicators"""
-        indicators = []
+        """Get list of risk indicators
         
-        if self.anxiety_score > 70:
-            indicators.append("High anxiety patterns detected")
-        if self.depression_score > 70:
-            indicators.append("Potential depressive tendencies")
-        if self.attention_score < 30:
-            indicators.append("Attention difficulties observed")
-        if self.impulsivity_score > 70:
-            indicators.append("Impulsive behavior patterns")
-        if self.emotional_regulation_score < 30:
-            indicators.append("Emotional regulation challenges")
-        
-        return indicators
+        The stored risk_flags is only refreshed when the analysis is flushed,
+        so while any score has unflushed changes the flags come from the scores.
+        """
+        if self.risk_flags is None:
+            self.update_risk_flags()
+        attrs = inspect(self).attrs
+        if any(attrs[name].history.has_changes() for name in RISK_SCORE_ATTRIBUTES):
+            return list(RISK_INDICATORS_BY_FLAGS[self.score_risk_flags()])
+        return list(RISK_INDICATORS_BY_FLAGS[self.risk_flags])
     
     def to_dict(self):
         """Convert analysis to dictionary"""
-        return {
-            'id': self.id,
-            'created_at': self.created_at.isoformat(),
-            'anxiety_score': self.anxiety_score,
-            'depression_score': self.depression_score,
-            'attention_score': self.attention_score,
-            'impulsivity_score': self.impulsivity_score,
-            'emotional_regulation_score': self.emotional_regulation_score,
-            'predicted_cluster': self.predicted_cluster,
-            'confidence_score': self.confidence_score,
-            'risk_level': self.risk_level,
-            'overall_score': self.get_overall_score(),
-            'risk_indicators': self.get_risk_indicators(),
-            'insights': self.get_insights_list()
-        }
+        data = dict(zip(BEHAVIOR_ANALYSIS_DICT_FIELDS, _behavior_analysis_dict_values(self)))
+        data['created_at'] = self.created_at
+        data['overall_score'] = self.overall_score
+        data['risk_indicators'] = self.get_risk_indicators()
+        data['insights'] = self.insights or []
+        return data
+    
+    @classmethod
+    def bulk_to_dict(cls, session, ids):
+        """to_dict for many analyses at once, for analytics and export
+        
+        Only the serialized columns are selected (no ORM instances are
+        built), and the overall scores and risk indicator flags of all rows
+        are computed as NumPy column operations; risk indicators are decoded
+        from the stored risk_flags. Results follow the order of ids; unknown
+        ids are skipped.
+        """
+        rows = session.execute(
+            select(
+                cls.id, cls.created_at,
+                cls.anxiety_score, cls.depression_score, cls.attention_score,
+                cls.impulsivity_score, cls.emotional_regulation_score,
+                cls.predicted_cluster, cls.confidence_score, cls.risk_level, cls.risk_flags,
+                cls.insights
+            ).where(cls.id.in_(ids))
+        ).all()
+        if not rows:
+            return []
+        
+        scores = np.array([row[2:7] for row in rows], dtype=np.float64)
+        anxiety, depression, attention, impulsivity, regulation = scores.T
+        overall = (anxiety + depression + (100 - attention) + impulsivity + (100 - regulation)) / 5.0
+        
+        by_id = {}
+        for row, row_overall in zip(rows, overall.tolist()):
+            data = dict(zip(BEHAVIOR_ANALYSIS_DICT_FIELDS, _behavior_analysis_dict_values(row)))
+            data['created_at'] = row.created_at
+            data['overall_score'] = row_overall
+            data['risk_indicators'] = list(RISK_INDICATORS_BY_FLAGS[row.risk_flags])
+            data['insights'] = row.insights or []
+            by_id[row.id] = data
+        return [by_id[analysis_id] for analysis_id in ids if analysis_id in by_id]
+    
+    @classmethod
+    def risk_counts(cls, session):
+        """Number of analyses raising each risk indicator, in one aggregate query"""
+        return session.execute(
+            select(
+                func.count().filter(cls.anxiety_score > 70).label('anxiety'),
+                func.count().filter(cls.depression_score > 70).label('depression'),
+                func.count().filter(cls.attention_score < 30).label('attention'),
+                func.count().filter(cls.impulsivity_score > 70).label('impulsivity'),
+                func.count().filter(cls.emotional_regulation_score < 30).label('emotional_regulation')
+            ).select_from(cls)
+        ).one()._asdict()
+
+@event.listens_for(BehaviorAnalysis, 'before_insert')
+@event.listens_for(BehaviorAnalysis, 'before_update')
+def set_risk_flags(mapper, connection, target):
+    """Store the risk indicator bitmask whenever an analysis is written"""
+    target.update_risk_flags()
 
 class ConsentRecord(db.Model):
     """Model for tracking consent history"""
     __tablename__ = 'consent_records'
+    __table_args__ = (
+        db.Index('ix_cr_user_type', 'user_id', 'consent_type'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -254,22 +477,57 @@ class ConsentRecord(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    user = db.relationship('User', backref='consent_records')
+    user = db.relationship('User', back_populates='consent_records')
+
+class RefreshToken(db.Model):
+    """Model for tracking issued refresh tokens and their rotation chains"""
+    __tablename__ = 'refresh_tokens'
+    
+    jti = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    
+    # Every token rotated from the same login shares a family
+    family = db.Column(db.String(32), nullable=False, index=True)
+    revoked = db.Column(db.Boolean, default=False, nullable=False)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    # Relationships
+    user = db.relationship('User', back_populates='refresh_tokens')
 
 class TherapistAccess(db.Model):
     """Model for managing therapist access to user data"""
     __tablename__ = 'therapist_access'
+    __table_args__ = (
+        # One grant per therapist/patient pair; also the index behind has_access
+        db.UniqueConstraint('therapist_id', 'user_id', name='uq_therapist_user'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     therapist_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     
     access_granted = db.Column(db.Boolean, default=False)
-    access_level = db.Column(db.String(20), default='basic')  # 'basic', 'full'
+    access_level = db.Column(AccessLevel, default='basic')
     
     granted_at = db.Column(db.DateTime, default=datetime.utcnow)
     expires_at = db.Column(db.DateTime)
     
     # Relationships
-    therapist = db.relationship('User', foreign_keys=[therapist_id], backref='therapist_accesses')
-    patient
+    therapist = db.relationship('User', foreign_keys=[therapist_id], back_populates='therapist_accesses')
+    patient = db.relationship('User', foreign_keys=[user_id])
+    
+    @classmethod
+    def has_access(cls, therapist_id, user_id):
+        """Whether the therapist currently holds an unexpired grant for the user"""
+        return db.session.execute(
+            select(
+                select(cls.id).where(
+                    cls.therapist_id == therapist_id,
+                    cls.user_id == user_id,
+                    cls.access_granted.is_(True),
+                    (cls.expires_at.is_(None)) | (cls.expires_at > datetime.utcnow())
+                ).exists()
+            )
+        ).scalar()
@@ -8,18 +8,220 @@ from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
+import hashlib
 import json
+import orjson
 import os
+import threading
 from datetime import datetime
+from cachetools import LRUCache
 import warnings
 warnings.filterwarnings('ignore')
 
+from utils.jit import njit, NUMBA_AVAILABLE
+
+# Treelite is optional: when installed, saved regressors are also compiled to
+# native shared libraries that replace sklearn's predict on the hot path
+try:
+    import treelite
+    import treelite_runtime
+    TREELITE_AVAILABLE = True
+except ImportError:
+    treelite = None
+    treelite_runtime = None
+    TREELITE_AVAILABLE = False
+
+BEHAVIOR_CLUSTER_NAMES = ('fast_accurate', 'slow_consistent', 'erratic')
+REGRESSION_MODELS = ('anxiety', 'depression', 'attention')
+
+# Batches at least this large are predicted with the forests' trees spread
+# over all cores; smaller ones stay single-threaded, where thread dispatch
+# would cost more than it saves
+PARALLEL_PREDICT_MIN_ROWS = 64
+
+# Feature vectors stay float64: the rule thresholds (accuracy < 0.7 and > 0.8,
+# emotional bias > 0.2, ...) are float64 literals, and float32 rounding moves
+# values such as 70/100 or 0.8 to the other side of them
+FEATURE_DTYPE = np.float64
+
+
+@njit(cache=True)
+def _reaction_time_kernel(reaction_times):
+    """Loop kernel behind _reaction_time_stats"""
+    n = reaction_times.size
+    total = 0.0
+    n_fast = 0
+    n_slow = 0
+    for rt in reaction_times:
+        total += rt
+        if rt < 500:
+            n_fast += 1
+        elif rt > 2000:
+            n_slow += 1
+    mean = total / n
+    
+    squares = 0.0
+    for rt in reaction_times:
+        squares += (rt - mean) * (rt - mean)
+    
+    return mean, np.sqrt(squares / n), n_fast, n_slow
+
+def _reaction_time_numpy(reaction_times):
+    """Vectorised NumPy implementation of _reaction_time_stats"""
+    return (
+        float(reaction_times.mean()),
+        float(reaction_times.std()),
+        int(np.count_nonzero(reaction_times < 500)),
+        int(np.count_nonzero(reaction_times > 2000))
+    )
+
+def _reaction_time_stats(reaction_times):
+    """Mean, std, fast (< 500ms) and slow (> 2s) counts of a non-empty array"""
+    if NUMBA_AVAILABLE:
+        return _reaction_time_kernel(reaction_times)
+    return _reaction_time_numpy(reaction_times)
+
+def _emotional_choice_counts(emotional_choices):
+    """(negative, neutral, positive) counts of an emotionalChoices payload
+    
+    Accepts the fixed-order [negative, neutral, positive] list as well as the
+    legacy {'negative': n, 'neutral': n, 'positive': n} dict, which stored
+    sessions carry until `flask migrate-emotional-choices` rewrites them.
+    """
+    if not emotional_choices:
+        return 0, 0, 0
+    if isinstance(emotional_choices, dict):
+        return (
+            emotional_choices.get('negative', 0),
+            emotional_choices.get('neutral', 0),
+            emotional_choices.get('positive', 0)
+        )
+    negative, neutral, positive = emotional_choices
+    return negative, neutral, positive
+
+def _session_digest(behavioral_data):
+    """Digest of the key-sorted session payload, or None if it is not serializable"""
+    try:
+        canonical = orjson.dumps(
+            behavioral_data,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    except TypeError:
+        return None
+    return hashlib.blake2b(canonical, digest_size=16).digest()
+
+# Rule-based predictions over a feature vector laid out as
+# BehaviorPredictor.feature_names; plain scalar code, compiled when Numba is
+# available and run as-is otherwise
+
+@njit(cache=True)
+def _rule_based_anxiety(features):
+    """Rule-based anxiety score (0-100)"""
+    anxiety_score = 0.0
+    
+    # High reaction time variance suggests anxiety
+    if features[1] > 500:
+        anxiety_score += 30
+    
+    # High hesitation count
+    anxiety_score += min(features[3] * 5, 25)
+    
+    # Low accuracy due to overthinking
+    if features[2] < 0.7:
+        anxiety_score += 20
+    
+    # Negative emotional bias
+    if features[6] > 0.2:
+        anxiety_score += 15
+    
+    # Stress markers
+    anxiety_score += features[10] * 30
+    
+    return min(anxiety_score, 100.0)
+
+@njit(cache=True)
+def _rule_based_depression(features):
+    """Rule-based depression score (0-100)"""
+    depression_score = 0.0
+    
+    # Slow reaction times
+    if features[0] > 1000:
+        depression_score += 25
+    
+    # High number of attention lapses
+    depression_score += features[9] * 40
+    
+    # Negative emotional bias
+    if features[6] > 0.3:
+        depression_score += 30
+    
+    # Low consistency (lack of engagement)
+    if features[7] < 0.5:
+        depression_score += 20
+    
+    # Slow decision making
+    if features[5] > 2000:
+        depression_score += 15
+    
+    return min(depression_score, 100.0)
+
+@njit(cache=True)
+def _rule_based_attention(features):
+    """Rule-based attention score (0-100, higher is better)"""
+    attention_score = 100.0  # Start with perfect attention, subtract issues
+    
+    # High impulsivity reduces attention score
+    attention_score -= features[8] * 40
+    
+    # Attention lapses
+    attention_score -= features[9] * 50
+    
+    # High reaction time variance (inconsistency)
+    if features[1] > 600:
+        attention_score -= 30
+    
+    # High error rate
+    attention_score -= features[4] * 40
+    
+    # Low consistency
+    attention_score -= (1 - features[7]) * 20
+    
+    return max(0.0, attention_score)
+
+@njit(cache=True)
+def _rule_based_cluster_index(features):
+    """Rule-based index into BEHAVIOR_CLUSTER_NAMES"""
+    reaction_time_avg = features[0]
+    accuracy = features[2]
+    error_rate = features[4]
+    
+    # Fast and accurate cluster
+    if reaction_time_avg < 800 and accuracy > 0.8 and error_rate < 0.2:
+        return 0
+    
+    # Slow but consistent cluster
+    if reaction_time_avg > 1200 and features[7] > 0.7 and error_rate < 0.3:
+        return 1
+    
+    # Erratic cluster (default)
+    return 2
+
 class BehaviorPredictor:
     """Main ML model for predicting behavioral patterns and mental health indicators"""
     
     def __init__(self):
         self.models = {}
         self.scalers = {}
+        self.compiled_predictors = {}  # Treelite predictors for REGRESSION_MODELS
+        # Fitted scaler parameters, so scaling is (x - mean) * inv_scale
+        self._scaler_mean = {}
+        self._scaler_inv_scale = {}
+        self._thread_buffers = threading.local()
+        # (anxiety, depression, attention, cluster) per session payload digest,
+        # emptied whenever the models change; model_version counts the changes
+        self._prediction_cache = LRUCache(maxsize=4096)
+        self._prediction_cache_lock = threading.Lock()
+        self.model_version = 0
         self.feature_names = [
             'reaction_time_avg', 'reaction_time_std', 'accuracy', 'hesitation_count',
             'error_rate', 'decision_time_avg', 'emotional_choice_bias', 'consistency_score',
@@ -81,28 +283,46 @@ class BehaviorPredictor:
         for model_name in ['anxiety', 'depression', 'attention', 'cluster', 'risk']:
             self.scalers[model_name] = StandardScaler()
     
-    def extract_features(self, behavioral_data):
-        """Extract ML features from behavioral data"""
+    def feature_buffer(self):
+        """This thread's reusable feature vector
+        
+        For extract_features(..., out=...) on paths that use the features
+        immediately; its contents are overwritten by the next extraction.
+        """
+        buffer = getattr(self._thread_buffers, 'features', None)
+        if buffer is None:
+            buffer = self._thread_buffers.features = np.empty(len(self.feature_names), dtype=FEATURE_DTYPE)
+        return buffer
+    
+    def extract_features(self, behavioral_data, out=None):
+        """Extract ML features from behavioral data
+        
+        The features are written into out (e.g. a feature_buffer() or a row
+        of a batch matrix) when given, otherwise into a new array.
+        """
         
         if isinstance(behavioral_data, str):
             behavioral_data = json.loads(behavioral_data)
         
-        # Initialize feature vector
-        features = np.zeros(len(self.feature_names))
+        # Every entry is assigned below; on failure the vector is zeroed
+        features = out if out is not None else np.empty(len(self.feature_names), dtype=FEATURE_DTYPE)
         
         try:
-            # Reaction time features
-            reaction_times = behavioral_data.get('reactionTimes', [])
-            if reaction_times:
-                features[0] = np.mean(reaction_times)  # reaction_time_avg
-                features[1] = np.std(reaction_times)   # reaction_time_std
+            # Reaction time features, from one array and a single mean/std
+            reaction_times = np.ascontiguousarray(behavioral_data.get('reactionTimes', ()), dtype=np.float64)
+            n_reactions = reaction_times.size
+            if n_reactions:
+                rt_mean, rt_std, n_fast, n_slow = _reaction_time_stats(reaction_times)
+            else:
+                rt_mean = rt_std = 0.0
+            features[0] = rt_mean  # reaction_time_avg
+            features[1] = rt_std   # reaction_time_std
             
             # Accuracy
             features[2] = behavioral_data.get('accuracy', 0) / 100.0
             
             # Hesitation count
-            hesitation_times = behavioral_data.get('hesitationTimes', [])
-            features[3] = len(hesitation_times)
+            features[3] = len(behavioral_data.get('hesitationTimes', ()))
             
             # Error rate
             total_clicks = behavioral_data.get('totalClicks', 1)
@@ -110,187 +330,226 @@ class BehaviorPredictor:
             features[4] = mistakes / max(total_clicks, 1)
             
             # Decision time average
-            decision_times = behavioral_data.get('decisionTimes', [])
-            if decision_times:
-                features[5] = np.mean(decision_times)
-            
-            # Emotional choice bias
-            emotional_choices = behavioral_data.get('emotionalChoices', {})
-            total_emotional = sum(emotional_choices.values())
-            if total_emotional > 0:
-                negative_ratio = emotional_choices.get('negative', 0) / total_emotional
-                positive_ratio = emotional_choices.get('positive', 0) / total_emotional
-                features[6] = negative_ratio - positive_ratio  # Bias towards negative
+            decision_times = behavioral_data.get('decisionTimes', ())
+            features[5] = np.mean(decision_times) if len(decision_times) else 0.0
             
-            # Consistency score (inverse of standard deviation)
-            if reaction_times and len(reaction_times) > 1:
-                features[7] = 1 / (1 + np.std(reaction_times) / np.mean(reaction_times))
+            # Emotional choice bias towards negative
+            negative, neutral, positive = _emotional_choice_counts(behavioral_data.get('emotionalChoices'))
+            total_emotional = negative + neutral + positive
+            features[6] = (negative - positive) / total_emotional if total_emotional > 0 else 0.0
             
-            # Impulsivity indicators (fast reactions with high error rate)
-            fast_reactions = [rt for rt in reaction_times if rt < 500]  # < 500ms
-            features[8] = len(fast_reactions) / max(len(reaction_times), 1)
+            # Consistency score (inverse of standard deviation); all-zero
+            # reaction times have no scale and score like a single reaction
+            features[7] = 1 / (1 + rt_std / rt_mean) if n_reactions > 1 and rt_mean else 0.0
             
-            # Attention lapses (very slow reactions)
-            slow_reactions = [rt for rt in reaction_times if rt > 2000]  # > 2s
-            features[9] = len(slow_reactions) / max(len(reaction_times), 1)
+            # Impulsivity indicators (fast reactions, < 500ms) and attention
+            # lapses (very slow reactions, > 2s) as fractions of all reactions
+            if n_reactions:
+                features[8] = n_fast / n_reactions
+                features[9] = n_slow / n_reactions
+            else:
+                features[8] = features[9] = 0.0
             
             # Stress markers (combination of high error rate and high reaction time variance)
-            if reaction_times:
-                stress_score = features[4] * features[1] / 1000  # Normalized stress indicator
-                features[10] = min(stress_score, 1.0)
+            features[10] = min(features[4] * rt_std / 1000, 1.0) if n_reactions else 0.0
             
         except Exception as e:
             print(f"Feature extraction error: {e}")
             # Return default features if extraction fails
-            pass
+            features.fill(0.0)
         
         return features
     
     def predict_anxiety(self, behavioral_data):
         """Predict anxiety indicators from behavioral data"""
-        features = self.extract_features(behavioral_data)
-        
+        return self.predict_anxiety_from_features(
+            self.extract_features(behavioral_data, out=self.feature_buffer())
+        )
+    
+    def predict_anxiety_from_features(self, features):
+        """Predict anxiety indicators from an extract_features vector"""
         # Rule-based fallback if model not trained
         if not hasattr(self.models['anxiety'], 'feature_importances_'):
             return self._rule_based_anxiety_prediction(features)
         
-        features_scaled = self.scalers['anxiety'].transform([features])
-        anxiety_score = self.models['anxiety'].predict(features_scaled)[0]
+        features_scaled = self._scale('anxiety', features)[None, :]
+        anxiety_score = self._predict_regression('anxiety', features_scaled)[0]
         
         return max(0, min(100, anxiety_score))
     
     def predict_depression(self, behavioral_data):
         """Predict depression indicators from behavioral data"""
-        features = self.extract_features(behavioral_data)
-        
+        return self.predict_depression_from_features(
+            self.extract_features(behavioral_data, out=self.feature_buffer())
+        )
+    
+    def predict_depression_from_features(self, features):
+        """Predict depression indicators from an extract_features vector"""
         # Rule-based fallback if model not trained
         if not hasattr(self.models['depression'], 'feature_importances_'):
             return self._rule_based_depression_prediction(features)
         
-        features_scaled = self.scalers['depression'].transform([features])
-        depression_score = self.models['depression'].predict(features_scaled)[0]
+        features_scaled = self._scale('depression', features)[None, :]
+        depression_score = self._predict_regression('depression', features_scaled)[0]
         
         return max(0, min(100, depression_score))
     
     def predict_attention(self, behavioral_data):
         """Predict attention/ADHD indicators from behavioral data"""
-        features = self.extract_features(behavioral_data)
-        
+        return self.predict_attention_from_features(
+            self.extract_features(behavioral_data, out=self.feature_buffer())
+        )
+    
+    def predict_attention_from_features(self, features):
+        """Predict attention/ADHD indicators from an extract_features vector"""
         # Rule-based fallback if model not trained
         if not hasattr(self.models['attention'], 'feature_importances_'):
             return self._rule_based_attention_prediction(features)
         
-        features_scaled = self.scalers['attention'].transform([features])
-        attention_score = self.models['attention'].predict(features_scaled)[0]
+        features_scaled = self._scale('attention', features)[None, :]
+        attention_score = self._predict_regression('attention', features_scaled)[0]
         
         return max(0, min(100, attention_score))
     
     def predict_cluster(self, behavioral_data):
         """Predict behavioral cluster"""
-        features = self.extract_features(behavioral_data)
-        
+        return self.predict_cluster_from_features(
+            self.extract_features(behavioral_data, out=self.feature_buffer())
+        )
+    
+    def predict_cluster_from_features(self, features):
+        """Predict behavioral cluster from an extract_features vector"""
         # Rule-based clustering if model not trained
         if not hasattr(self.models['cluster'], 'cluster_centers_'):
             return self._rule_based_clustering(features)
         
-        features_scaled = self.scalers['cluster'].transform([features])
+        features_scaled = self._scale('cluster', features)[None, :]
         cluster = self.models['cluster'].predict(features_scaled)[0]
         
-        cluster_names = ['fast_accurate', 'slow_consistent', 'erratic']
-        return cluster_names[cluster]
+        return BEHAVIOR_CLUSTER_NAMES[cluster]
     
-    def _rule_based_anxiety_prediction(self, features):
-        """Rule-based anxiety prediction fallback"""
-        reaction_time_avg, reaction_time_std, accuracy, hesitation_count, error_rate, _, emotional_bias, consistency, _, _, stress_markers = features
-        
-        anxiety_score = 0
-        
-        # High reaction time variance suggests anxiety
-        if reaction_time_std > 500:
-            anxiety_score += 30
-        
-        # High hesitation count
-        anxiety_score += min(hesitation_count * 5, 25)
-        
-        # Low accuracy due to overthinking
-        if accuracy < 0.7:
-            anxiety_score += 20
+    def predict_session(self, behavioral_data, digest=None):
+        """(anxiety, depression, attention, cluster) for one session payload
+        
+        Cached by the payload digest, which callers that already computed
+        it with _session_digest can pass in. Repeat analyses of the same
+        session skip feature extraction and the models until they change.
+        """
+        if digest is None:
+            digest = _session_digest(behavioral_data)
+        if digest is not None:
+            with self._prediction_cache_lock:
+                cached = self._prediction_cache.get(digest)
+            if cached is not None:
+                return cached
+        
+        model_version = self.model_version
+        features = self.extract_features(behavioral_data, out=self.feature_buffer())
+        prediction = (
+            self.predict_anxiety_from_features(features),
+            self.predict_depression_from_features(features),
+            self.predict_attention_from_features(features),
+            self.predict_cluster_from_features(features)
+        )
         
-        # Negative emotional bias
-        if emotional_bias > 0.2:
-            anxiety_score += 15
+        with self._prediction_cache_lock:
+            # A prediction made while the models were being replaced is not kept
+            if digest is not None and model_version == self.model_version:
+                self._prediction_cache[digest] = prediction
+        return prediction
+    
+    def _models_changed(self):
+        """Drop predictions made by the previous models"""
+        with self._prediction_cache_lock:
+            self.model_version += 1
+            self._prediction_cache.clear()
+    
+    def predict_batch(self, features):
+        """Predict all indicators for an (N, n_features) feature matrix
+        
+        Each scaler and model is called once for the whole batch. Returns
+        anxiety, depression and attention score arrays clipped to 0-100 and
+        a list of cluster names.
+        """
+        features = np.atleast_2d(features)
+        predictions = {}
+        n_jobs = -1 if len(features) >= PARALLEL_PREDICT_MIN_ROWS else 1
+        
+        for model_name, rule_based_prediction in (
+            ('anxiety', self._rule_based_anxiety_prediction),
+            ('depression', self._rule_based_depression_prediction),
+            ('attention', self._rule_based_attention_prediction)
+        ):
+            if hasattr(self.models[model_name], 'feature_importances_'):
+                # The forests are built with n_jobs=None, so they take the
+                # worker count from the active joblib backend
+                with joblib.parallel_backend('threading', n_jobs=n_jobs):
+                    scores = self._predict_regression(model_name, self._scale(model_name, features))
+            else:
+                scores = np.array([rule_based_prediction(row) for row in features], dtype=np.float64)
+            predictions[model_name] = np.clip(scores, 0, 100)
+        
+        if hasattr(self.models['cluster'], 'cluster_centers_'):
+            labels = self.models['cluster'].predict(self._scale('cluster', features))
+            predictions['cluster'] = [BEHAVIOR_CLUSTER_NAMES[label] for label in labels]
+        else:
+            predictions['cluster'] = [self._rule_based_clustering(row) for row in features]
         
-        # Stress markers
-        anxiety_score += stress_markers * 30
+        return predictions
+    
+    def _cache_scaler(self, model_name):
+        """Keep a fitted scaler's mean and inverse scale as FEATURE_DTYPE arrays"""
+        scaler = self.scalers[model_name]
+        if hasattr(scaler, 'mean_'):
+            self._scaler_mean[model_name] = scaler.mean_.astype(FEATURE_DTYPE)
+            self._scaler_inv_scale[model_name] = (1.0 / scaler.scale_).astype(FEATURE_DTYPE)
+    
+    def _scale(self, model_name, features):
+        """StandardScaler.transform without sklearn's per-call input validation"""
+        mean = self._scaler_mean.get(model_name)
+        if mean is None:
+            return self.scalers[model_name].transform(np.atleast_2d(features)).reshape(np.shape(features))
+        return (features - mean) * self._scaler_inv_scale[model_name]
+    
+    def _predict_regression(self, model_name, features_scaled):
+        """Predict with the compiled Treelite library if loaded, else sklearn"""
+        compiled = self.compiled_predictors.get(model_name)
+        if compiled is not None:
+            return np.ravel(compiled.predict(treelite_runtime.DMatrix(features_scaled)))
+        return self.models[model_name].predict(features_scaled)
+    
+    def compile_models(self, model_dir='models/trained'):
+        """Compile the trained regressors with Treelite and load the libraries"""
+        if not TREELITE_AVAILABLE:
+            return
         
-        return min(anxiety_score, 100)
+        os.makedirs(model_dir, exist_ok=True)
+        for model_name in REGRESSION_MODELS:
+            model = self.models[model_name]
+            if not hasattr(model, 'feature_importances_'):
+                continue
+            lib_path = os.path.join(model_dir, f'{model_name}_model.so')
+            treelite.sklearn.import_model(model).export_lib(
+                toolchain='gcc', libpath=lib_path, params={'parallel_comp': 32}
+            )
+            self.compiled_predictors[model_name] = treelite_runtime.Predictor(lib_path, nthread=1)
+        self._models_changed()
+    
+    def _rule_based_anxiety_prediction(self, features):
+        """Rule-based anxiety prediction fallback"""
+        return _rule_based_anxiety(features)
     
     def _rule_based_depression_prediction(self, features):
         """Rule-based depression prediction fallback"""
-        reaction_time_avg, reaction_time_std, accuracy, hesitation_count, error_rate, decision_time_avg, emotional_bias, consistency, _, attention_lapses, _ = features
-        
-        depression_score = 0
-        
-        # Slow reaction times
-        if reaction_time_avg > 1000:
-            depression_score += 25
-        
-        # High number of attention lapses
-        depression_score += attention_lapses * 40
-        
-        # Negative emotional bias
-        if emotional_bias > 0.3:
-            depression_score += 30
-        
-        # Low consistency (lack of engagement)
-        if consistency < 0.5:
-            depression_score += 20
-        
-        # Slow decision making
-        if decision_time_avg > 2000:
-            depression_score += 15
-        
-        return min(depression_score, 100)
+        return _rule_based_depression(features)
     
     def _rule_based_attention_prediction(self, features):
         """Rule-based attention/ADHD prediction fallback"""
-        reaction_time_avg, reaction_time_std, accuracy, hesitation_count, error_rate, _, _, consistency, impulsivity, attention_lapses, _ = features
-        
-        attention_score = 100  # Start with perfect attention, subtract issues
-        
-        # High impulsivity reduces attention score
-        attention_score -= impulsivity * 40
-        
-        # Attention lapses
-        attention_score -= attention_lapses * 50
-        
-        # High reaction time variance (inconsistency)
-        if reaction_time_std > 600:
-            attention_score -= 30
-        
-        # High error rate
-        attention_score -= error_rate * 40
-        
-        # Low consistency
-        attention_score -= (1 - consistency) * 20
-        
-        return max(0, attention_score)
+        return _rule_based_attention(features)
     
     def _rule_based_clustering(self, features):
         """Rule-based clustering fallback"""
-        reaction_time_avg, reaction_time_std, accuracy, hesitation_count, error_rate, _, _, consistency, impulsivity, attention_lapses, _ = features
-        
-        # Fast and accurate cluster
-        if reaction_time_avg < 800 and accuracy > 0.8 and error_rate < 0.2:
-            return 'fast_accurate'
-        
-        # Slow but consistent cluster
-        elif reaction_time_avg > 1200 and consistency > 0.7 and error_rate < 0.3:
-            return 'slow_consistent'
-        
-        # Erratic cluster (default)
-        else:
-            return 'erratic'
+        return BEHAVIOR_CLUSTER_NAMES[_rule_based_cluster_index(features)]
     
     def train_models(self, training_data):
         """Train all models with provided data"""
@@ -298,6 +557,9 @@ class BehaviorPredictor:
             print("Insufficient training data. Using rule-based predictions.")
             return
         
+        # Libraries compiled from the previous models no longer match
+        self.compiled_predictors.clear()
+        
         # Prepare features and targets
         X = []
         y_anxiety = []
@@ -323,10 +585,14 @@ class BehaviorPredictor:
         ]:
             if len(set(y_values)) > 1:  # Check if there's variance in target
                 X_scaled = self.scalers[model_name].fit_transform(X)
-                self.models[model_name].fit(X_scaled, y_values)
+                self._cache_scaler(model_name)
+                # Grow the trees on all cores
+                with joblib.parallel_backend('threading', n_jobs=-1):
+                    self.models[model_name].fit(X_scaled, y_values)
         
         # Train clustering model
         X_scaled = self.scalers['cluster'].fit_transform(X)
+        self._cache_scaler('cluster')
         self.models['cluster'].fit(X_scaled)
         
         # Train risk classification model
@@ -334,7 +600,10 @@ class BehaviorPredictor:
                       for i in range(len(y_anxiety))]
         if len(set(risk_labels)) > 1:
             X_scaled = self.scalers['risk'].fit_transform(X)
+            self._cache_scaler('risk')
             self.models['risk'].fit(X_scaled, risk_labels)
+        
+        self._models_changed()
     
     def save_models(self, model_dir='models/trained'):
         """Save trained models to disk"""
@@ -347,20 +616,36 @@ class BehaviorPredictor:
             scaler_path = os.path.join(model_dir, f'{model_name}_scaler.pkl')
             if model_name in self.scalers:
                 joblib.dump(self.scalers[model_name], scaler_path)
+        
+        # Compiled regressors are saved next to their pickles
+        self.compile_models(model_dir)
     
     def load_models(self, model_dir='models/trained'):
-        """Load trained models from disk"""
+        """Load trained models from disk
+        
+        Model arrays are memory-mapped read-only, so worker processes loading
+        the same files share them through the page cache. This is also why
+        save_models writes uncompressed pickles: joblib cannot memory-map
+        compressed ones.
+        """
         try:
             for model_name in self.models.keys():
                 model_path = os.path.join(model_dir, f'{model_name}_model.pkl')
                 if os.path.exists(model_path):
-                    self.models[model_name] = joblib.load(model_path)
+                    self.models[model_name] = joblib.load(model_path, mmap_mode='r')
                 
                 scaler_path = os.path.join(model_dir, f'{model_name}_scaler.pkl')
                 if os.path.exists(scaler_path) and model_name in self.scalers:
-                    self.scalers[model_name] = joblib.load(scaler_path)
+                    self.scalers[model_name] = joblib.load(scaler_path, mmap_mode='r')
+                    self._cache_scaler(model_name)
+                
+                lib_path = os.path.join(model_dir, f'{model_name}_model.so')
+                if TREELITE_AVAILABLE and model_name in REGRESSION_MODELS and os.path.exists(lib_path):
+                    self.compiled_predictors[model_name] = treelite_runtime.Predictor(lib_path, nthread=1)
         except Exception as e:
             print(f"Error loading models: {e}")
+        # Even a partial load may have replaced some models
+        self._models_changed()
     
     def get_feature_importance(self):
         """Get feature importance from trained models"""
@@ -387,98 +672,86 @@ class ReportMLAnalyzer:
         if not user_sessions:
             return self._default_analysis()
         
-        session_analyses = []
-        for session in user_sessions:
-            behavioral_data = json.loads(session.game_data) if session.game_data else {}
-            
-            analysis = {
-                'session_id': session.id,
-                'game_type': session.game_type,
-                'date': session.created_at,
-                'anxiety_score': self.predictor.predict_anxiety(behavioral_data),
-                'depression_score': self.predictor.predict_depression(behavioral_data),
-                'attention_score': self.predictor.predict_attention(behavioral_data),
-                'cluster': self.predictor.predict_cluster(behavioral_data),
-                'features': self.predictor.extract_features(behavioral_data)
-            }
-            session_analyses.append(analysis)
-        
-        return self._generate_trend_analysis(session_analyses)
-    
-    def _generate_trend_analysis(self, session_analyses):
-        """Generate trend analysis from multiple sessions"""
-        if not session_analyses:
+        # Features are extracted once per session and predicted as one batch
+        features = np.empty((len(user_sessions), len(self.predictor.feature_names)), dtype=FEATURE_DTYPE)
+        for row, session in zip(features, user_sessions):
+            self.predictor.extract_features(session.get_game_data(), out=row)
+        predictions = self.predictor.predict_batch(features)
+        
+        # (N, 3) anxiety, depression and attention scores in session order
+        scores = np.column_stack((
+            predictions['anxiety'], predictions['depression'], predictions['attention']
+        ))
+        return self._generate_trend_analysis(scores, features)
+    
+    def _generate_trend_analysis(self, scores, features):
+        """Generate trend analysis from per-session score and feature matrices"""
+        if not len(scores):
             return self._default_analysis()
         
-        # Calculate trends
-        anxiety_scores = [s['anxiety_score'] for s in session_analyses]
-        depression_scores = [s['depression_score'] for s in session_analyses]
-        attention_scores = [s['attention_score'] for s in session_analyses]
+        anxiety_trend, depression_trend, attention_trend = self._calculate_trends(scores)
+        most_recent = scores[-1].tolist()
+        averages = scores.mean(axis=0).tolist()
         
         trends = {
-            'anxiety_trend': self._calculate_trend(anxiety_scores),
-            'depression_trend': self._calculate_trend(depression_scores),
-            'attention_trend': self._calculate_trend(attention_scores),
+            'anxiety_trend': anxiety_trend,
+            'depression_trend': depression_trend,
+            'attention_trend': attention_trend,
             'most_recent_scores': {
-                'anxiety': anxiety_scores[-1] if anxiety_scores else 0,
-                'depression': depression_scores[-1] if depression_scores else 0,
-                'attention': attention_scores[-1] if attention_scores else 50
+                'anxiety': most_recent[0],
+                'depression': most_recent[1],
+                'attention': most_recent[2]
             },
             'average_scores': {
-                'anxiety': np.mean(anxiety_scores) if anxiety_scores else 0,
-                'depression': np.mean(depression_scores) if depression_scores else 0,
-                'attention': np.mean(attention_scores) if attention_scores else 50
+                'anxiety': averages[0],
+                'depression': averages[1],
+                'attention': averages[2]
             },
-            'session_count': len(session_analyses),
-            'improvement_indicators': self._identify_improvements(session_analyses)
+            'session_count': len(scores),
+            'improvement_indicators': self._identify_improvements(scores, features)
         }
         
         return trends
     
-    def _calculate_trend(self, scores):
-        """Calculate trend direction for a series of scores"""
-        if len(scores) < 2:
-            return 'stable'
+    def _calculate_trends(self, scores):
+        """Trend direction of each column of an (N, K) score matrix"""
+        n_sessions = len(scores)
+        if n_sessions < 2:
+            return ['stable'] * scores.shape[1]
         
-        recent_avg = np.mean(scores[-3:]) if len(scores) >= 3 else scores[-1]
-        earlier_avg = np.mean(scores[:-3]) if len(scores) >= 6 else scores[0]
+        recent_avg = scores[-3:].mean(axis=0) if n_sessions >= 3 else scores[-1]
+        earlier_avg = scores[:-3].mean(axis=0) if n_sessions >= 6 else scores[0]
         
         diff = recent_avg - earlier_avg
-        
-        if diff > 10:
-            return 'increasing'
-        elif diff < -10:
-            return 'decreasing'
-        else:
-            return 'stable'
+        return np.where(diff > 10, 'increasing', np.where(diff < -10, 'decreasing', 'stable')).tolist()
     
-    def _identify_improvements(self, session_analyses):
+    def _identify_improvements(self, scores, features):
         """Identify positive improvements in user behavior"""
         improvements = []
         
-        if len(session_analyses) < 2:
+        n_sessions = len(scores)
+        if n_sessions < 2:
             return improvements
         
-        first_half = session_analyses[:len(session_analyses)//2]
-        second_half = session_analyses[len(session_analyses)//2:]
+        half = n_sessions // 2
         
         # Check for accuracy improvements
-        first_avg_accuracy = np.mean([s['features'][2] for s in first_half])
-        second_avg_accuracy = np.mean([s['features'][2] for s in second_half])
+        first_avg_accuracy = features[:half, 2].mean()
+        second_avg_accuracy = features[half:, 2].mean()
         
         if second_avg_accuracy > first_avg_accuracy + 0.1:
             improvements.append("Significant improvement in accuracy")
         
         # Check for reaction time consistency
-        first_rt_std = np.mean([s['features'][1] for s in first_half])
-        second_rt_std = np.mean([s['features'][1] for s in second_half])
+        first_rt_std = features[:half, 1].mean()
+        second_rt_std = features[half:, 1].mean()
         
         if second_rt_std < first_rt_std * 0.8:
             improvements.append("More consistent reaction times")
         
         # Check for reduced anxiety indicators
-        first_anxiety = np.mean([s['anxiety_score'] for s in first_half])
-        second_anxiety = np.mean([s['anxiety_score'] for s in second_half])
+        first_anxiety = scores[:half, 0].mean()
+        second_anxiety = scores[half:, 0].mean()
         
         if second_anxiety < first_anxiety - 15:
             improvements.append("Reduced anxiety indicators")
@@ -6,9 +6,7 @@ Creates tables, indexes, and sample data for development
 
 import os
 import sys
-import json
 from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash
 import numpy as np
 
 # Add the parent directory to the Python path
@@ -17,6 +15,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app import app
 from models.database_models import db, User, GameSession, BehaviorAnalysis, ConsentRecord
 from config import DevelopmentConfig
+from utils.passwords import hash_password
 
 def create_database():
     """Create database tables"""
@@ -106,7 +105,7 @@ def create_sample_users():
             user = User(
                 username=user_data['username'],
                 email=user_data['email'],
-                password_hash=generate_password_hash(user_data['password']),
+                password_hash=hash_password(user_data['password']),
                 age=user_data['age'],
                 gender=user_data['gender'],
                 consent_given=user_data['consent_given'],
@@ -128,6 +127,7 @@ def create_sample_game_sessions():
         users = User.query.filter_by(is_therapist=False).all()
         
         game_types = ['catch_thought', 'stat_balance', 'decision_maker']
+        records = []
         
         for user in users:
             # Create 5-10 sessions per user over the past 30 days
@@ -143,22 +143,20 @@ def create_sample_game_sessions():
                 # Generate realistic behavioral data based on game type
                 behavioral_data = generate_sample_behavioral_data(game_type, user.age)
                 
-                session = GameSession(
-                    user_id=user.id,
-                    game_type=game_type,
-                    start_time=session_date,
-                    end_time=session_date + timedelta(seconds=behavioral_data['duration']),
-                    duration=behavioral_data['duration'],
-                    completed=True,
-                    score=behavioral_data['score'],
-                    accuracy=behavioral_data['accuracy'],
-                    game_data=json.dumps(behavioral_data),
-                    created_at=session_date
-                )
-                
-                db.session.add(session)
-        
-        db.session.commit()
+                records.append({
+                    'user_id': user.id,
+                    'game_type': str(game_type),
+                    'start_time': session_date,
+                    'end_time': session_date + timedelta(seconds=int(behavioral_data['duration'])),
+                    'duration': int(behavioral_data['duration']),
+                    'completed': True,
+                    'score': int(behavioral_data['score']),
+                    'accuracy': float(behavioral_data['accuracy']),
+                    'game_data': behavioral_data,
+                    'created_at': session_date
+                })
+        
+        GameSession.bulk_log(db.session, records)
         print("✅ Sample game sessions created successfully!")
 
 def generate_sample_behavioral_data(game_type, user_age):
@@ -172,7 +170,7 @@ def generate_sample_behavioral_data(game_type, user_age):
         'mistakes': 0,
         'totalClicks': 0,
         'hesitationTimes': [],
-        'emotionalChoices': {'positive': 0, 'negative': 0, 'neutral': 0}
+        'emotionalChoices': [0, 0, 0]  # negative, neutral, positive
     }
     
     if game_type == 'catch_thought':
@@ -205,11 +203,7 @@ def generate_sample_behavioral_data(game_type, user_age):
             'mistakes': total_bubbles - caught_bubbles,
             'totalClicks': caught_bubbles,
             'hesitationTimes': hesitation_times,
-            'emotionalChoices': {
-                'positive': pos_choices,
-                'negative': neg_choices,
-                'neutral': neu_choices
-            }
+            'emotionalChoices': [neg_choices, neu_choices, pos_choices]
         })
     
     elif game_type == 'stat_balance':
@@ -292,8 +286,8 @@ def create_sample_analyses():
                     confidence_score=analysis_result['confidence_score'],
                     risk_level=analysis_result['risk_level'],
                     requires_attention=analysis_result['requires_attention'],
-                    analysis_data=json.dumps(analysis_result['detailed_metrics']),
-                    insights=json.dumps(analysis_result['insights']),
+                    analysis_data=analysis_result['detailed_metrics'],
+                    insights=analysis_result['insights'],
                     created_at=session.created_at
                 )
                 
@@ -13,10 +13,9 @@ from .data_preprocessing import (
 )
 
 from .ml_pipeline import (
-    MLPipeline,
+    FeaturePipeline,
     ModelTrainer,
-    ModelEvaluator,
-    PredictionEngine
+    EnsembleModel
 )
 
 __version__ = "1.0.0"
@@ -25,10 +24,9 @@ __all__ = [
     "MoodDataCleaner", 
     "FeatureEngineer",
     "DataValidator",
-    "MLPipeline",
+    "FeaturePipeline",
     "ModelTrainer",
-    "ModelEvaluator",
-    "PredictionEngine"
+    "EnsembleModel"
 ]
 
 # Global configuration
@@ -0,0 +1,24 @@
+"""
+Optional Numba JIT support
+
+Numba is an optional dependency. When it is installed, ``njit`` compiles
+numeric kernels to machine code; otherwise it returns the function unchanged
+and callers are expected to use their NumPy code path instead.
+"""
+
+try:
+    from numba import njit as _numba_njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    _numba_njit = None
+    NUMBA_AVAILABLE = False
+
+
+def njit(*args, **kwargs):
+    """``numba.njit`` when Numba is installed, otherwise a no-op decorator"""
+    if NUMBA_AVAILABLE:
+        return _numba_njit(*args, **kwargs)
+    
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+    return lambda func: func
@@ -0,0 +1,78 @@
+"""
+Password hashing
+
+Hashes are produced with Argon2id when ``argon2-cffi`` is installed and the
+configured method is ``'argon2'``; any other method string is passed to
+Werkzeug (``'scrypt:...'``, ``'pbkdf2:...'``). Verification dispatches on the
+stored hash, so accounts hashed under an earlier method keep working.
+"""
+
+import hashlib
+import secrets
+import threading
+
+from cachetools import LRUCache
+from werkzeug.security import generate_password_hash, check_password_hash
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import InvalidHashError, VerificationError
+    ARGON2_AVAILABLE = True
+except ImportError:
+    PasswordHasher = None
+    ARGON2_AVAILABLE = False
+
+ARGON2_METHOD = 'argon2'
+
+# Werkzeug method used when Argon2 is requested but not installed
+FALLBACK_METHOD = 'scrypt:32768:8:1'
+
+_argon2_hasher = (
+    PasswordHasher(time_cost=2, memory_cost=65536, parallelism=2) if ARGON2_AVAILABLE else None
+)
+
+
+def hash_password(password, method=ARGON2_METHOD):
+    """Hash a password with the given method"""
+    if method == ARGON2_METHOD:
+        if ARGON2_AVAILABLE:
+            return _argon2_hasher.hash(password)
+        method = FALLBACK_METHOD
+    return generate_password_hash(password, method=method)
+
+
+def verify_password(password_hash, password):
+    """Check a password against a hash produced by hash_password"""
+    if password_hash.startswith('$argon2'):
+        if not ARGON2_AVAILABLE:
+            raise RuntimeError('argon2-cffi is required to verify Argon2 password hashes')
+        try:
+            return _argon2_hasher.verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return check_password_hash(password_hash, password)
+
+
+# Worker-local cache of verification results keyed on (stored hash, keyed
+# digest of the password); plaintext passwords are never kept
+_verify_cache = LRUCache(maxsize=1024)
+_verify_cache_lock = threading.Lock()
+_VERIFY_CACHE_KEY = secrets.token_bytes(32)
+
+
+def verify_password_cached(password_hash, password):
+    """verify_password memoized per worker process
+
+    Repeat checks of the same password against the same hash skip the KDF.
+    Entries are keyed on the stored hash, so a password change invalidates
+    them. The cache lives in memory only and is never persisted.
+    """
+    digest = hashlib.blake2b(password.encode(), key=_VERIFY_CACHE_KEY, digest_size=16).digest()
+    key = (password_hash, digest)
+    with _verify_cache_lock:
+        result = _verify_cache.get(key)
+    if result is None:
+        result = verify_password(password_hash, password)
+        with _verify_cache_lock:
+            _verify_cache[key] = result
+    return result
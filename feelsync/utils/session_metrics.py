@@ -0,0 +1,80 @@
+"""
+Session-level gameplay metrics
+
+Reductions over per-session arrays of reaction times and accuracies. The
+loop kernel is compiled with Numba when it is available; otherwise the
+equivalent vectorised NumPy implementation is used.
+"""
+
+import numpy as np
+
+from .jit import njit, NUMBA_AVAILABLE
+
+
+@njit(cache=True)
+def _session_metrics_kernel(reaction_times, accuracies):
+    """Single-pass loop kernel behind compute_session_metrics"""
+    rt_count = 0
+    rt_sum = 0.0
+    rt_sq_sum = 0.0
+    for rt in reaction_times:
+        if rt > 0:  # NaN compares False
+            rt_count += 1
+            rt_sum += rt
+            rt_sq_sum += rt * rt
+    
+    acc_count = 0
+    acc_sum = 0.0
+    for acc in accuracies:
+        if acc == acc:  # skip NaN
+            acc_count += 1
+            acc_sum += acc
+    
+    avg_reaction_time = 0.0
+    consistency_score = 0.0
+    if rt_count > 0:
+        avg_reaction_time = rt_sum / rt_count
+        variance = max(rt_sq_sum / rt_count - avg_reaction_time * avg_reaction_time, 0.0)
+        consistency_score = max(0.0, 1.0 - np.sqrt(variance) / avg_reaction_time)
+    
+    accuracy = acc_sum / acc_count if acc_count > 0 else 0.0
+    
+    return avg_reaction_time, accuracy, consistency_score
+
+
+def _session_metrics_numpy(reaction_times, accuracies):
+    """Vectorised NumPy implementation of compute_session_metrics"""
+    valid_rt = reaction_times[reaction_times > 0]
+    valid_acc = accuracies[~np.isnan(accuracies)]
+    
+    avg_reaction_time = 0.0
+    consistency_score = 0.0
+    if valid_rt.size:
+        avg_reaction_time = float(valid_rt.mean())
+        consistency_score = max(0.0, 1.0 - float(valid_rt.std()) / avg_reaction_time)
+    
+    accuracy = float(valid_acc.mean()) if valid_acc.size else 0.0
+    
+    return avg_reaction_time, accuracy, consistency_score
+
+
+def compute_session_metrics(reaction_times, accuracies):
+    """
+    Summarise reaction times and accuracies for a set of gameplay records
+    
+    Non-positive or NaN reaction times and NaN accuracies are treated as
+    missing and skipped.
+    
+    Args:
+        reaction_times: Reaction times in milliseconds
+        accuracies: Per-record accuracy values (0-1)
+        
+    Returns:
+        Tuple of (avg_reaction_time, accuracy, consistency_score)
+    """
+    reaction_times = np.ascontiguousarray(reaction_times, dtype=np.float64)
+    accuracies = np.ascontiguousarray(accuracies, dtype=np.float64)
+    
+    if NUMBA_AVAILABLE:
+        return _session_metrics_kernel(reaction_times, accuracies)
+    return _session_metrics_numpy(reaction_times, accuracies)